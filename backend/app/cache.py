@@ -1,18 +1,62 @@
 """
 File-based persistent cache with in-memory L1 layer.
 
-Local dev  : JSON files written to ./cache/ on disk.
-AWS deploy : JSON files written to an S3 bucket (set CACHE_BACKEND=s3).
-Redis      : JSON values written to Redis (set CACHE_BACKEND=redis).
+Local dev  : files written to ./cache/<2-hex shard>/ on disk (atomic renames).
+AWS deploy : objects written to an S3 bucket (set CACHE_BACKEND=s3).
+Redis      : values written to Redis (set CACHE_BACKEND=redis).
+Tiered     : Redis as the hot tier, S3 as the durable cold tier
+             (set CACHE_BACKEND=tiered). Reads fall back from Redis to S3 and
+             promote hits into Redis; writes go to Redis synchronously and to
+             S3 through a batching write-behind queue (writebehind.py).
 
-An in-memory LRU dict sits in front of the backend to avoid repeated
-serialization / I/O for frequently accessed keys.
+Values are serialized by codec.py (msgpack + zstd when installed, framed with
+a version header); entries written as plain JSON before that still read.
+
+An in-memory LRU (see l1.py) sits in front of the backend to avoid repeated
+serialization / I/O for frequently accessed keys. It is bounded by
+approximate bytes with per-family quotas, entries expire once their payload
+turns stale so they are re-read instead of served from memory, and it is
+sharded with a lock per shard so threadpool handlers can share it safely.
+An optional shared-memory tier (SHM_CACHE_PATH, see shm.py) between L1 and
+the backend lets every worker on a host share one warm working set. get_many() / set_many()
+resolve a batch of keys with one backend round trip where the backend allows
+it (MGET / pipelined SET on Redis, a bounded pool of GETs / PUTs on S3).
+
+aget_or_refresh() layers a per-family freshness policy on top: fresh entries
+are served as-is, stale-but-tolerable entries are served immediately while a
+background refresh runs, and entries past their max staleness block on the
+upstream loader (coalesced through singleflight). A batch refresh that finds
+an entry's content unchanged skips the rewrite and calls record_verified()
+instead: a small per-key record (VERIFIED_PREFIX) marks the entry current
+again, so unchanged data costs no rewrite of the payload and no L1 churn.
+
+Lookups per tier and key family, backend latency and written payload sizes
+are recorded for /metrics (metrics.py); L1 evictions, sizes and the other
+tiers' stats are reported from their own counters at scrape time.
+
+encoded() memoizes the final encoded response body and its ETag per key and
+payload version, so endpoints can return bytes without re-validating and
+re-encoding an unchanged payload.
 """
-import json
+import asyncio
+import atexit
+import hashlib
+import math
+import mmap
 import os
-from collections import OrderedDict
+import random
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, NamedTuple
+
+from . import codec, memo, metrics, singleflight, upstream
+from .l1 import ShardedL1Cache, family
+from .writebehind import WriteBehindQueue
 
 CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "local")
 LOCAL_CACHE_DIR = Path(os.environ.get("LOCAL_CACHE_DIR", "./cache"))
@@ -21,75 +65,381 @@ S3_PREFIX = os.environ.get("S3_CACHE_PREFIX", "chronostock/cache/")
 REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
 REDIS_PREFIX = os.environ.get("REDIS_CACHE_PREFIX", "chronostock/cache/")
 REDIS_CACHE_TTL_SECONDS = int(os.environ.get("REDIS_CACHE_TTL_SECONDS", "86400"))
+# Entries written together (the daily job, a batch request) should not all
+# expire together: freshness TTLs and Redis key TTLs are shortened by a
+# per-write random share of up to this fraction.
+CACHE_TTL_JITTER = float(os.environ.get("CACHE_TTL_JITTER", "0.1"))
+# XFetch early refresh: a fresh entry is refreshed in the background with a
+# probability that rises as its expiry nears, scaled by how long its family's
+# loader takes; higher refreshes earlier, 0 disables.
+CACHE_XFETCH_BETA = float(os.environ.get("CACHE_XFETCH_BETA", "1.0"))
+S3_IO_CONCURRENCY = int(os.environ.get("S3_IO_CONCURRENCY", "16"))
+# Tiered backend: S3 write-behind batching (keys per batch, max seconds a
+# write waits, pending keys before writers block) and shutdown drain timeout
+WRITE_BEHIND_BATCH_SIZE = int(os.environ.get("WRITE_BEHIND_BATCH_SIZE", "64"))
+WRITE_BEHIND_MAX_DELAY_SECONDS = float(os.environ.get("WRITE_BEHIND_MAX_DELAY_SECONDS", "1.0"))
+WRITE_BEHIND_MAX_PENDING = int(os.environ.get("WRITE_BEHIND_MAX_PENDING", "10000"))
+WRITE_BEHIND_SHUTDOWN_TIMEOUT_SECONDS = float(os.environ.get("WRITE_BEHIND_SHUTDOWN_TIMEOUT_SECONDS", "10"))
+# Connection pool of the shared S3 client; keep it at least S3_IO_CONCURRENCY
+S3_MAX_POOL_CONNECTIONS = int(os.environ.get("S3_MAX_POOL_CONNECTIONS", "32"))
+S3_MAX_ATTEMPTS = int(os.environ.get("S3_MAX_ATTEMPTS", "3"))
+# Encoded bodies kept with their ETag for conditional GETs. They duplicate what
+# L1 holds, so this only needs to cover what L1 recently let go
+S3_ETAG_CACHE_MAX_BYTES = int(os.environ.get("S3_ETAG_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# ── In-memory L1 cache (LRU, byte budget, per-key expiry) ───────────────────
+_L1_MAX_BYTES = int(os.environ.get("L1_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+_L1_MAX_SIZE = int(os.environ.get("L1_CACHE_MAX_SIZE", "4096"))
+# Independently locked shards; the byte, entry and family budgets stay global
+_L1_SHARDS = int(os.environ.get("L1_CACHE_SHARDS", "8"))
+# Keys without a freshness policy (price:, trending, ...) are re-read from the
+# backend after this long, so writes from other workers / the daily job show up.
+_L1_DEFAULT_TTL_SECONDS = float(os.environ.get("L1_CACHE_TTL_SECONDS", "3600"))
+# Largest share of the byte budget each key family may hold
+L1_FAMILY_QUOTAS: dict[str, float] = {
+    "stock": 0.6,
+    "news": 0.2,
+    "sec": 0.2,
+    "earnings": 0.1,
+    "indicator": 0.1,
+}
+
+
+def _new_l1() -> ShardedL1Cache:
+    return ShardedL1Cache(
+        max_bytes=_L1_MAX_BYTES,
+        max_entries=_L1_MAX_SIZE,
+        family_quotas=L1_FAMILY_QUOTAS,
+        shards=_L1_SHARDS,
+    )
+
+
+_l1 = _new_l1()
+
 
-# ── In-memory L1 cache (LRU) ────────────────────────────────────────────────
-_L1_MAX_SIZE = int(os.environ.get("L1_CACHE_MAX_SIZE", "64"))
-_l1_cache: OrderedDict[str, Any] = OrderedDict()
+def _l1_ttl(key: str, value: Any) -> float | None:
+    """Seconds until `value` turns stale under its freshness policy."""
+    if key.startswith(VERIFIED_PREFIX):
+        return VERIFIED_STAMPS_TTL_SECONDS
+    try:
+        policy = policy_for(key)
+    except KeyError:
+        return _L1_DEFAULT_TTL_SECONDS
+    # Only a verification this worker already holds counts: sizing an L1 fill
+    # must not read the backend (fills also run for async handlers). An entry
+    # filled before its record was seen is held for its own TTL and refilled.
+    stamp = _stamp(key, value, policy, _verified_memo.get)
+    age = _age(stamp)
+    if age is None:
+        return 0  # unstamped: always reloaded, not worth holding
+    return (_effective_ttl(key, stamp, policy) - age).total_seconds()
 
 
 def _l1_get(key: str) -> tuple[bool, Any]:
-    """Return (hit, value). On hit, move key to end (most-recently-used)."""
-    if key in _l1_cache:
-        _l1_cache.move_to_end(key)
-        return True, _l1_cache[key]
-    return False, None
+    """Return (hit, value). Expired entries are dropped and read as misses."""
+    return _l1.get(key)
 
 
 def _l1_set(key: str, value: Any) -> None:
-    """Insert/update a key and evict the oldest entry if over capacity."""
-    _l1_cache[key] = value
-    _l1_cache.move_to_end(key)
-    while len(_l1_cache) > _L1_MAX_SIZE:
-        _l1_cache.popitem(last=False)
+    """Insert/update a key; evicts least-recently-used entries over budget."""
+    _l1.set(key, value, ttl=_l1_ttl(key, value))
+
+
+def l1_stats() -> dict[str, Any]:
+    """Entries, bytes and per-family hit/miss/eviction/expiration counters."""
+    return _l1.stats()
+
+
+# ── Shared-memory tier (optional, host-wide) ─────────────────────────────────
+# An mmap'd table shared by every worker on the host (see shm.py), between the
+# per-process L1 and the backend. Disabled unless SHM_CACHE_PATH is set,
+# e.g. /dev/shm/chronostock-cache.
+SHM_CACHE_PATH = os.environ.get("SHM_CACHE_PATH", "")
+SHM_CACHE_SIZE_MB = int(os.environ.get("SHM_CACHE_SIZE_MB", "256"))
+SHM_CACHE_SLOTS = int(os.environ.get("SHM_CACHE_SLOTS", "65536"))
+_shm = None
+_shm_lock = threading.Lock()
+
+
+def _shm_table():
+    global _shm
+    if not SHM_CACHE_PATH:
+        return None
+    if _shm is None:
+        with _shm_lock:
+            if _shm is None:
+                from .shm import SharedTable
+                _shm = SharedTable(SHM_CACHE_PATH, SHM_CACHE_SIZE_MB * 1024 * 1024, SHM_CACHE_SLOTS)
+    return _shm
+
+
+def _shm_get(key: str) -> Any | None:
+    table = _shm_table()
+    if table is None:
+        return None
+    raw = table.get(key)
+    _requests.inc(tier="shm", family=family(key), result="miss" if raw is None else "hit")
+    return codec.decode(raw) if raw is not None else None
+
+
+def _shm_set(key: str, value: Any) -> None:
+    table = _shm_table()
+    if table is not None:
+        table.put(key, codec.encode(value), ttl=_l1_ttl(key, value))
+
+
+def shm_stats() -> dict[str, Any] | None:
+    """This worker's hit/miss/write counters on the shared tier; None if disabled."""
+    table = _shm_table()
+    return table.stats() if table is not None else None
+
+
+# ── Metrics (served on /metrics, see metrics.py) ─────────────────────────────
+# L1 keeps its own per-family counters; they are merged into the requests
+# family at scrape time (_collect_metrics) instead of counted again here.
+_requests = metrics.Counter(
+    "chronostock_cache_requests_total", "Cache lookups by tier, key family and result."
+)
+_backend_seconds = metrics.histogram(
+    "chronostock_cache_backend_seconds", "Latency of cache backend calls by backend and operation."
+)
+_payload_bytes = metrics.histogram(
+    "chronostock_cache_payload_bytes", "Encoded size of values written, by key family and store.", metrics.SIZE_BUCKETS
+)
+
+
+@contextmanager
+def _timed(op: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _backend_seconds.observe(time.perf_counter() - started, backend=CACHE_BACKEND, op=op)
+
+
+def _encode(key: str, value: Any, store: str) -> bytes:
+    body = codec.encode(value)
+    _payload_bytes.observe(len(body), family=family(key), store=store)
+    return body
 
 
 def _filename(key: str) -> str:
     """Turn a cache key like 'stock:AAPL:1Y' into 'stock_AAPL_1Y.json'."""
+    # The suffix predates codec.py; kept so existing entries keep their names
     return key.replace(":", "_") + ".json"
 
 
 # ── Local disk ────────────────────────────────────────────────────────────────
+# Files are spread over 256 subdirectories chosen by a hash of the file name,
+# so LOCAL_CACHE_DIR never turns into one huge flat listing. Writes go to a
+# temp file in the same directory and are renamed into place, so a reader
+# sees either the old entry or the new one, never a partial file. Reads map
+# the file and decode straight from the mapping instead of copying it first.
 
-def _local_get(key: str) -> Any | None:
-    path = LOCAL_CACHE_DIR / _filename(key)
-    if not path.exists():
+def _shard(name: str) -> str:
+    return hashlib.blake2b(name.encode(), digest_size=1).hexdigest()
+
+
+def _local_path(key: str) -> Path:
+    name = _filename(key)
+    return LOCAL_CACHE_DIR / _shard(name) / name
+
+
+_local_migrated: dict[Path, bool] = {}   # directories already migrated
+_local_migrate_lock = threading.Lock()
+
+
+def _local_migrate() -> None:
+    """Move files written before sharding (flat in LOCAL_CACHE_DIR) into their shard, once per directory."""
+    root = LOCAL_CACHE_DIR
+    if root in _local_migrated:
+        return
+    with _local_migrate_lock:
+        if root in _local_migrated:
+            return
+        try:
+            names = [entry.name for entry in os.scandir(root) if entry.is_file() and entry.name.endswith(".json")]
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            shard = root / _shard(name)
+            shard.mkdir(exist_ok=True)
+            try:
+                os.replace(root / name, shard / name)
+            except FileNotFoundError:
+                pass  # moved by another worker
+        _local_migrated[root] = True
+
+
+def _local_read(path: Path) -> Any | None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
         return None
-    with path.open() as f:
-        return json.load(f)
+    try:
+        size = os.fstat(fd).st_size
+        if size == 0:
+            return None
+        mm = mmap.mmap(fd, size, access=mmap.ACCESS_READ)
+        try:
+            return codec.decode(memoryview(mm))
+        finally:
+            try:
+                mm.close()
+            except BufferError:
+                pass  # a decode error's traceback still holds a view; the map is freed with it
+    finally:
+        os.close(fd)
+
+
+def _local_get(key: str) -> Any | None:
+    _local_migrate()
+    return _local_read(_local_path(key))
+
+
+def _local_get_many(keys: list[str]) -> dict[str, Any]:
+    _local_migrate()
+    values: dict[str, Any] = {}
+    for key in keys:
+        value = _local_read(_local_path(key))
+        if value is not None:
+            values[key] = value
+    return values
 
 
 def _local_set(key: str, value: Any) -> None:
-    LOCAL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
-    path = LOCAL_CACHE_DIR / _filename(key)
-    with path.open("w") as f:
-        json.dump(value, f)
+    path = _local_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Not tempfile.mkstemp(): its files are 0600, which os.replace() keeps, and the
+    # daily job may write as a different user than the API workers that read
+    tmp = path.parent / f".{path.name}.{os.urandom(8).hex()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)   # 0666 less the umask, like open()
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_encode(key, value, "local"))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
 
 
 # ── S3 ────────────────────────────────────────────────────────────────────────
+# One client per process: boto3 clients are thread-safe, and building one
+# re-resolves credentials and config and starts a fresh connection pool.
+# The last body read or written per key is kept with its ETag (bounded by
+# S3_ETAG_CACHE_MAX_BYTES), so re-reading an unchanged object after L1 let it
+# go is a conditional GET answered with 304 instead of a full download.
+
+_s3: Any = None
+_s3_lock = threading.Lock()
+_s3_stats = {"gets": 0, "not_modified": 0, "bytes_downloaded": 0, "puts": 0, "bytes_uploaded": 0}
+
 
 def _s3_client():
-    import boto3  # type: ignore
-    return boto3.client("s3")
+    global _s3
+    if _s3 is None:
+        with _s3_lock:
+            if _s3 is None:
+                import boto3  # type: ignore
+                from botocore.config import Config  # type: ignore
+
+                _s3 = boto3.client("s3", config=Config(
+                    max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                    retries={"max_attempts": S3_MAX_ATTEMPTS, "mode": "adaptive"},
+                    tcp_keepalive=True,
+                ))
+    return _s3
+
+
+def _new_s3_validators() -> ShardedL1Cache:
+    return ShardedL1Cache(max_bytes=S3_ETAG_CACHE_MAX_BYTES, max_entries=_L1_MAX_SIZE * 4)
+
+
+_s3_validators = _new_s3_validators()   # key → (etag, encoded body)
+
+
+def _s3_count(**deltas: int) -> None:
+    with _s3_lock:
+        for name, delta in deltas.items():
+            _s3_stats[name] += delta
+
+
+def s3_stats() -> dict[str, int]:
+    """GETs issued, how many were answered 304, and bytes moved by this worker."""
+    with _s3_lock:
+        return dict(_s3_stats)
 
 
 def _s3_get(key: str) -> Any | None:
+    return _s3_read(_s3_client(), key)
+
+
+def _s3_read(client, key: str) -> Any | None:
     import botocore.exceptions  # type: ignore
+    request = {"Bucket": S3_BUCKET, "Key": S3_PREFIX + _filename(key)}
+    known, validator = _s3_validators.get(key)
+    if known:
+        request["IfNoneMatch"] = validator[0]
     try:
-        obj = _s3_client().get_object(Bucket=S3_BUCKET, Key=S3_PREFIX + _filename(key))
-        return json.loads(obj["Body"].read())
+        obj = client.get_object(**request)
     except botocore.exceptions.ClientError as e:
-        if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+        code = e.response["Error"]["Code"]
+        if known and code in ("304", "NotModified"):
+            _s3_count(gets=1, not_modified=1)
+            return codec.decode(validator[1])
+        if code in ("NoSuchKey", "404"):
+            _s3_validators.pop(key)
             return None
         raise
+    body = obj["Body"].read()
+    _s3_count(gets=1, bytes_downloaded=len(body))
+    if obj.get("ETag"):
+        _s3_validators.set(key, (obj["ETag"], body), size=len(body))
+    return codec.decode(body)
+
+
+_s3_io_executor: ThreadPoolExecutor | None = None
+_s3_io_lock = threading.Lock()
+
+
+def _s3_io_pool() -> ThreadPoolExecutor:
+    global _s3_io_executor
+    with _s3_io_lock:
+        if _s3_io_executor is None:
+            _s3_io_executor = ThreadPoolExecutor(max_workers=S3_IO_CONCURRENCY, thread_name_prefix="cache-s3")
+        return _s3_io_executor
+
+
+def _s3_get_many(keys: list[str]) -> dict[str, Any]:
+    """Parallel GETs on a bounded pool, sharing one (thread-safe) client."""
+    client = _s3_client()
+    values = _s3_io_pool().map(lambda key: _s3_read(client, key), keys)
+    return dict(zip(keys, values))
 
 
 def _s3_set(key: str, value: Any) -> None:
-    _s3_client().put_object(
+    _s3_write(_s3_client(), key, value)
+
+
+def _s3_write(client, key: str, value: Any) -> None:
+    body = _encode(key, value, "s3")
+    response = client.put_object(
         Bucket=S3_BUCKET,
         Key=S3_PREFIX + _filename(key),
-        Body=json.dumps(value),
-        ContentType="application/json",
+        Body=body,
+        ContentType=codec.CONTENT_TYPE,
     )
+    _s3_count(puts=1, bytes_uploaded=len(body))
+    if response and response.get("ETag"):
+        _s3_validators.set(key, (response["ETag"], body), size=len(body))
+    else:
+        _s3_validators.pop(key)
+
+
+def _s3_set_many(items: dict[str, Any]) -> None:
+    client = _s3_client()
+    # list() drains the iterator so the first failed PUT is raised here
+    list(_s3_io_pool().map(lambda item: _s3_write(client, *item), items.items()))
 
 
 # ── Redis ─────────────────────────────────────────────────────────────────────
@@ -101,7 +451,8 @@ def _get_pool():
     global _redis_pool
     if _redis_pool is None:
         import redis
-        _redis_pool = redis.ConnectionPool.from_url(REDIS_URL, decode_responses=True)
+        # Values are codec bytes, so responses stay undecoded
+        _redis_pool = redis.ConnectionPool.from_url(REDIS_URL, decode_responses=False)
     return _redis_pool
 
 
@@ -114,23 +465,137 @@ def _redis_get(key: str) -> Any | None:
     import redis.exceptions
     try:
         raw = _redis_client().get(REDIS_PREFIX + key)
-        return json.loads(raw) if raw is not None else None
-    except (redis.exceptions.RedisError, json.JSONDecodeError):
+        return codec.decode(raw) if raw is not None else None
+    except (redis.exceptions.RedisError, ValueError):
         return None
 
 
+def _redis_get_many(keys: list[str]) -> dict[str, Any]:
+    """One MGET round trip; undecodable entries read as misses."""
+    import redis.exceptions
+    try:
+        raws = _redis_client().mget([REDIS_PREFIX + key for key in keys])
+    except redis.exceptions.RedisError:
+        return {}
+    values: dict[str, Any] = {}
+    for key, raw in zip(keys, raws):
+        if raw is None:
+            continue
+        try:
+            values[key] = codec.decode(raw)
+        except ValueError:  # JSONDecodeError / CodecError
+            continue
+    return values
+
+
+def _redis_ttl() -> int | None:
+    """Key expiry in seconds, jittered per write; None when expiry is disabled."""
+    if REDIS_CACHE_TTL_SECONDS <= 0:
+        return None
+    return max(1, round(REDIS_CACHE_TTL_SECONDS * (1 - CACHE_TTL_JITTER * random.random())))
+
+
 def _redis_set(key: str, value: Any) -> None:
     import redis.exceptions
     try:
         _redis_client().set(
             REDIS_PREFIX + key,
-            json.dumps(value),
-            ex=REDIS_CACHE_TTL_SECONDS if REDIS_CACHE_TTL_SECONDS > 0 else None,
+            _encode(key, value, "redis"),
+            ex=_redis_ttl(),
         )
     except redis.exceptions.RedisError:
         pass
 
 
+def _redis_set_many(items: dict[str, Any]) -> None:
+    """Pipelined SETs: one round trip for the whole batch."""
+    import redis.exceptions
+    try:
+        pipe = _redis_client().pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.set(REDIS_PREFIX + key, _encode(key, value, "redis"), ex=_redis_ttl())
+        pipe.execute()
+    except redis.exceptions.RedisError:
+        pass
+
+
+# ── Tiered: Redis hot, S3 cold ────────────────────────────────────────────────
+# Redis can stay small (short REDIS_CACHE_TTL_SECONDS) and lose its data on a
+# restart: misses are refilled from S3 instead of from the upstream providers.
+
+_write_behind: WriteBehindQueue | None = None
+_write_behind_lock = threading.Lock()
+
+
+def _cold_writes() -> WriteBehindQueue:
+    global _write_behind
+    if _write_behind is None:
+        with _write_behind_lock:
+            if _write_behind is None:
+                _write_behind = WriteBehindQueue(
+                    _s3_set_many,
+                    batch_size=WRITE_BEHIND_BATCH_SIZE,
+                    max_delay=WRITE_BEHIND_MAX_DELAY_SECONDS,
+                    max_pending=WRITE_BEHIND_MAX_PENDING,
+                    name="cache-write-behind",
+                )
+                # Scripts (the daily job) exit right after their last set()
+                atexit.register(_write_behind.close, WRITE_BEHIND_SHUTDOWN_TIMEOUT_SECONDS)
+    return _write_behind
+
+
+def _tiered_get(key: str) -> Any | None:
+    value = _redis_get(key)
+    if value is not None:
+        return value
+    # Not in S3 yet if its write is still queued
+    queued, value = _cold_writes().peek(key)
+    if not queued:
+        value = _s3_get(key)
+    if value is not None:
+        _redis_set(key, value)
+    return value
+
+
+def _tiered_get_many(keys: list[str]) -> dict[str, Any]:
+    values = _redis_get_many(keys)
+    promoted: dict[str, Any] = {}
+    cold: list[str] = []
+    for key in keys:
+        if key in values:
+            continue
+        queued, value = _cold_writes().peek(key)
+        if queued:
+            promoted[key] = value
+        else:
+            cold.append(key)
+    if cold:
+        promoted.update((key, value) for key, value in _s3_get_many(cold).items() if value is not None)
+    if promoted:
+        _redis_set_many(promoted)
+    return {**values, **promoted}
+
+
+def _tiered_set(key: str, value: Any) -> None:
+    _redis_set(key, value)
+    _cold_writes().put(key, value)
+
+
+def _tiered_set_many(items: dict[str, Any]) -> None:
+    _redis_set_many(items)
+    _cold_writes().put_many(items)
+
+
+def flush_writes(timeout: float | None = None) -> bool:
+    """Drain queued cold-tier writes; False if they did not finish within `timeout`."""
+    return _write_behind.flush_pending(timeout) if _write_behind is not None else True
+
+
+def write_behind_stats() -> dict[str, Any] | None:
+    """Queue depth and batch counters of the S3 write-behind; None until first used."""
+    return _write_behind.stats() if _write_behind is not None else None
+
+
 # ── Public API ────────────────────────────────────────────────────────────────
 
 def get(key: str) -> Any | None:
@@ -139,27 +604,659 @@ def get(key: str) -> Any | None:
     if hit:
         return value
 
+    # Then the host-wide shared tier, warmed by any worker
+    value = _shm_get(key)
+    if value is not None:
+        _l1_set(key, value)
+        return value
+
     # Fall through to backend
-    if CACHE_BACKEND == "s3":
-        value = _s3_get(key)
-    elif CACHE_BACKEND == "redis":
-        value = _redis_get(key)
-    else:
-        value = _local_get(key)
+    with _timed("get"):
+        if CACHE_BACKEND == "s3":
+            value = _s3_get(key)
+        elif CACHE_BACKEND == "redis":
+            value = _redis_get(key)
+        elif CACHE_BACKEND == "tiered":
+            value = _tiered_get(key)
+        else:
+            value = _local_get(key)
+    _requests.inc(tier="backend", family=family(key), result="miss" if value is None else "hit")
 
-    # Populate L1 on backend hit
+    # Populate the memory tiers on backend hit
     if value is not None:
         _l1_set(key, value)
+        _shm_set(key, value)
     return value
 
 
+def get_many(keys: list[str]) -> dict[str, Any]:
+    """
+    Bulk get(): {key: value} for every key that is cached; misses are omitted.
+
+    L1 is consulted first; the remaining keys go to the backend in one batch
+    (MGET on Redis, parallel GETs on S3).
+    """
+    values: dict[str, Any] = {}
+    pending: list[str] = []
+    for key in dict.fromkeys(keys):
+        hit, value = _l1_get(key)
+        if not hit:
+            value = _shm_get(key)
+            if value is not None:
+                _l1_set(key, value)
+        if value is not None:
+            values[key] = value
+        else:
+            pending.append(key)
+    if not pending:
+        return values
+
+    with _timed("get_many"):
+        if CACHE_BACKEND == "s3":
+            fetched = _s3_get_many(pending)
+        elif CACHE_BACKEND == "redis":
+            fetched = _redis_get_many(pending)
+        elif CACHE_BACKEND == "tiered":
+            fetched = _tiered_get_many(pending)
+        else:
+            fetched = _local_get_many(pending)
+
+    for key in pending:
+        value = fetched.get(key)
+        _requests.inc(tier="backend", family=family(key), result="miss" if value is None else "hit")
+        if value is not None:
+            _l1_set(key, value)
+            _shm_set(key, value)
+            values[key] = value
+    return values
+
+
 def set(key: str, value: Any) -> None:
-    # Write-through: update L1 and backend
+    # Write-through: update the memory tiers and backend
     _l1_set(key, value)
+    _shm_set(key, value)
 
-    if CACHE_BACKEND == "s3":
-        _s3_set(key, value)
-    elif CACHE_BACKEND == "redis":
-        _redis_set(key, value)
-    else:
-        _local_set(key, value)
\ No newline at end of file
+    with _timed("set"):
+        if CACHE_BACKEND == "s3":
+            _s3_set(key, value)
+        elif CACHE_BACKEND == "redis":
+            _redis_set(key, value)
+        elif CACHE_BACKEND == "tiered":
+            _tiered_set(key, value)
+        else:
+            _local_set(key, value)
+
+
+def set_many(items: dict[str, Any]) -> None:
+    """Bulk set(): pipelined SETs on Redis, parallel PUTs on S3."""
+    if not items:
+        return
+    for key, value in items.items():
+        _l1_set(key, value)
+        _shm_set(key, value)
+
+    with _timed("set_many"):
+        if CACHE_BACKEND == "s3":
+            _s3_set_many(items)
+        elif CACHE_BACKEND == "redis":
+            _redis_set_many(items)
+        elif CACHE_BACKEND == "tiered":
+            _tiered_set_many(items)
+        else:
+            for key, value in items.items():
+                _local_set(key, value)
+
+
+# ── Freshness policy (stale-while-revalidate) ────────────────────────────────
+
+@dataclass(frozen=True)
+class FreshnessPolicy:
+    ttl: timedelta                      # younger than this → serve as-is
+    max_stale: timedelta                # older than this → block on the loader
+    timestamp_field: str = "cached_at"  # ISO-8601 field stamped by the writer
+
+
+# Keyed by key prefix; the longest matching prefix wins.
+FRESHNESS_POLICIES: dict[str, FreshnessPolicy] = {
+    "stock:": FreshnessPolicy(ttl=timedelta(hours=24), max_stale=timedelta(hours=72)),
+    "news:": FreshnessPolicy(ttl=timedelta(hours=24), max_stale=timedelta(hours=48)),
+    "earnings:": FreshnessPolicy(ttl=timedelta(hours=24), max_stale=timedelta(hours=72)),
+    "sec:filings:": FreshnessPolicy(ttl=timedelta(hours=24), max_stale=timedelta(hours=72)),
+    "indicator:": FreshnessPolicy(ttl=timedelta(hours=24), max_stale=timedelta(hours=72), timestamp_field="cachedAt"),
+    "market:summary": FreshnessPolicy(ttl=timedelta(hours=6), max_stale=timedelta(hours=24), timestamp_field="cachedAt"),
+}
+
+# After a background refresh fails, further refreshes of that key wait this long
+CACHE_REFRESH_RETRY_SECONDS = float(os.environ.get("CACHE_REFRESH_RETRY_SECONDS", "60"))
+_refresh_lock = threading.Lock()
+_refreshing: dict[str, Future] = {}
+_refresh_failed_at: dict[str, float] = {}   # key → time.monotonic() of its last failed refresh
+_freshness_stats: dict[str, int] = {
+    "fresh": 0, "stale_served": 0, "early_refreshes": 0, "blocking_loads": 0,
+    "refresh_failures": 0, "refresh_backoffs": 0,
+}
+# Smoothed loader duration per key family, the XFetch "delta"
+_recompute_seconds: dict[str, float] = {}
+_RECOMPUTE_SMOOTHING = 0.3
+
+
+def policy_for(key: str) -> FreshnessPolicy:
+    matches = [prefix for prefix in FRESHNESS_POLICIES if key.startswith(prefix)]
+    if not matches:
+        raise KeyError(f"No freshness policy for cache key: {key}")
+    return FRESHNESS_POLICIES[max(matches, key=len)]
+
+
+# ── Verified stamps ───────────────────────────────────────────────────────────
+# VERIFIED_PREFIX + key → {"stamp": payload timestamp, "verified_at": ...},
+# written by batch refreshes. While an entry still holds the payload that was
+# verified, its age counts from the verification; any rewrite changes the
+# payload timestamp and supersedes it. One record per key, so concurrent jobs
+# never overwrite each other's stamps and there is nothing to prune.
+VERIFIED_PREFIX = "verified:"
+# How long a worker trusts its copy of a key's record before re-reading it
+VERIFIED_STAMPS_TTL_SECONDS = float(os.environ.get("VERIFIED_STAMPS_TTL_SECONDS", "60"))
+_VERIFIED_MEMO_SIZE = int(os.environ.get("VERIFIED_STAMPS_MEMO_SIZE", "4096"))
+# key → (stamp, verified at), or None when the key has no record
+_verified_memo = memo.MemoCache("verified_stamps", _VERIFIED_MEMO_SIZE, ttl=VERIFIED_STAMPS_TTL_SECONDS)
+_UNKNOWN = object()
+
+
+def _read_verifications(keys: list[str]) -> dict[str, tuple[str, str] | None]:
+    """Verification records of `keys`, read from the cache (blocking) and memoized."""
+    found = get_many([VERIFIED_PREFIX + key for key in keys])
+    records: dict[str, tuple[str, str] | None] = {}
+    for key in keys:
+        value = found.get(VERIFIED_PREFIX + key)
+        records[key] = (value["stamp"], value["verified_at"]) if isinstance(value, dict) else None
+        _verified_memo.set(key, records[key])
+    return records
+
+
+def _verification(key: str) -> tuple[str, str] | None:
+    record = _verified_memo.get(key, _UNKNOWN)
+    return _read_verifications([key])[key] if record is _UNKNOWN else record
+
+
+def _own_stamp(value: Any, policy: FreshnessPolicy) -> str | None:
+    if not isinstance(value, dict) or not value.get(policy.timestamp_field):
+        return None
+    return value[policy.timestamp_field]
+
+
+def _needs_verification(key: str, stamp: str | None, policy: FreshnessPolicy) -> bool:
+    """A stamped entry past its TTL may have been verified since; a fresh one cannot be fresher."""
+    age = _age(stamp)
+    return age is not None and age >= _effective_ttl(key, stamp, policy)
+
+
+def _stamp(
+    key: str,
+    value: Any,
+    policy: FreshnessPolicy,
+    verification: Callable[[str], tuple[str, str] | None] = _verification,
+) -> str | None:
+    """
+    When `value` was last known current: its own timestamp, or its later
+    verification. `verification` looks up a key's record; the default may
+    read the cache, so async callers pass records they resolved off the loop.
+    """
+    stamp = _own_stamp(value, policy)
+    if not _needs_verification(key, stamp, policy):
+        return stamp
+    record = verification(key)
+    if record and record[0] == stamp:
+        return record[1]
+    return stamp
+
+
+async def _averifications(found: dict[str, Any]) -> Callable[[str], tuple[str, str] | None]:
+    """
+    Resolve, on the cache pool, the verification records _classify() needs
+    for these entries, so classifying them on the event loop does no I/O.
+    """
+    records: dict[str, tuple[str, str] | None] = {}
+    unknown: list[str] = []
+    for key, value in found.items():
+        policy = policy_for(key)
+        if _needs_verification(key, _own_stamp(value, policy), policy):
+            record = _verified_memo.get(key, _UNKNOWN)
+            if record is _UNKNOWN:
+                unknown.append(key)
+            else:
+                records[key] = record
+    if unknown:
+        records.update(await upstream.run("cache", _read_verifications, unknown))
+    return records.get
+
+
+def content_body(value: dict, timestamp_field: str = "cached_at") -> bytes:
+    """A payload encoded (uncompressed) without its timestamp: what content_digest() hashes."""
+    return codec.encode({k: v for k, v in value.items() if k != timestamp_field}, compression="none")
+
+
+def body_digest(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def content_digest(value: dict, timestamp_field: str = "cached_at") -> str:
+    """Digest of a payload without its timestamp; equal for payloads holding the same data."""
+    return body_digest(content_body(value, timestamp_field))
+
+
+def record_verified(stamps: dict[str, str]) -> None:
+    """
+    Mark entries a batch refresh found unchanged as current as of now.
+
+    `stamps` maps each key to the timestamp of the cached payload that was
+    checked.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    set_many({VERIFIED_PREFIX + key: {"stamp": stamp, "verified_at": now} for key, stamp in stamps.items()})
+    for key, stamp in stamps.items():
+        _verified_memo.set(key, (stamp, now))
+
+
+def _age(stamp: str | None) -> timedelta | None:
+    """Age of an ISO-8601 timestamp; None if missing or unparseable."""
+    if not stamp:
+        return None
+    try:
+        stamped = datetime.fromisoformat(stamp)
+    except (TypeError, ValueError):
+        return None
+    if stamped.tzinfo is None:
+        stamped = stamped.replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc) - stamped
+
+
+def _effective_ttl(key: str, stamp: str | None, policy: FreshnessPolicy) -> timedelta:
+    """
+    The policy TTL shortened by up to CACHE_TTL_JITTER. The share is derived
+    from the key and the payload's timestamp, so every worker agrees on it
+    for a given write while entries written together still spread out.
+    """
+    digest = hashlib.blake2b(f"{key}|{stamp}".encode(), digest_size=8).digest()
+    share = int.from_bytes(digest, "big") / 2**64
+    return policy.ttl * (1 - CACHE_TTL_JITTER * share)
+
+
+def _refresh_early(key: str, remaining: timedelta) -> bool:
+    """XFetch: refresh if delta * beta * -ln(U) reaches the time left before expiry."""
+    delta = _recompute_seconds.get(family(key))
+    if not delta or CACHE_XFETCH_BETA <= 0:
+        return False
+    return -delta * CACHE_XFETCH_BETA * math.log(1.0 - random.random()) >= remaining.total_seconds()
+
+
+def _record_recompute(key: str, seconds: float) -> None:
+    fam = family(key)
+    with _refresh_lock:
+        previous = _recompute_seconds.get(fam)
+        _recompute_seconds[fam] = seconds if previous is None else (
+            previous + _RECOMPUTE_SMOOTHING * (seconds - previous)
+        )
+
+
+def _load(key: str, loader: Callable[[], Any]) -> Any:
+    started = time.perf_counter()
+    value = loader()
+    _record_recompute(key, time.perf_counter() - started)
+    set(key, value)
+    return value
+
+
+def _is_fresh(key: str, value: Any) -> bool:
+    """Within its (jittered) TTL; unlike _classify() this records nothing."""
+    policy = policy_for(key)
+    stamp = _stamp(key, value, policy)
+    age = _age(stamp)
+    return age is not None and age < _effective_ttl(key, stamp, policy)
+
+
+def _load_unless_fresh(key: str, loader: Callable[[], Any]) -> Any:
+    """
+    Blocking load for callers that found `key` missing or expired. Another
+    caller (or worker) may have loaded it since they looked, so re-read first.
+    """
+    value = get(key)
+    if value is not None and _is_fresh(key, value):
+        return value
+    return _load(key, loader)
+
+
+def _count(stat: str) -> None:
+    with _refresh_lock:
+        _freshness_stats[stat] += 1
+
+
+def _refresh_in_background(key: str, loader: Callable[[], Any], provider: str) -> None:
+    """Run `loader` on `provider`'s pool unless a refresh of `key` is running or recently failed."""
+    with _refresh_lock:
+        if key in _refreshing:
+            return
+        failed_at = _refresh_failed_at.get(key)
+        if failed_at is not None and time.monotonic() - failed_at < CACHE_REFRESH_RETRY_SECONDS:
+            _freshness_stats["refresh_backoffs"] += 1
+            return
+        future = upstream.submit_on(provider, singleflight.do, key, lambda: _load(key, loader))
+        _refreshing[key] = future
+
+    def _done(f: Future) -> None:
+        with _refresh_lock:
+            _refreshing.pop(key, None)
+            if f.exception() is None:
+                _refresh_failed_at.pop(key, None)
+            else:
+                # Keep serving the stale copy; requests past TTL retry after the cool-down.
+                _refresh_failed_at[key] = time.monotonic()
+                _freshness_stats["refresh_failures"] += 1
+
+    future.add_done_callback(_done)
+
+
+def _classify(
+    key: str,
+    value: Any,
+    verification: Callable[[str], tuple[str, str] | None] = _verification,
+) -> str:
+    """'fresh', 'stale' (serve, refresh in background) or 'expired' (block on loader)."""
+    policy = policy_for(key)
+    stamp = _stamp(key, value, policy, verification)
+    age = _age(stamp)
+    if age is not None:
+        remaining = _effective_ttl(key, stamp, policy) - age
+        if remaining > timedelta(0):
+            if _refresh_early(key, remaining):
+                _count("early_refreshes")
+                return "stale"
+            _count("fresh")
+            return "fresh"
+    if age is not None and age < policy.max_stale:
+        _count("stale_served")
+        return "stale"
+    _count("blocking_loads")
+    return "expired"
+
+
+async def aget(key: str) -> Any | None:
+    """get() for async handlers: L1 hits return inline, backend reads go to the cache pool."""
+    hit, value = _l1_get(key)
+    if hit:
+        return value
+    return await upstream.run("cache", get, key)
+
+
+# Blocking loads awaited by async handlers, one per key: concurrent requests
+# share the leader's future on the event loop instead of each holding a pool
+# thread while they wait.
+_async_loads: dict[str, asyncio.Future] = {}
+
+
+def _track_load(key: str, future: asyncio.Future) -> None:
+    _async_loads[key] = future
+
+    def _done(f: asyncio.Future) -> None:
+        if _async_loads.get(key) is f:
+            del _async_loads[key]
+        if not f.cancelled():
+            f.exception()   # retrieved, even if every waiter has gone
+
+    future.add_done_callback(_done)
+
+
+def _joinable(key: str, loop: asyncio.AbstractEventLoop) -> asyncio.Future | None:
+    """The in-flight aload() of `key` on this loop, if any (counted as coalesced)."""
+    future = _async_loads.get(key)
+    if future is None or future.get_loop() is not loop:
+        return None
+    singleflight.count_coalesced(key)
+    return future
+
+
+async def aload(key: str, loader: Callable[[], Any], provider: str) -> Any:
+    """
+    Load `key` on `provider`'s pool, coalesced with every other aload() of it
+    in this worker (and, through singleflight, with background refreshes).
+    """
+    loop = asyncio.get_running_loop()
+    future = _joinable(key, loop)
+    if future is None:
+        future = loop.create_task(
+            upstream.run(provider, singleflight.do, key, lambda: _load_unless_fresh(key, loader))
+        )
+        _track_load(key, future)
+    # A waiter that is cancelled (client gone) must not cancel the shared load
+    return await asyncio.shield(future)
+
+
+def _load_many_unless_fresh(keys: list[str], load_many: Callable[[list[str]], dict[str, Any]]) -> dict[str, Any]:
+    values = {key: value for key, value in get_many(keys).items() if _is_fresh(key, value)}
+    rest = [key for key in keys if key not in values]
+    if rest:
+        loaded = load_many(rest)
+        set_many({key: value for key, value in loaded.items() if not isinstance(value, BaseException)})
+        values.update(loaded)
+    return values
+
+
+async def aload_many(
+    keys: list[str],
+    load_many: Callable[[list[str]], dict[str, Any]],
+    provider: str,
+) -> dict[str, Any]:
+    """
+    aload() for several keys with one batched upstream call.
+
+    Keys another request is already loading are awaited; the rest are
+    registered as in flight (so aload() of any of them joins this batch) and
+    loaded by one `load_many(keys)` on `provider`'s pool. `load_many` returns
+    {key: value} and may map a key to the exception it failed with. Returns
+    {key: value or exception} for every key; a failed batch fails each key.
+    """
+    loop = asyncio.get_running_loop()
+    futures: dict[str, asyncio.Future] = {}
+    leading: dict[str, asyncio.Future] = {}
+    for key in dict.fromkeys(keys):
+        future = _joinable(key, loop)
+        if future is None:
+            future = leading[key] = loop.create_future()
+            _track_load(key, future)
+        futures[key] = future
+
+    if leading:
+        def _settle(batch: asyncio.Future) -> None:
+            if batch.cancelled():
+                for future in leading.values():
+                    future.cancel()
+                return
+            error = batch.exception()
+            results = batch.result() if error is None else {}
+            for key, future in leading.items():
+                value = results.get(key, error or LookupError(f"{key} was not loaded"))
+                if isinstance(value, BaseException):
+                    future.set_exception(value)
+                else:
+                    future.set_result(value)
+
+        batch = loop.create_task(upstream.run(provider, _load_many_unless_fresh, list(leading), load_many))
+        batch.add_done_callback(_settle)
+
+    results = await asyncio.gather(*(asyncio.shield(f) for f in futures.values()), return_exceptions=True)
+    return dict(zip(futures, results))
+
+
+async def aget_or_refresh(key: str, loader: Callable[[], Any], provider: str) -> Any:
+    """
+    Return the cached payload for `key`, honouring its family's freshness policy.
+
+    `loader` fetches from upstream and returns the payload to cache; it must
+    stamp the policy's timestamp field. Background refreshes and blocking
+    loads run on `provider`'s pool. Loader errors propagate only when the
+    caller had to block (no entry, or the entry is past max staleness).
+    """
+    value = await aget(key)
+    state = _classify(key, value, await _averifications({key: value}))
+    if state == "stale":
+        _refresh_in_background(key, loader, provider)
+    if state != "expired":
+        return value
+    return await aload(key, loader, provider)
+
+
+async def aget_many(keys: list[str]) -> dict[str, Any]:
+    """get_many() for async handlers: only L1 misses go to the cache pool."""
+    values: dict[str, Any] = {}
+    pending: list[str] = []
+    for key in dict.fromkeys(keys):
+        hit, value = _l1_get(key)
+        if hit:
+            values[key] = value
+        else:
+            pending.append(key)
+    if pending:
+        values.update(await upstream.run("cache", get_many, pending))
+    return values
+
+
+async def aget_many_or_refresh(
+    keys: list[str],
+    loader_for: Callable[[str], Callable[[], Any]],
+    provider: str,
+) -> tuple[dict[str, Any], list[str]]:
+    """
+    Bulk aget_or_refresh() that leaves blocking loads to the caller.
+
+    Returns the servable entries (fresh, or stale with a background refresh
+    started via `loader_for(key)` on `provider`'s pool) and the keys that are
+    missing or past max staleness, so the caller can load those together in
+    one upstream batch.
+    """
+    found = await aget_many(keys)
+    verification = await _averifications(found)
+    values: dict[str, Any] = {}
+    expired: list[str] = []
+    for key in dict.fromkeys(keys):
+        value = found.get(key)
+        state = _classify(key, value, verification)
+        if state == "stale":
+            _refresh_in_background(key, loader_for(key), provider)
+        if state == "expired":
+            expired.append(key)
+        else:
+            values[key] = value
+    return values, expired
+
+
+def freshness_stats() -> dict[str, int]:
+    with _refresh_lock:
+        return dict(_freshness_stats)
+
+
+def recompute_seconds() -> dict[str, float]:
+    """Smoothed loader duration per key family (the XFetch delta)."""
+    with _refresh_lock:
+        return dict(_recompute_seconds)
+
+
+# ── Encoded response bodies ──────────────────────────────────────────────────
+
+class Encoded(NamedTuple):
+    body: bytes
+    etag: str   # strong validator: quoted content hash
+
+
+_ENCODED_MAX_SIZE = int(os.environ.get("ENCODED_CACHE_MAX_SIZE", "256"))
+_encoded = memo.MemoCache("encoded", max_entries=_ENCODED_MAX_SIZE)   # key → (version, Encoded)
+
+
+def encode_body(body: bytes) -> Encoded:
+    return Encoded(body, '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"')
+
+
+def memoized_encoded(key: str, version: str) -> Encoded | None:
+    """The body encoded() memoized for `key` at `version`, if any (never renders)."""
+    hit = _encoded.get(key)
+    return hit[1] if hit is not None and hit[0] == version else None
+
+
+def encoded(key: str, version: str | None, render: Callable[[], bytes]) -> Encoded:
+    """
+    Encoded body + ETag for `key` at `version` (usually the payload's timestamp).
+
+    `render` runs only when the memoized body is missing or from another
+    version. Unversioned payloads are rendered every time.
+    """
+    if not version:
+        return encode_body(render())
+    hit = memoized_encoded(key, version)
+    if hit is not None:
+        return hit
+
+    result = encode_body(render())
+    _encoded.set(key, (version, result))
+    return result
+
+
+# ── Scrape-time metrics ───────────────────────────────────────────────────────
+
+def _collect_metrics() -> list[metrics.MetricFamily]:
+    """Stats the cache already keeps, as metric families for /metrics."""
+    l1 = l1_stats()
+    requests = _requests.collect()
+    for fam, counters in l1["families"].items():
+        for result, field in (("hit", "hits"), ("miss", "misses")):
+            requests.samples.append(
+                metrics.Sample(requests.name, {"tier": "l1", "family": fam, "result": result}, counters[field])
+            )
+    families = [
+        requests,
+        metrics.counter_family(
+            "chronostock_cache_l1_evictions_total", "L1 entries evicted to stay within budget, by key family.",
+            (({"family": fam}, c["evictions"]) for fam, c in l1["families"].items()),
+        ),
+        metrics.counter_family(
+            "chronostock_cache_l1_expirations_total", "L1 entries dropped on read after expiring, by key family.",
+            (({"family": fam}, c["expirations"]) for fam, c in l1["families"].items()),
+        ),
+        metrics.gauge(
+            "chronostock_cache_l1_entries", "Entries held in L1, by key family.",
+            (({"family": fam}, c["entries"]) for fam, c in l1["families"].items()),
+        ),
+        metrics.gauge(
+            "chronostock_cache_l1_bytes", "Approximate bytes held in L1, by key family.",
+            (({"family": fam}, c["bytes"]) for fam, c in l1["families"].items()),
+        ),
+        metrics.gauge(
+            "chronostock_cache_l1_max_bytes", "L1 byte budget.", [({}, l1["max_bytes"])]
+        ),
+        metrics.counter_family(
+            "chronostock_cache_freshness_total", "aget_or_refresh outcomes by freshness state.",
+            (({"state": state}, count) for state, count in freshness_stats().items()),
+        ),
+        metrics.gauge(
+            "chronostock_cache_recompute_seconds", "Smoothed loader duration by key family.",
+            (({"family": fam}, seconds) for fam, seconds in recompute_seconds().items()),
+        ),
+    ]
+    if CACHE_BACKEND in ("s3", "tiered"):
+        families.append(metrics.counter_family(
+            "chronostock_cache_s3_total", "S3 operations, 304 revalidations and bytes moved.",
+            (({"counter": name}, value) for name, value in s3_stats().items()),
+        ))
+    write_behind = write_behind_stats()
+    if write_behind is not None:
+        families.append(metrics.gauge(
+            "chronostock_cache_write_behind", "S3 write-behind queue depth and batch counters.",
+            (({"stat": name}, value) for name, value in write_behind.items()),
+        ))
+    shm = shm_stats()
+    if shm is not None:
+        families.append(metrics.gauge(
+            "chronostock_cache_shm", "Shared-memory tier counters of this worker.",
+            (({"stat": name}, value) for name, value in shm.items()),
+        ))
+    return families
+
+
+metrics.register_collector(_collect_metrics)
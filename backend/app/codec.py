@@ -0,0 +1,165 @@
+"""
+Binary serialization for cache values.
+
+Every backend (local disk, S3, Redis, the shared-memory tier) stores values
+as a small framed byte string:
+
+    magic (3) | format version (1) | codec id (1) | compression id (1) | payload
+
+The codec (CACHE_CODEC) is msgpack when it is installed, JSON otherwise;
+payloads of at least CACHE_COMPRESS_MIN_BYTES are compressed with
+CACHE_COMPRESSION (zstd when installed, zlib otherwise, or none). The ids in
+the header describe how each entry was written, so readers decode anything
+regardless of the current settings, and changing them needs no migration.
+
+Entries without the magic prefix are legacy plain-JSON values written before
+the frame existed and are decoded as JSON.
+"""
+import json
+import os
+import zlib
+from typing import Any, Callable, NamedTuple
+
+MAGIC = b"\xc5CS"   # 0xC5 can never start a JSON document, so legacy entries are unambiguous
+FORMAT_VERSION = 1
+_HEADER_SIZE = len(MAGIC) + 3
+
+CACHE_CODEC = os.environ.get("CACHE_CODEC", "msgpack")
+CACHE_COMPRESSION = os.environ.get("CACHE_COMPRESSION", "zstd")
+CACHE_COMPRESS_MIN_BYTES = int(os.environ.get("CACHE_COMPRESS_MIN_BYTES", "1024"))
+CACHE_ZSTD_LEVEL = int(os.environ.get("CACHE_ZSTD_LEVEL", "3"))
+
+CONTENT_TYPE = "application/octet-stream"
+
+
+class CodecError(ValueError):
+    """A framed entry that cannot be decoded here (corrupt, or written by a newer format / missing library)."""
+
+
+class _Codec(NamedTuple):
+    id: int
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[bytes], Any]
+
+
+class _Compression(NamedTuple):
+    id: int
+    compress: Callable[[bytes], bytes]
+    decompress: Callable[[bytes], bytes]
+
+
+def _json_codec() -> _Codec:
+    return _Codec(
+        1,
+        lambda value: json.dumps(value, separators=(",", ":")).encode(),
+        lambda raw: json.loads(bytes(raw)),
+    )
+
+
+def _msgpack_codec() -> _Codec:
+    import msgpack  # type: ignore
+
+    return _Codec(
+        2,
+        lambda value: msgpack.packb(value, use_bin_type=True),
+        lambda raw: msgpack.unpackb(raw, raw=False, strict_map_key=False),
+    )
+
+
+def _identity() -> _Compression:
+    return _Compression(0, lambda raw: raw, lambda raw: raw)
+
+
+def _zlib() -> _Compression:
+    return _Compression(1, lambda raw: zlib.compress(raw, 1), zlib.decompress)
+
+
+def _zstd() -> _Compression:
+    import zstandard  # type: ignore
+
+    # (De)compressor objects are not safe to share between threads; they are cheap to build per call
+    return _Compression(
+        2,
+        lambda raw: zstandard.ZstdCompressor(level=CACHE_ZSTD_LEVEL).compress(raw),
+        lambda raw: zstandard.ZstdDecompressor().decompress(raw),
+    )
+
+
+_CODEC_FACTORIES: dict[str, Callable[[], _Codec]] = {"json": _json_codec, "msgpack": _msgpack_codec}
+_COMPRESSION_FACTORIES: dict[str, Callable[[], _Compression]] = {
+    "none": _identity,
+    "zlib": _zlib,
+    "zstd": _zstd,
+}
+# Used when the configured optional library is not installed
+_CODEC_FALLBACK = {"msgpack": "json"}
+_COMPRESSION_FALLBACK = {"zstd": "zlib"}
+
+
+def _load(name: str, factories: dict[str, Callable], fallback: dict[str, str]) -> tuple[str, Any]:
+    if name not in factories:
+        raise ValueError(f"unknown cache codec setting: {name!r}")
+    try:
+        return name, factories[name]()
+    except ImportError:
+        return _load(fallback[name], factories, fallback)
+
+
+def _available(factories: dict[str, Callable]) -> dict[str, Any]:
+    loaded = {}
+    for name, factory in factories.items():
+        try:
+            loaded[name] = factory()
+        except ImportError:
+            continue
+    return loaded
+
+
+_codecs = _available(_CODEC_FACTORIES)
+_compressions = _available(_COMPRESSION_FACTORIES)
+_codecs_by_id = {c.id: c for c in _codecs.values()}
+_compressions_by_id = {c.id: c for c in _compressions.values()}
+
+codec_name, _codec = _load(CACHE_CODEC, _CODEC_FACTORIES, _CODEC_FALLBACK)
+compression_name, _compression = _load(CACHE_COMPRESSION, _COMPRESSION_FACTORIES, _COMPRESSION_FALLBACK)
+
+
+def available() -> tuple[list[str], list[str]]:
+    """Names of the codecs and compressions installed in this process."""
+    return list(_codecs), list(_compressions)
+
+
+def encode(value: Any, codec: str | None = None, compression: str | None = None) -> bytes:
+    """Frame `value` with the configured (or the named) codec and compression."""
+    fmt = _codec if codec is None else _codecs[codec]
+    packer = _compression if compression is None else _compressions[compression]
+    payload = fmt.dumps(value)
+    if len(payload) < CACHE_COMPRESS_MIN_BYTES:
+        packer = _compressions["none"]
+    return MAGIC + bytes((FORMAT_VERSION, fmt.id, packer.id)) + packer.compress(payload)
+
+
+def decode(raw: bytes | memoryview | str) -> Any:
+    """
+    Inverse of encode(); unframed input is read as a legacy JSON entry.
+
+    Accepts any buffer (e.g. a memoryview of an mmap) and decodes from it
+    without copying where the codec allows.
+    """
+    if isinstance(raw, str):
+        return json.loads(raw)
+    if bytes(raw[:len(MAGIC)]) != MAGIC:
+        return json.loads(bytes(raw))
+    if len(raw) < _HEADER_SIZE:
+        raise CodecError("truncated cache entry header")
+    version, codec_id, compression_id = raw[len(MAGIC):_HEADER_SIZE]
+    if version != FORMAT_VERSION:
+        raise CodecError(f"unsupported cache entry format version {version}")
+    fmt = _codecs_by_id.get(codec_id)
+    packer = _compressions_by_id.get(compression_id)
+    if fmt is None or packer is None:
+        raise CodecError(f"cache entry needs codec {codec_id} / compression {compression_id}, not installed")
+    try:
+        return fmt.loads(packer.decompress(raw[_HEADER_SIZE:]))
+    except Exception as e:  # the codec libraries raise their own error types
+        raise CodecError(f"corrupt cache entry: {e}") from e
@@ -4,14 +4,16 @@ SEC EDGAR integration — fetches 8-K filings and Form 4 insider transactions.
 Pipeline:
   ticker → CIK (via company_tickers.json) → submissions API → SECFiling list
 
-Rate limit: 10 req/sec. User-Agent header is required by SEC.
+The company titles in company_tickers.json also feed the local ticker
+search index (search.py).
+
+Rate limit: 10 req/sec, enforced by upstream.throttle("sec") before every
+request. User-Agent header is required by SEC.
 """
 
 import os
 
-import httpx
-
-from . import cache
+from . import cache, memo, singleflight, upstream
 from .models import SECFiling
 
 _email = os.environ.get("SEC_USER_AGENT_EMAIL", "")
@@ -37,20 +39,26 @@ ITEM_LABELS: dict[str, str] = {
 }
 
 
-def _get_cik(ticker: str) -> str | None:
-    """Return zero-padded 10-digit CIK for a ticker, or None if not found."""
-    CACHE_KEY = "sec:cik_map"
-
-    cached = cache.get(CACHE_KEY)
-    if cached:
-        ticker_map: dict[str, int] = cached["data"]
-        cik_int = ticker_map.get(ticker.upper())
-        if cik_int is None:
-            return None
-        return str(cik_int).zfill(10)
-
-    # Download the full ticker→CIK mapping from SEC
-    resp = httpx.get(
+CIK_MAP_KEY = "sec:cik_map"
+COMPANY_NAMES_KEY = "sec:company_names"
+
+# How long each worker reuses the decoded ticker → CIK / title maps before
+# reading them from the cache again
+TICKER_MAP_MEMO_SECONDS = float(os.environ.get("SEC_TICKER_MAP_MEMO_SECONDS", "3600"))
+_ticker_maps = memo.MemoCache("sec_ticker_maps", max_entries=2, ttl=TICKER_MAP_MEMO_SECONDS)
+
+
+def _download_company_tickers() -> dict[str, dict]:
+    """
+    Download SEC's ticker list and cache it as two entries, both in SEC's order:
+    CIK_MAP_KEY → {"data": {TICKER: cik_int}} and
+    COMPANY_NAMES_KEY → {"names": {TICKER: company title}}.
+
+    The titles make up most of the list, so keeping them apart leaves the CIK
+    map small enough to stay in L1 for the filings path.
+    """
+    upstream.throttle("sec")
+    resp = upstream.http_client().get(
         "https://www.sec.gov/files/company_tickers.json",
         headers=HEADERS,
         timeout=15,
@@ -58,17 +66,52 @@ def _get_cik(ticker: str) -> str | None:
     resp.raise_for_status()
     raw: dict = resp.json()
 
-    # Build a flat {TICKER: cik_int} map
-    ticker_map = {entry["ticker"].upper(): entry["cik_str"] for entry in raw.values()}
+    entries = [(entry["ticker"].upper(), entry) for entry in raw.values()]
+    maps = {
+        CIK_MAP_KEY: {"data": {ticker: entry["cik_str"] for ticker, entry in entries}},
+        COMPANY_NAMES_KEY: {"names": {ticker: entry.get("title") or ticker for ticker, entry in entries}},
+    }
+    cache.set_many(maps)
+    for key, value in maps.items():
+        _ticker_maps.set(key, value)
+    return maps
 
-    cache.set(CACHE_KEY, {"data": ticker_map})
 
+def _load_ticker_maps() -> dict[str, dict]:
+    memoized = {key: _ticker_maps.get(key) for key in (CIK_MAP_KEY, COMPANY_NAMES_KEY)}
+    if all(memoized.values()):   # a download finished just before this caller got here
+        return memoized
+    return _download_company_tickers()
+
+
+def _ticker_map(key: str, field: str) -> dict:
+    """
+    `field` of the cached map at `key` (memoized per worker). On a miss, one
+    caller downloads SEC's list while concurrent callers wait for it.
+    """
+    cached = _ticker_maps.get(key)
+    if cached is None:
+        cached = cache.get(key)
+        if not cached or field not in cached:
+            cached = singleflight.do("sec:company_tickers", _load_ticker_maps)[key]
+        _ticker_maps.set(key, cached)
+    return cached[field]
+
+
+def _get_cik(ticker: str) -> str | None:
+    """Return zero-padded 10-digit CIK for a ticker, or None if not found."""
+    ticker_map: dict[str, int] = _ticker_map(CIK_MAP_KEY, "data")
     cik_int = ticker_map.get(ticker.upper())
     if cik_int is None:
         return None
     return str(cik_int).zfill(10)
 
 
+def company_names() -> dict[str, str]:
+    """{TICKER: company title} for every ticker SEC lists, largest companies first."""
+    return _ticker_map(COMPANY_NAMES_KEY, "names")
+
+
 def fetch_sec_filings(ticker: str) -> list[SECFiling]:
     """
     Fetch recent 8-K and Form 4 filings for a ticker from SEC EDGAR.
@@ -78,7 +121,8 @@ def fetch_sec_filings(ticker: str) -> list[SECFiling]:
     if not cik:
         return []
 
-    resp = httpx.get(
+    upstream.throttle("sec")
+    resp = upstream.http_client().get(
         f"https://data.sec.gov/submissions/CIK{cik}.json",
         headers=HEADERS,
         timeout=15,
@@ -0,0 +1,383 @@
+"""
+In-process L1 cache: LRU bounded by approximate bytes, with per-key expiry.
+
+Entries are charged by an estimate of their in-memory size, so one large
+`stock:` history counts for what it weighs instead of as one slot next to a
+tiny `price:` quote. Each key family (the text before the first ':') can be
+capped to a share of the byte budget, so a burst of one family cannot flush
+the whole hot set. Expired entries are dropped on read rather than served.
+
+Counters (hits, misses, evictions, expirations) are kept per family.
+
+L1Cache itself is single-threaded. ShardedL1Cache is the thread-safe variant
+used by cache.py: keys are hashed onto independent shards, each with its own
+lock, so concurrent handler threads only contend when they hit the same shard.
+Budgets are enforced across all shards, not split between them.
+
+The trade-off, single-threaded (see microbenchmark.py): a sharded get() costs
+roughly 1.5-1.8x an unlocked L1Cache.get(), about half a microsecond, nearly
+all of it the lock; a set() costs about 1.4x. Under the GIL, sharding does not
+make reads parallel. What it buys is that a thread preempted while holding a
+lock, or busy evicting, stalls only the readers of its own shard instead of
+every handler thread.
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, NamedTuple
+
+_SCALAR_SIZE = 24     # CPython float; small ints / bools are shared or similar
+_STR_OVERHEAD = 49
+_CONTAINER_OVERHEAD = 64
+_POINTER_SIZE = 8
+
+
+def approx_size(value: Any) -> int:
+    """
+    Estimate the in-memory footprint of a JSON-like value in bytes.
+
+    Lists whose first element is a scalar are charged as homogeneous without
+    walking every element, which keeps sizing a 15k-bar columnar history cheap.
+    """
+    if isinstance(value, str):
+        return _STR_OVERHEAD + len(value)
+    if isinstance(value, dict):
+        return _CONTAINER_OVERHEAD + sum(approx_size(k) + approx_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        size = _CONTAINER_OVERHEAD + _POINTER_SIZE * len(value)
+        if not value:
+            return size
+        first = value[0]
+        if isinstance(first, str):
+            return size + len(value) * approx_size(first)
+        if not isinstance(first, (dict, list, tuple)):
+            return size + len(value) * _SCALAR_SIZE
+        return size + sum(approx_size(item) for item in value)
+    if isinstance(value, (bytes, bytearray)):
+        return _CONTAINER_OVERHEAD + len(value)
+    return _SCALAR_SIZE
+
+
+def family(key: str) -> str:
+    return key.split(":", 1)[0]
+
+
+class _Entry(NamedTuple):
+    value: Any
+    size: int
+    expires_at: float | None
+    stats: "_FamilyStats"                 # the family's counters and LRU order, kept on
+    order: "OrderedDict[str, None]"       # the entry so a hit needs no family lookups
+
+
+class _FamilyStats:
+    __slots__ = ("hits", "misses", "evictions", "expirations", "entries", "bytes")
+
+    def __init__(self) -> None:
+        self.hits = self.misses = self.evictions = self.expirations = 0
+        self.entries = self.bytes = 0
+
+    def snapshot(self) -> dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class L1Cache:
+    """
+    LRU keyed by string, bounded by `max_bytes` and `max_entries`.
+
+    `family_quotas` maps a key family to the largest share (0–1) of
+    `max_bytes` it may hold; families not listed are bounded only by the
+    overall budget. Not thread-safe; callers serialize access.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        max_entries: int,
+        family_quotas: dict[str, float] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.family_quotas = dict(family_quotas or {})
+        self._clock = clock
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        # Per-family LRU order, so a family over quota evicts its own oldest key in O(1)
+        self._by_family: defaultdict[str, OrderedDict[str, None]] = defaultdict(OrderedDict)
+        self._stats: defaultdict[str, _FamilyStats] = defaultdict(_FamilyStats)
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def keys(self) -> list[str]:
+        """Keys from least to most recently used."""
+        return list(self._entries)
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        """Return (hit, value); a hit becomes most-recently-used."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self._stats[family(key)].misses += 1
+            return False, None
+        stats = entry.stats
+        if entry.expires_at is not None and entry.expires_at <= self._clock():
+            self._remove(key)
+            stats.expirations += 1
+            stats.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        entry.order.move_to_end(key)
+        stats.hits += 1
+        return True, entry.value
+
+    def set(self, key: str, value: Any, ttl: float | None = None, size: int | None = None) -> None:
+        """
+        Insert or replace `key`. `ttl` is in seconds (None = no expiry); a
+        non-positive ttl, or a value larger than its budget, is not cached.
+        """
+        if key in self._entries:
+            self._remove(key)
+        fam = family(key)
+        size = approx_size(value) if size is None else size
+        limit = self._family_limit(fam)
+        if (ttl is not None and ttl <= 0) or size > limit:
+            return
+
+        expires_at = self._clock() + ttl if ttl is not None else None
+        stats = self._stats[fam]
+        order = self._by_family[fam]
+        self._entries[key] = _Entry(value, size, expires_at, stats, order)
+        order[key] = None
+        self._bytes += size
+        stats.entries += 1
+        stats.bytes += size
+
+        while stats.bytes > limit:
+            self._evict(next(iter(order)))
+        while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)))
+
+    def pop(self, key: str) -> None:
+        if key in self._entries:
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_family.clear()
+        self._stats.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "families": {fam: stats.snapshot() for fam, stats in self._stats.items()},
+        }
+
+    def _family_limit(self, fam: str) -> float:
+        share = self.family_quotas.get(fam)
+        return self.max_bytes if share is None else self.max_bytes * share
+
+    def family_bytes(self, fam: str) -> int:
+        stats = self._stats.get(fam)
+        return stats.bytes if stats is not None else 0
+
+    def evict_oldest(self, fam: str | None = None, keep: str | None = None) -> bool:
+        """
+        Evict the least recently used entry (of `fam`, if given). False if
+        there is none, or if the oldest is `keep`.
+        """
+        order = self._entries if fam is None else self._by_family.get(fam)
+        if not order:
+            return False
+        oldest = next(iter(order))
+        if oldest == keep:
+            return False
+        self._evict(oldest)
+        return True
+
+    def _evict(self, key: str) -> None:
+        self._entries[key].stats.evictions += 1
+        self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        entry.order.pop(key, None)
+        self._bytes -= entry.size
+        entry.stats.entries -= 1
+        entry.stats.bytes -= entry.size
+
+
+class ShardedL1Cache:
+    """
+    Thread-safe L1 made of `shards` L1Caches, each behind its own lock.
+
+    Only storage and LRU order are sharded. The byte, entry and family budgets
+    stay global: any entry that fits the whole cache fits, and hot keys that
+    hash to the same shard do not evict each other while other shards have
+    room. A set() that takes the cache over a budget evicts the least recently
+    used entry of the shard holding the most of the over-budget family (or
+    bytes), under one eviction lock. LRU order is per shard, which approximates
+    a global LRU once shards hold more than a handful of entries.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        max_entries: int,
+        family_quotas: dict[str, float] | None = None,
+        shards: int = 8,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.family_quotas = dict(family_quotas or {})
+        # Each shard gets the full budgets; this class enforces them across shards
+        self._shards = [L1Cache(max_bytes, max_entries, family_quotas, clock) for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._slots = list(zip(self._shards, self._locks))
+        self._evict_lock = threading.Lock()
+        # Upper bounds on the global totals: raised by every set(), brought back
+        # to the exact sums across shards only when one of them crosses a budget
+        self._bounds_lock = threading.Lock()
+        self._bound_bytes = 0
+        self._bound_entries = 0
+        self._bound_family: dict[str, int] = {}
+        self._nslots = len(self._slots)
+
+    def _slot(self, key: str) -> tuple[L1Cache, threading.Lock]:
+        return self._slots[hash(key) % self._nslots]
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    def __contains__(self, key: str) -> bool:
+        shard, lock = self._slot(key)
+        with lock:
+            return key in shard
+
+    def keys(self) -> list[str]:
+        """Keys shard by shard, least to most recently used within each."""
+        keys: list[str] = []
+        for shard, lock in self._slots:
+            with lock:
+                keys.extend(shard.keys())
+        return keys
+
+    @property
+    def bytes(self) -> int:
+        return sum(shard.bytes for shard in self._shards)
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        # The hottest path: _slot() is inlined, and acquire()/release() is
+        # measurably cheaper than `with lock:` here
+        shard, lock = self._slots[hash(key) % self._nslots]
+        lock.acquire()
+        try:
+            return shard.get(key)
+        finally:
+            lock.release()
+
+    def set(self, key: str, value: Any, ttl: float | None = None, size: int | None = None) -> None:
+        # Size the value before taking the lock; it is the expensive part
+        size = approx_size(value) if size is None else size
+        shard, lock = self._slot(key)
+        with lock:
+            shard.set(key, value, ttl=ttl, size=size)
+        fam = family(key)
+        # Entries only leave between checks, so the bounds can only overestimate;
+        # while they fit, the cache does too and no shard needs to be summed
+        with self._bounds_lock:
+            self._bound_bytes += size
+            self._bound_entries += 1
+            fam_bytes = self._bound_family[fam] = self._bound_family.get(fam, 0) + size
+            if self._within_budgets(fam, fam_bytes, self._bound_bytes, self._bound_entries):
+                return
+        self._enforce_budgets(key, fam)
+
+    def _within_budgets(self, fam: str, fam_bytes: int, size: int, entries: int) -> bool:
+        share = self.family_quotas.get(fam)
+        return (
+            (share is None or fam_bytes <= self.max_bytes * share)
+            and size <= self.max_bytes
+            and entries <= self.max_entries
+        )
+
+    def _totals(self, fam: str) -> tuple[int, int, int]:
+        """Exact bytes of `fam`, total bytes and total entries, summed over the shards."""
+        fam_bytes = size = entries = 0
+        for shard in self._shards:
+            fam_bytes += shard.family_bytes(fam)
+            size += shard.bytes
+            entries += len(shard)
+        return fam_bytes, size, entries
+
+    def _enforce_budgets(self, key: str, fam: str) -> None:
+        """Evict until the cache is within budget again, sparing `key`, just written."""
+        with self._evict_lock:
+            while True:
+                fam_bytes, size, entries = self._totals(fam)
+                share = self.family_quotas.get(fam)
+                if share is not None and fam_bytes > self.max_bytes * share:
+                    weight, evict_fam = (lambda shard: shard.family_bytes(fam)), fam
+                elif size > self.max_bytes:
+                    weight, evict_fam = (lambda shard: shard.bytes), None
+                elif entries > self.max_entries:
+                    weight, evict_fam = len, None
+                else:
+                    break
+                # The heaviest shard gives up its oldest entry, unless that is the new one
+                slots = sorted(self._slots, key=lambda slot: weight(slot[0]), reverse=True)
+                if not any(self._evict_from(slot, evict_fam, key) for slot in slots):
+                    break
+            # Concurrent set()s store before raising the bounds, so resetting to
+            # sums taken now can count them twice but never miss them
+            with self._bounds_lock:
+                self._bound_family[fam] = fam_bytes
+                self._bound_bytes = size
+                self._bound_entries = entries
+
+    @staticmethod
+    def _evict_from(slot: tuple[L1Cache, threading.Lock], fam: str | None, keep: str) -> bool:
+        shard, lock = slot
+        with lock:
+            return shard.evict_oldest(fam, keep)
+
+    def pop(self, key: str) -> None:
+        shard, lock = self._slot(key)
+        with lock:
+            shard.pop(key)
+
+    def clear(self) -> None:
+        for shard, lock in self._slots:
+            with lock:
+                shard.clear()
+
+    def stats(self) -> dict[str, Any]:
+        families: dict[str, dict[str, int]] = {}
+        entries = size = 0
+        for shard, lock in self._slots:
+            with lock:
+                snapshot = shard.stats()
+            entries += snapshot["entries"]
+            size += snapshot["bytes"]
+            for fam, counters in snapshot["families"].items():
+                total = families.setdefault(fam, dict.fromkeys(counters, 0))
+                for name, count in counters.items():
+                    total[name] += count
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "shards": len(self._shards),
+            "families": families,
+        }
@@ -7,12 +7,12 @@ Sources:
 """
 
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import as_completed
 from datetime import datetime, timezone, timedelta
 
-import httpx
 import yfinance as yf
 
+from . import upstream
 from .models import MacroCategory, IndicatorDataPoint, IndicatorHistory, MacroIndicator, MarketSummary
 
 FRED_API_KEY = os.environ.get("FRED_API_KEY", "")
@@ -32,7 +32,7 @@ def _fred_obs(series_id: str, limit: int, sort_order: str = "desc", observation_
     }
     if observation_start:
         params["observation_start"] = observation_start
-    r = httpx.get(FRED_BASE, params=params, timeout=15)
+    r = upstream.http_client().get(FRED_BASE, params=params, timeout=15)
     r.raise_for_status()
     return [o for o in r.json().get("observations", []) if o.get("value") not in (".", None, "")]
 
@@ -192,17 +192,16 @@ def fetch_market_summary() -> MarketSummary:
 
     # Execute all API calls in parallel
     results: dict[tuple[str, int], MacroIndicator | None] = {}
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        future_to_key = {
-            executor.submit(fn): (cat, idx)
-            for cat, idx, fn in tasks
-        }
-        for future in as_completed(future_to_key):
-            key = future_to_key[future]
-            try:
-                results[key] = future.result()
-            except Exception:
-                results[key] = None
+    future_to_key = {
+        upstream.submit(fn): (cat, idx)
+        for cat, idx, fn in tasks
+    }
+    for future in as_completed(future_to_key):
+        key = future_to_key[future]
+        try:
+            results[key] = future.result()
+        except Exception:
+            results[key] = None
 
     # Reassemble categories in original order
     category_order = [
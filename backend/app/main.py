@@ -1,23 +1,27 @@
+import hashlib
+import hmac
+import json
 import os
 import uuid
-from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
 load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent / ".env")
 from datetime import datetime, timezone
 from datetime import date, timedelta
-from typing import Literal
-from fastapi import FastAPI, HTTPException, Query, Depends, Request
+from typing import Callable, Literal
+from fastapi import FastAPI, HTTPException, Header, Query, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 
-from .models import OHLCBar, StockResponse, SearchResult, UserCreate, Token, WatchlistItem, TrendingItem, StockNews, EarningsDate, SECFiling, ForgotPasswordRequest, ResetPasswordRequest, MessageResponse, MarketSummary, MarketAnalysis, IndicatorHistory
-from .stock import fetch_bars, fetch_info, search_tickers, fetch_news, fetch_earnings_dates
+from .models import StockMeta, StockResponse, StockBatchResponse, SearchResult, UserCreate, Token, WatchlistItem, TrendingItem, StockNews, EarningsDate, SECFiling, ForgotPasswordRequest, ResetPasswordRequest, MessageResponse, MarketSummary, MarketAnalysis, IndicatorHistory
+from .stock import fetch_bars_many, fetch_info, fetch_info_many, refresh_bars, search_local, search_tickers, fetch_news, fetch_earnings_dates, stock_payload
+from .series import OHLCSeries
 from .edgar import fetch_sec_filings
-from . import cache
+from . import cache, memo, metrics, upstream
 from .database import init_db, get_conn, cursor as db_cursor, PH
 from .auth import hash_password, verify_password, create_token, get_current_user
 
@@ -35,6 +39,12 @@ app.add_middleware(SlowAPIMiddleware)
 def startup_event():
     init_db()
 
+
+@app.on_event("shutdown")
+def shutdown_event():
+    cache.flush_writes(cache.WRITE_BEHIND_SHUTDOWN_TIMEOUT_SECONDS)
+    upstream.close()
+
 # ── CORS ──────────────────────────────────────────────────────────────────────
 ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -84,11 +94,117 @@ RANGE_DAYS: dict[str, int] = {
 TimeRange = Literal["1W", "1M", "6M", "1Y", "5Y", "ALL"]
 
 
-def _filter_bars(bars: list[OHLCBar], range_key: str) -> list[OHLCBar]:
+def _range_start(series: OHLCSeries, range_key: str, today: date | None = None) -> int:
+    """Offset of the first bar inside the requested range (binary search on dates)."""
     if range_key == "ALL":
-        return bars
-    cutoff = (date.today() - timedelta(days=RANGE_DAYS[range_key])).isoformat()
-    return [b for b in bars if b.time >= cutoff]
+        return 0
+    cutoff = ((today or date.today()) - timedelta(days=RANGE_DAYS[range_key])).isoformat()
+    return series.start_index(cutoff)
+
+
+def _dumps(value) -> str:
+    # Same encoding Starlette's JSONResponse uses
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def _json_response(request: Request, encoded: cache.Encoded) -> Response:
+    """Raw JSON response with an ETag; 304 with no body when the client already has it."""
+    headers = {"ETag": encoded.etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), encoded.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=encoded.body, media_type="application/json", headers=headers)
+
+
+async def _cached_json(
+    request: Request,
+    key: str,
+    payload: dict,
+    render: Callable[[], object],
+    version_field: str = "cached_at",
+) -> Response:
+    """
+    Serve `render()` for a cached payload, encoding it once per payload version.
+    A memoized body is served inline; validating and encoding a new one runs
+    on a thread so cache hits elsewhere on the event loop do not wait on it.
+    """
+    version = payload.get(version_field)
+    encoded = cache.memoized_encoded(key, version) if version else None
+    if encoded is None:
+        encoded = await run_in_threadpool(cache.encoded, key, version, lambda: _dumps(render()).encode())
+    return _json_response(request, encoded)
+
+
+class _StockView:
+    """
+    A decoded stock entry plus per-range artifacts.
+
+    Range start offsets are resolved for every range key once per calendar
+    day, and each range's encoded bars array is memoized on first use, so a
+    warm request is a dict lookup plus a byte concatenation.
+    """
+    __slots__ = ("series", "head", "meta", "_ranges")
+
+    def __init__(self, series: OHLCSeries, head: bytes, meta: bytes) -> None:
+        self.series = series
+        self.head = head    # b'"ticker":...,"companyName":...,"assetType":...'
+        self.meta = meta    # encoded StockMeta or b"null"
+        self._ranges: tuple[date, dict[str, int], dict[str, tuple[bytes, bytes]]] | None = None
+
+    def _for_today(self) -> tuple[dict[str, int], dict[str, tuple[bytes, bytes]]]:
+        today = date.today()
+        ranges = self._ranges
+        if ranges is None or ranges[0] != today:
+            offsets = {key: _range_start(self.series, key, today) for key in (*RANGE_DAYS, "ALL")}
+            # Swap in one assignment so concurrent readers never see a mix of days
+            ranges = self._ranges = (today, offsets, {})
+        return ranges[1], ranges[2]
+
+    def rendered(self, range_key: str) -> bool:
+        """Whether bars(range_key) is memoized for today (cheap enough for the event loop)."""
+        ranges = self._ranges
+        return ranges is not None and ranges[0] == date.today() and range_key in ranges[2]
+
+    def bars(self, range_key: str) -> tuple[int, bytes, bytes]:
+        """(start offset, encoded bars JSON array, its digest) for a range key."""
+        offsets, bodies = self._for_today()
+        start = offsets[range_key]
+        memo = bodies.get(range_key)
+        if memo is None:
+            body = self.series.bars_json(start).encode()
+            memo = bodies[range_key] = (body, hashlib.blake2b(body, digest_size=16).digest())
+        return start, memo[0], memo[1]
+
+
+# Decoded stock entries keyed by (ticker, cached_at) so warm requests skip
+# rebuilding the arrays from the cached JSON columns.
+_STOCK_VIEW_MEMO_SIZE = int(os.environ.get("STOCK_VIEW_MEMO_SIZE", "32"))
+_stock_views = memo.MemoCache("stock_views", max_entries=_STOCK_VIEW_MEMO_SIZE)
+
+
+def _stock_view_key(cached: dict) -> tuple[str, str]:
+    return cached["ticker"], cached.get("cached_at") or ""
+
+
+def _build_stock_view(cached: dict) -> _StockView:
+    meta = cached.get("meta")
+    view = _StockView(
+        series=OHLCSeries.from_payload(cached["bars"]),
+        head=_dumps({
+            "ticker": cached["ticker"],
+            "companyName": cached["companyName"],
+            "assetType": cached.get("assetType", "equity"),
+        })[1:-1].encode(),
+        meta=_dumps(StockMeta.model_validate(meta).model_dump() if meta is not None else None).encode(),
+    )
+    _stock_views.set(_stock_view_key(cached), view)
+    return view
 
 
 # ── Routes ────────────────────────────────────────────────────────────────────
@@ -98,9 +214,87 @@ def health():
     return {"status": "ok"}
 
 
+# /metrics is off unless a scrape token is configured; scrapers send it as a bearer token
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint(authorization: str = Header(None)):
+    """Prometheus scrape target: cache tiers, freshness, upstream pools (this worker only)."""
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not authorization or not authorization.startswith("Bearer ") or not hmac.compare_digest(
+        authorization.removeprefix("Bearer ").encode(), METRICS_TOKEN.encode()
+    ):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def _stock_loader(ticker: str) -> Callable[[], dict]:
+    """Loader for one `stock:{ticker}` entry: bars and info fetched in parallel."""
+    def load() -> dict:
+        bars_future = upstream.submit(refresh_bars, ticker, cache.get(f"stock:{ticker}"))
+        info_future = upstream.submit(fetch_info, ticker)
+        bars = bars_future.result()
+        company_name, meta, asset_type = info_future.result()
+        return stock_payload(ticker, bars, company_name, meta, asset_type)
+    return load
+
+
+def _render_stock(view: _StockView, range_key: str, demo_events: list) -> cache.Encoded:
+    """StockResponse body for one ticker and range, plus its ETag."""
+    # Slice to the requested range in memory — no extra network call
+    start, bars, bars_digest = view.bars(range_key)
+    from_date = view.series.date_at(start) if start < len(view.series) else ""
+    events = _dumps([e.model_dump() for e in demo_events if e.time >= from_date]).encode()
+
+    # Key order matches StockResponse
+    body = b"".join((
+        b"{", view.head,
+        b',"bars":', bars,
+        b',"events":', events,
+        b',"meta":', view.meta, b"}",
+    ))
+    # Hash the small parts plus the memoized bars digest instead of the whole body
+    etag = '"' + hashlib.blake2b(b"".join((view.head, view.meta, bars_digest, events)), digest_size=16).hexdigest() + '"'
+    return cache.Encoded(body, etag)
+
+
+async def _arender_stock(cached: dict, range_key: str, demo_events: list) -> cache.Encoded:
+    """
+    _render_stock() for a cached payload. Inline when its view and range body
+    are memoized; decoding the bars and encoding a range (tens of ms for a
+    long history) otherwise runs on a thread, off the event loop.
+    """
+    view = _stock_views.get(_stock_view_key(cached))
+    if view is not None and view.rendered(range_key):
+        return _render_stock(view, range_key, demo_events)
+    return await run_in_threadpool(
+        lambda: _render_stock(view if view is not None else _build_stock_view(cached), range_key, demo_events)
+    )
+
+
+async def _arender_stocks(
+    payloads: dict[str, dict], range_key: str, demo_events: dict[str, list]
+) -> list[cache.Encoded]:
+    """_arender_stock() for a batch, in order: memoized ones inline, the rest together on one thread."""
+    views = {sym: _stock_views.get(_stock_view_key(cached)) for sym, cached in payloads.items()}
+    pending = [sym for sym, view in views.items() if view is None or not view.rendered(range_key)]
+    if pending:
+        def render_pending() -> dict[str, _StockView]:
+            for sym in pending:
+                view = views[sym] or _build_stock_view(payloads[sym])
+                view.bars(range_key)
+                views[sym] = view
+            return views
+
+        views = await run_in_threadpool(render_pending)
+    return [_render_stock(views[sym], range_key, demo_events[sym]) for sym in payloads]
+
+
 @app.get("/api/stock/{ticker}", response_model=StockResponse)
 @limiter.limit("60/minute")
-def get_stock(
+async def get_stock(
     request: Request,
     ticker: str,
     range: TimeRange = Query(default="1Y"),
@@ -108,224 +302,239 @@ def get_stock(
     ticker = ticker.upper()
     from .demo_events import get_demo_events
 
-    STOCK_CACHE_TTL_HOURS = 24
+    # One cache file per ticker — stores full columnar history + timestamp
+    try:
+        cached = await cache.aget_or_refresh(f"stock:{ticker}", _stock_loader(ticker), "yahoo")
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Data provider error: {e}")
 
-    # One cache file per ticker — stores full history + timestamp
-    cached = cache.get(f"stock:{ticker}")
-    cache_fresh = False
-    if cached is not None:
-        cached_at_str = cached.get("cached_at")
-        if cached_at_str:
-            cached_at = datetime.fromisoformat(cached_at_str)
-            if datetime.now(timezone.utc) - cached_at < timedelta(hours=STOCK_CACHE_TTL_HOURS):
-                cache_fresh = True
+    demo_events = await run_in_threadpool(get_demo_events, ticker)
+    return _json_response(request, await _arender_stock(cached, range, demo_events))
 
-    if cache_fresh:
-        full = StockResponse(**{k: v for k, v in cached.items() if k != "cached_at"})
-    else:
+
+MAX_BATCH_TICKERS = 25
+
+
+def _load_stocks(tickers: list[str]) -> dict[str, dict | Exception]:
+    """
+    Cold-load several tickers: one multi-ticker yf.download for all bars while
+    company info is fetched alongside in one yahooquery batch. Tickers the
+    batch has no info for fall back to fetch_info. Returns {ticker: payload,
+    or the exception it failed with}.
+    """
+    infos_future = upstream.submit(fetch_info_many, tickers)
+    bars = fetch_bars_many(tickers)
+    try:
+        infos = infos_future.result()
+    except Exception:
+        infos = {}
+    info_futures = {
+        ticker: upstream.submit(fetch_info, ticker) for ticker in tickers if ticker in bars and ticker not in infos
+    }
+
+    results: dict[str, dict | Exception] = {}
+    for ticker in tickers:
+        if ticker not in bars:
+            results[ticker] = ValueError(f"No data returned for {ticker}")
+            continue
         try:
-            with ThreadPoolExecutor(max_workers=2) as executor:
-                bars_future = executor.submit(fetch_bars, ticker)
-                info_future = executor.submit(fetch_info, ticker)
-                bars = bars_future.result()
-                company_name, meta, asset_type = info_future.result()
-        except ValueError as e:
-            raise HTTPException(status_code=404, detail=str(e))
+            company_name, meta, asset_type = infos[ticker] if ticker in infos else info_futures[ticker].result()
         except Exception as e:
-            raise HTTPException(status_code=502, detail=f"Data provider error: {e}")
-
-        full = StockResponse(
-            ticker=ticker,
-            companyName=company_name,
-            assetType=asset_type,
-            bars=bars,
-            events=[],
-            meta=meta,
-        )
-        payload = full.model_dump()
-        payload["cached_at"] = datetime.now(timezone.utc).isoformat()
-        cache.set(f"stock:{ticker}", payload)
+            results[ticker] = e
+            continue
+        results[ticker] = stock_payload(ticker, bars[ticker], company_name, meta, asset_type)
+    return results
 
-    # Slice to the requested range in memory — no extra network call
-    current_events = get_demo_events(ticker)
-    filtered_bars = _filter_bars(full.bars, range)
-    from_date = filtered_bars[0].time if filtered_bars else ""
-    filtered_events = [e for e in current_events if e.time >= from_date]
-
-    return StockResponse(
-        ticker=full.ticker,
-        companyName=full.companyName,
-        assetType=full.assetType,
-        bars=filtered_bars,
-        events=filtered_events,
-        meta=full.meta,
+
+def _load_stock_entries(keys: list[str]) -> dict[str, dict | Exception]:
+    """_load_stocks() keyed by `stock:{ticker}`, for cache.aload_many()."""
+    return {f"stock:{ticker}": result for ticker, result in _load_stocks([key.split(":", 1)[1] for key in keys]).items()}
+
+
+def _stock_error(error: BaseException) -> str:
+    # Same wording as /api/stock's 404 and 502 details
+    return str(error) if isinstance(error, ValueError) else f"Data provider error: {error}"
+
+
+@app.get("/api/stocks", response_model=StockBatchResponse)
+@limiter.limit("30/minute")
+async def get_stocks(
+    request: Request,
+    tickers: str = Query(description="Comma-separated list of tickers"),
+    range: TimeRange = Query(default="1Y"),
+):
+    """Several tickers in one response (watchlists, comparison views)."""
+    symbols = list(dict.fromkeys(t.strip().upper() for t in tickers.split(",") if t.strip()))
+    if len(symbols) > MAX_BATCH_TICKERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_TICKERS} tickers per request")
+    from .demo_events import get_demo_events
+
+    # One bulk cache read for every ticker; stale hits refresh per ticker in the background
+    found, expired = await cache.aget_many_or_refresh(
+        [f"stock:{sym}" for sym in symbols],
+        lambda key: _stock_loader(key.split(":", 1)[1]),
+        "yahoo",
     )
+    payloads = {key.split(":", 1)[1]: value for key, value in found.items()}
+    errors: dict[str, str] = {}
+
+    if expired:
+        # Coalesced per ticker: tickers another request is loading are awaited,
+        # the rest are loaded in one batch that /api/stock calls can join
+        for key, result in (await cache.aload_many(expired, _load_stock_entries, "yahoo")).items():
+            if isinstance(result, BaseException):
+                errors[key.split(":", 1)[1]] = _stock_error(result)
+            else:
+                payloads[key.split(":", 1)[1]] = result
+
+    served = [sym for sym in symbols if sym in payloads]
+    demo_events = await run_in_threadpool(lambda: {sym: get_demo_events(sym) for sym in served})
+    parts = await _arender_stocks({sym: payloads[sym] for sym in served}, range, demo_events)
+    errors_json = _dumps({sym: errors[sym] for sym in symbols if sym in errors}).encode()
+
+    body = b'{"stocks":[' + b",".join(part.body for part in parts) + b'],"errors":' + errors_json + b"}"
+    etag = '"' + hashlib.blake2b(
+        b"".join(part.etag.encode() for part in parts) + errors_json, digest_size=16
+    ).hexdigest() + '"'
+    return _json_response(request, cache.Encoded(body, etag))
+
+
+def _items_loader(fetch: Callable[[], list]) -> Callable[[], dict]:
+    """Wrap a list-returning fetcher into a loader producing the cached items payload."""
+    def load() -> dict:
+        items = fetch()
+        return {
+            "cached_at": datetime.now(timezone.utc).isoformat(),
+            "items": [item.model_dump() for item in items],
+        }
+    return load
 
 
 @app.get("/api/earnings/{ticker}", response_model=list[EarningsDate])
 @limiter.limit("60/minute")
-def get_earnings(request: Request, ticker: str):
+async def get_earnings(request: Request, ticker: str):
     ticker = ticker.upper()
     CACHE_KEY = f"earnings:{ticker}"
-    CACHE_TTL_HOURS = 24
-
-    cached = cache.get(CACHE_KEY)
-    if cached:
-        cached_at_str = cached.get("cached_at")
-        if cached_at_str:
-            cached_at = datetime.fromisoformat(cached_at_str)
-            if datetime.now(timezone.utc) - cached_at < timedelta(hours=CACHE_TTL_HOURS):
-                return [EarningsDate(**item) for item in cached["items"]]
-
     try:
-        items = fetch_earnings_dates(ticker)
+        cached = await cache.aget_or_refresh(CACHE_KEY, _items_loader(lambda: fetch_earnings_dates(ticker)), "yahoo")
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Earnings fetch error: {e}")
-
-    cache.set(CACHE_KEY, {
-        "cached_at": datetime.now(timezone.utc).isoformat(),
-        "items": [item.model_dump() for item in items],
-    })
-    return items
+    return await _cached_json(request, CACHE_KEY, cached, lambda: [EarningsDate(**item).model_dump() for item in cached["items"]])
 
 
 @app.get("/api/news/{ticker}", response_model=list[StockNews])
 @limiter.limit("60/minute")
-def get_news(request: Request, ticker: str):
+async def get_news(request: Request, ticker: str):
     ticker = ticker.upper()
-    NEWS_CACHE_TTL_HOURS = 24
     CACHE_KEY = f"news:{ticker}"
-
-    cached = cache.get(CACHE_KEY)
-    if cached:
-        cached_at_str = cached.get("cached_at")
-        if cached_at_str:
-            cached_at = datetime.fromisoformat(cached_at_str)
-            if datetime.now(timezone.utc) - cached_at < timedelta(hours=NEWS_CACHE_TTL_HOURS):
-                return [StockNews(**item) for item in cached["items"]]
-
     try:
-        items = fetch_news(ticker, limit=250)
+        cached = await cache.aget_or_refresh(CACHE_KEY, _items_loader(lambda: fetch_news(ticker, limit=250)), "yahoo")
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"News fetch error: {e}")
+    return await _cached_json(request, CACHE_KEY, cached, lambda: [StockNews(**item).model_dump() for item in cached["items"]])
 
-    cache.set(CACHE_KEY, {
-        "cached_at": datetime.now(timezone.utc).isoformat(),
-        "items": [item.model_dump() for item in items],
-    })
-    return items
+
+def _fetch_price_fragments(missing: list[str], encode_item: Callable[[TrendingItem], bytes]) -> dict[str, bytes]:
+    """Bulk-fetch quotes for uncached symbols, cache them, and return encoded items."""
+    fragments: dict[str, bytes] = {}
+    payloads: dict[str, dict] = {}
+    try:
+        from yahooquery import Ticker as YQTicker
+        price_data = YQTicker(missing).price
+        for sym in missing:
+            info = price_data.get(sym, {})
+            if not isinstance(info, dict):
+                fragments[sym] = encode_item(TrendingItem(ticker=sym, companyName=sym))
+                continue
+            item = TrendingItem(
+                ticker=sym,
+                companyName=info.get("longName") or info.get("shortName") or sym,
+                price=info.get("regularMarketPrice"),
+                change=info.get("regularMarketChange"),
+                changePct=info.get("regularMarketChangePercent"),
+            )
+            payload = item.model_dump()
+            payload["cached_at"] = datetime.now(timezone.utc).isoformat()
+            payloads[f"price:{sym}"] = payload
+            fragments[sym] = cache.encoded(f"price:{sym}", payload["cached_at"], lambda: encode_item(item)).body
+        cache.set_many(payloads)
+    except Exception:
+        for sym in missing:
+            fragments[sym] = encode_item(TrendingItem(ticker=sym, companyName=sym))
+    return fragments
 
 
 @app.get("/api/prices", response_model=list[TrendingItem])
 @limiter.limit("30/minute")
-def prices(request: Request, tickers: str = Query(description="Comma-separated list of tickers")):
+async def prices(request: Request, tickers: str = Query(description="Comma-separated list of tickers")):
     """Bulk price fetch for a list of tickers (used by watchlist enrichment)."""
     symbols = [t.strip().upper() for t in tickers.split(",") if t.strip()]
     if not symbols:
         return []
 
     PRICE_CACHE_TTL_HOURS = 24
-    results: list[TrendingItem] = []
+    # Encoded TrendingItem objects per symbol; cached ones are encoded once per cached_at
+    fragments: dict[str, bytes] = {}
     missing: list[str] = []
 
+    def encode_item(item: TrendingItem) -> bytes:
+        return _dumps(item.model_dump()).encode()
+
+    found = await cache.aget_many([f"price:{sym}" for sym in symbols])
     for sym in symbols:
-        cached = cache.get(f"price:{sym}")
+        cached = found.get(f"price:{sym}")
         if cached:
             cached_at_str = cached.get("cached_at")
             if cached_at_str:
                 cached_at = datetime.fromisoformat(cached_at_str)
                 if datetime.now(timezone.utc) - cached_at < timedelta(hours=PRICE_CACHE_TTL_HOURS):
-                    results.append(TrendingItem(**{k: v for k, v in cached.items() if k != "cached_at"}))
+                    fragments[sym] = cache.encoded(
+                        f"price:{sym}",
+                        cached_at_str,
+                        lambda: encode_item(TrendingItem(**{k: v for k, v in cached.items() if k != "cached_at"})),
+                    ).body
                     continue
         missing.append(sym)
 
     if missing:
-        try:
-            from yahooquery import Ticker as YQTicker
-            price_data = YQTicker(missing).price
-            for sym in missing:
-                info = price_data.get(sym, {})
-                if not isinstance(info, dict):
-                    results.append(TrendingItem(ticker=sym, companyName=sym))
-                    continue
-                item = TrendingItem(
-                    ticker=sym,
-                    companyName=info.get("longName") or info.get("shortName") or sym,
-                    price=info.get("regularMarketPrice"),
-                    change=info.get("regularMarketChange"),
-                    changePct=info.get("regularMarketChangePercent"),
-                )
-                payload = item.model_dump()
-                payload["cached_at"] = datetime.now(timezone.utc).isoformat()
-                cache.set(f"price:{sym}", payload)
-                results.append(item)
-        except Exception:
-            for sym in missing:
-                results.append(TrendingItem(ticker=sym, companyName=sym))
+        fragments.update(await upstream.run("yahoo", _fetch_price_fragments, missing, encode_item))
 
     # Preserve original order
-    order = {sym: i for i, sym in enumerate(symbols)}
-    results.sort(key=lambda r: order.get(r.ticker, 999))
-    return results
+    body = b"[" + b",".join(fragments[sym] for sym in symbols) + b"]"
+    return _json_response(request, cache.encode_body(body))
 
 
 @app.get("/api/sec/{ticker}", response_model=list[SECFiling])
 @limiter.limit("60/minute")
-def get_sec_filings(request: Request, ticker: str):
+async def get_sec_filings(request: Request, ticker: str):
     ticker = ticker.upper()
     CACHE_KEY = f"sec:filings:{ticker}"
-    CACHE_TTL_HOURS = 24
-
-    cached = cache.get(CACHE_KEY)
-    if cached:
-        cached_at_str = cached.get("cached_at")
-        if cached_at_str:
-            cached_at = datetime.fromisoformat(cached_at_str)
-            if datetime.now(timezone.utc) - cached_at < timedelta(hours=CACHE_TTL_HOURS):
-                return [SECFiling(**item) for item in cached["items"]]
-
     try:
-        items = fetch_sec_filings(ticker)
+        cached = await cache.aget_or_refresh(CACHE_KEY, _items_loader(lambda: fetch_sec_filings(ticker)), "sec")
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"SEC EDGAR error: {e}")
-
-    cache.set(CACHE_KEY, {
-        "cached_at": datetime.now(timezone.utc).isoformat(),
-        "items": [item.model_dump() for item in items],
-    })
-    return items
+    return await _cached_json(request, CACHE_KEY, cached, lambda: [SECFiling(**item).model_dump() for item in cached["items"]])
 
 
 @app.get("/api/market-summary", response_model=MarketSummary)
 @limiter.limit("30/minute")
-def get_market_summary(request: Request):
-    CACHE_KEY = "market:summary"
-    CACHE_TTL_HOURS = 6
-
-    cached = cache.get(CACHE_KEY)
-    if cached:
-        cached_at_str = cached.get("cachedAt")
-        if cached_at_str:
-            cached_at = datetime.fromisoformat(cached_at_str)
-            if cached_at.tzinfo is None:
-                cached_at = cached_at.replace(tzinfo=timezone.utc)
-            if datetime.now(timezone.utc) - cached_at < timedelta(hours=CACHE_TTL_HOURS):
-                return MarketSummary(**cached)
+async def get_market_summary(request: Request):
+    def load() -> dict:
+        from .macro import fetch_market_summary
+        return fetch_market_summary().model_dump()
 
     try:
-        from .macro import fetch_market_summary
-        summary = fetch_market_summary()
+        cached = await cache.aget_or_refresh("market:summary", load, "fred")
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Macro data fetch error: {e}")
-
-    cache.set(CACHE_KEY, summary.model_dump())
-    return summary
+    return await _cached_json(request, "market:summary", cached, lambda: MarketSummary(**cached).model_dump(), "cachedAt")
 
 
 @app.get("/api/indicator/{name}", response_model=IndicatorHistory)
 @limiter.limit("30/minute")
-def get_indicator_history(name: str, request: Request):
-    CACHE_TTL_HOURS = 24
+async def get_indicator_history(name: str, request: Request):
     safe_name = (
         name.lower()
         .replace(" ", "_")
@@ -335,27 +544,16 @@ def get_indicator_history(name: str, request: Request):
     )
     CACHE_KEY = f"indicator:{safe_name}"
 
-    cached = cache.get(CACHE_KEY)
-    if cached:
-        cached_at_str = cached.get("cachedAt")
-        if cached_at_str:
-            cached_at = datetime.fromisoformat(cached_at_str)
-            if cached_at.tzinfo is None:
-                cached_at = cached_at.replace(tzinfo=timezone.utc)
-            if datetime.now(timezone.utc) - cached_at < timedelta(hours=CACHE_TTL_HOURS):
-                return IndicatorHistory(**cached)
-
     from .macro import fetch_indicator_history, INDICATOR_MAP
     if name not in INDICATOR_MAP:
         raise HTTPException(status_code=404, detail=f"Unknown indicator: {name}")
 
+    provider = "fred" if INDICATOR_MAP[name][0].startswith("fred") else "yahoo"
     try:
-        history = fetch_indicator_history(name)
+        cached = await cache.aget_or_refresh(CACHE_KEY, lambda: fetch_indicator_history(name).model_dump(), provider)
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Indicator fetch error: {e}")
-
-    cache.set(CACHE_KEY, history.model_dump())
-    return history
+    return await _cached_json(request, CACHE_KEY, cached, lambda: IndicatorHistory(**cached).model_dump(), "cachedAt")
 
 
 @app.get("/api/market-analysis", response_model=MarketAnalysis)
@@ -399,58 +597,68 @@ def get_market_analysis(request: Request, current_user: dict = Depends(get_curre
 
 @app.get("/api/search", response_model=list[SearchResult])
 @limiter.limit("30/minute")
-def search(request: Request, q: str = Query(min_length=1)):
-    return [SearchResult(**r) for r in search_tickers(q)]
+async def search(request: Request, q: str = Query(min_length=1)):
+    # Answered in-process from the ticker index; only misses go to Yahoo
+    hits = search_local(q) or await upstream.run("yahoo", search_tickers, q)
+    return [SearchResult(**r) for r in hits]
+
+
+def _fetch_trending() -> dict | None:
+    """Fetch and cache the current trending list; None when Yahoo has no symbols."""
+    from yahooquery import get_trending, Ticker as YQTicker
+
+    data = get_trending()
+    quotes = data.get("quotes", [])
+    # Exclude indices (^GSPC etc.) and keep up to 12 symbols
+    symbols = [q["symbol"] for q in quotes if not q["symbol"].startswith("^")][:12]
+
+    if not symbols:
+        return None
+
+    # Bulk-fetch price + name in one request
+    price_data = YQTicker(symbols).price
+
+    items: list[TrendingItem] = []
+    for sym in symbols:
+        info = price_data.get(sym, {})
+        if not isinstance(info, dict):
+            continue
+        items.append(TrendingItem(
+            ticker=sym,
+            companyName=info.get("longName") or info.get("shortName") or sym,
+            price=info.get("regularMarketPrice"),
+            change=info.get("regularMarketChange"),
+            changePct=info.get("regularMarketChangePercent"),
+        ))
+
+    payload = {
+        "cached_at": datetime.now(timezone.utc).isoformat(),
+        "items": [item.model_dump() for item in items],
+    }
+    cache.set("trending", payload)
+    return payload
 
 
 @app.get("/api/trending", response_model=list[TrendingItem])
 @limiter.limit("30/minute")
-def trending(request: Request):
+async def trending(request: Request):
     CACHE_KEY = "trending"
     CACHE_TTL_HOURS = 24
 
     # Return cached data if it is less than 24 hours old
-    cached = cache.get(CACHE_KEY)
+    cached = await cache.aget(CACHE_KEY)
     if cached:
         cached_at = datetime.fromisoformat(cached["cached_at"])
         if datetime.now(timezone.utc) - cached_at < timedelta(hours=CACHE_TTL_HOURS):
-            return [TrendingItem(**item) for item in cached["items"]]
+            return await _cached_json(request, CACHE_KEY, cached, lambda: [TrendingItem(**item).model_dump() for item in cached["items"]])
 
     try:
-        from yahooquery import get_trending, Ticker as YQTicker
-
-        data = get_trending()
-        quotes = data.get("quotes", [])
-        # Exclude indices (^GSPC etc.) and keep up to 12 symbols
-        symbols = [q["symbol"] for q in quotes if not q["symbol"].startswith("^")][:12]
-
-        if not symbols:
-            return []
-
-        # Bulk-fetch price + name in one request
-        price_data = YQTicker(symbols).price
-
-        items: list[TrendingItem] = []
-        for sym in symbols:
-            info = price_data.get(sym, {})
-            if not isinstance(info, dict):
-                continue
-            items.append(TrendingItem(
-                ticker=sym,
-                companyName=info.get("longName") or info.get("shortName") or sym,
-                price=info.get("regularMarketPrice"),
-                change=info.get("regularMarketChange"),
-                changePct=info.get("regularMarketChangePercent"),
-            ))
-
-        cache.set(CACHE_KEY, {
-            "cached_at": datetime.now(timezone.utc).isoformat(),
-            "items": [item.model_dump() for item in items],
-        })
-        return items
-
+        payload = await upstream.run("yahoo", _fetch_trending)
     except Exception:
         return []
+    if payload is None:
+        return []
+    return await _cached_json(request, CACHE_KEY, payload, lambda: payload["items"])
 
 
 # ── Auth routes ───────────────────────────────────────────────────────────────
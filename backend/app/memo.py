@@ -0,0 +1,121 @@
+"""
+Bounded memo tables for module-level caches.
+
+MemoCache replaces the plain dicts and hand-rolled OrderedDict LRUs that
+modules kept for small per-process memos (search results, decoded stock
+views, encoded response bodies). Each holds at most `max_entries`, evicting
+the least recently used, and with a `ttl` drops entries older than that on
+read, so memory per worker stays flat however many distinct keys traffic
+produces. Values are counted as entries, not bytes; backend values belong in
+the byte-budgeted L1 (l1.py).
+
+Every MemoCache is registered under its name; stats() and /metrics report
+entries, hits, misses, evictions and expirations per name.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from . import metrics
+
+
+class MemoCache:
+    """Thread-safe LRU bounded by entry count, with an optional per-entry TTL."""
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int,
+        ttl: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()   # key → (stored at, value)
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        with _registry_lock:
+            _registry[name] = self
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def keys(self) -> list[Hashable]:
+        """Keys from least to most recently used."""
+        with self._lock:
+            return list(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """The memoized value (now most recently used), or `default` if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return default
+            if self.ttl is not None and self._clock() - entry[0] >= self.ttl:
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "max_entries": self.max_entries}
+
+
+_registry: dict[str, MemoCache] = {}
+_registry_lock = threading.Lock()
+
+
+def stats() -> dict[str, dict[str, int]]:
+    """stats() of every registered memo, by name."""
+    with _registry_lock:
+        caches = list(_registry.values())
+    return {memo.name: memo.stats() for memo in caches}
+
+
+def _collect_metrics() -> list[metrics.MetricFamily]:
+    by_name = stats()
+    return [
+        metrics.gauge(
+            "chronostock_memo_entries", "Entries held in each in-process memo table.",
+            (({"memo": name}, s["entries"]) for name, s in by_name.items()),
+        ),
+        metrics.counter_family(
+            "chronostock_memo_requests_total", "Memo table lookups by result.",
+            (
+                ({"memo": name, "result": result}, s[field])
+                for name, s in by_name.items()
+                for result, field in (("hit", "hits"), ("miss", "misses"))
+            ),
+        ),
+        metrics.counter_family(
+            "chronostock_memo_evictions_total", "Memo entries dropped to stay within max_entries.",
+            (({"memo": name}, s["evictions"]) for name, s in by_name.items()),
+        ),
+        metrics.counter_family(
+            "chronostock_memo_expirations_total", "Memo entries dropped on read after their TTL.",
+            (({"memo": name}, s["expirations"]) for name, s in by_name.items()),
+        ),
+    ]
+
+
+metrics.register_collector(_collect_metrics)
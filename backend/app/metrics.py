@@ -0,0 +1,170 @@
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+Counters and histograms are updated on the code paths themselves; the
+gauges and counters that modules already keep as stats dicts (L1, the shared
+tier, S3, the write-behind queue, ...) are read by collectors registered
+with register_collector() at scrape time, so nothing is counted twice.
+render() produces the text served on /metrics. Values are per process:
+Prometheus scrapes each uvicorn worker as its own target, or sums them.
+"""
+import bisect
+import threading
+from typing import Callable, Iterable, NamedTuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Sample(NamedTuple):
+    name: str
+    labels: dict[str, str]
+    value: float
+
+
+class MetricFamily(NamedTuple):
+    name: str
+    kind: str            # "counter" | "gauge" | "histogram"
+    help: str
+    samples: list[Sample]
+
+
+class Counter:
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(tuple(sorted(labels.items())), 0.0)
+
+    def collect(self) -> MetricFamily:
+        with self._lock:
+            samples = [Sample(self.name, dict(key), value) for key, value in self._values.items()]
+        return MetricFamily(self.name, "counter", self.help, samples)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...]) -> None:
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # labels → ([count per bucket, +Inf last], sum)
+        self._values: dict[Labels, tuple[list[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            entry = self._values.get(tuple(sorted(labels.items())))
+            return sum(entry[0]) if entry else 0
+
+    def collect(self) -> MetricFamily:
+        samples: list[Sample] = []
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in items:
+            labels = dict(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                samples.append(Sample(f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            samples.append(Sample(f"{self.name}_sum", labels, total))
+            samples.append(Sample(f"{self.name}_count", labels, cumulative))
+        return MetricFamily(self.name, "histogram", self.help, samples)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+_lock = threading.Lock()
+_metrics: list[Counter | Histogram] = []
+_collectors: list[Callable[[], Iterable[MetricFamily]]] = []
+
+
+def counter(name: str, help: str) -> Counter:
+    metric = Counter(name, help)
+    with _lock:
+        _metrics.append(metric)
+    return metric
+
+
+def histogram(name: str, help: str, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+    metric = Histogram(name, help, buckets)
+    with _lock:
+        _metrics.append(metric)
+    return metric
+
+
+def register_collector(collect: Callable[[], Iterable[MetricFamily]]) -> None:
+    """Add a callable that reports metric families computed at scrape time."""
+    with _lock:
+        _collectors.append(collect)
+
+
+def gauge(name: str, help: str, samples: Iterable[tuple[dict[str, str], float]]) -> MetricFamily:
+    return MetricFamily(name, "gauge", help, [Sample(name, labels, value) for labels, value in samples])
+
+
+def counter_family(name: str, help: str, samples: Iterable[tuple[dict[str, str], float]]) -> MetricFamily:
+    return MetricFamily(name, "counter", help, [Sample(name, labels, value) for labels, value in samples])
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_sample(sample: Sample) -> str:
+    if not sample.labels:
+        return f"{sample.name} {_format_value(sample.value)}"
+    labels = ",".join(f'{name}="{_escape(str(value))}"' for name, value in sample.labels.items())
+    return f"{sample.name}{{{labels}}} {_format_value(sample.value)}"
+
+
+def collect() -> list[MetricFamily]:
+    with _lock:
+        metrics = list(_metrics)
+        collectors = list(_collectors)
+    families = [metric.collect() for metric in metrics]
+    for collector in collectors:
+        families.extend(collector())
+    return families
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format (0.0.4)."""
+    lines: list[str] = []
+    for family in collect():
+        lines.append(f"# HELP {family.name} {family.help}")
+        lines.append(f"# TYPE {family.name} {family.kind}")
+        lines.extend(_format_sample(sample) for sample in family.samples)
+    return "\n".join(lines) + "\n"
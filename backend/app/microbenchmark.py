@@ -0,0 +1,302 @@
+"""
+In-process microbenchmark suite — pytest-benchmark.
+
+Unlike benchmark.py these never touch the network or the API; they time the
+hot in-memory paths in isolation so changes to them can be compared.
+
+Usage:
+  pytest app/microbenchmark.py -v
+  pytest app/microbenchmark.py -v -k l1 --benchmark-sort=mean
+  pytest app/microbenchmark.py -v -k codec --benchmark-group-by=param:family
+  pytest app/microbenchmark.py -v -k frame
+  pytest app/microbenchmark.py -v -k search
+
+Codec benchmarks use real `stock:` / `news:` entries from MICROBENCH_CACHE_DIR
+(a local cache directory, e.g. ./cache after a daily update) when present,
+else synthetic payloads of the same shape. Encoded sizes are recorded in each
+benchmark's extra_info.
+
+Frame benchmarks convert a synthetic MICROBENCH_FRAME_ROWS-row yfinance
+history / earnings frame, next to the row-by-row (iterrows) conversion they
+replaced as a baseline.
+"""
+import json
+import os
+import random
+import threading
+from pathlib import Path
+
+import pytest
+
+from app import codec
+from app.l1 import L1Cache, ShardedL1Cache
+from app.search import TickerIndex
+from app.series import OHLCSeries
+from app.stock import earnings_from_frame
+
+L1_KEYS = int(os.environ.get("MICROBENCH_L1_KEYS", "1000"))
+L1_THREADS = int(os.environ.get("MICROBENCH_L1_THREADS", "8"))
+L1_OPS_PER_THREAD = int(os.environ.get("MICROBENCH_L1_OPS", "2000"))
+CODEC_CACHE_DIR = Path(os.environ.get("MICROBENCH_CACHE_DIR", "./cache"))
+CODEC_STOCK_BARS = int(os.environ.get("MICROBENCH_STOCK_BARS", "15000"))
+CODEC_NEWS_ITEMS = int(os.environ.get("MICROBENCH_NEWS_ITEMS", "250"))
+FRAME_ROWS = int(os.environ.get("MICROBENCH_FRAME_ROWS", "15000"))
+SEARCH_ENTRIES = int(os.environ.get("MICROBENCH_SEARCH_ENTRIES", "10000"))
+
+_QUOTE = {"ticker": "NVDA", "companyName": "NVIDIA", "price": 900.0, "change": 1.0, "changePct": 0.1}
+_KEYS = [f"price:T{i}" for i in range(L1_KEYS)]
+
+
+def _filled(l1):
+    for key in _KEYS:
+        l1.set(key, _QUOTE, ttl=3600)
+    return l1
+
+
+def _unlocked_l1() -> L1Cache:
+    return _filled(L1Cache(max_bytes=64 * 1024 * 1024, max_entries=4096))
+
+
+def _sharded_l1() -> ShardedL1Cache:
+    return _filled(ShardedL1Cache(max_bytes=64 * 1024 * 1024, max_entries=4096))
+
+
+def _get_all(l1) -> None:
+    for key in _KEYS:
+        l1.get(key)
+
+
+def _set_all(l1) -> None:
+    for key in _KEYS:
+        l1.set(key, _QUOTE, ttl=3600)
+
+
+def _concurrent_mixed(l1) -> None:
+    def worker(offset: int) -> None:
+        for i in range(L1_OPS_PER_THREAD):
+            key = _KEYS[(offset + i) % len(_KEYS)]
+            if i % 10 == 0:
+                l1.set(key, _QUOTE, ttl=3600)
+            else:
+                l1.get(key)
+
+    threads = [threading.Thread(target=worker, args=(n * 97,)) for n in range(L1_THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+# ── L1: single-threaded baseline vs sharded ───────────────────────────────────
+
+def test_l1_get_unlocked_baseline(benchmark):
+    benchmark(_get_all, _unlocked_l1())
+
+
+def test_l1_get_sharded(benchmark):
+    benchmark(_get_all, _sharded_l1())
+
+
+def test_l1_set_unlocked_baseline(benchmark):
+    benchmark(_set_all, _unlocked_l1())
+
+
+def test_l1_set_sharded(benchmark):
+    benchmark(_set_all, _sharded_l1())
+
+
+def test_l1_concurrent_mixed_sharded(benchmark):
+    benchmark(_concurrent_mixed, _sharded_l1())
+
+
+# ── Cache codecs: encode / decode of stock and news payloads ─────────────────
+
+def _synthetic_stock() -> dict:
+    rng = random.Random(0)
+    closes = [round(100 + rng.gauss(0, 5), 2) for _ in range(CODEC_STOCK_BARS)]
+    return {
+        "ticker": "NVDA",
+        "companyName": "NVIDIA Corporation",
+        "assetType": "equity",
+        "bars": {
+            "time": [f"{1990 + i // 366:04d}-{i % 12 + 1:02d}-{i % 28 + 1:02d}" for i in range(CODEC_STOCK_BARS)],
+            "open": closes,
+            "high": [round(c * 1.01, 2) for c in closes],
+            "low": [round(c * 0.99, 2) for c in closes],
+            "close": closes,
+            "volume": [rng.randrange(10**6, 10**8) for _ in range(CODEC_STOCK_BARS)],
+        },
+        "meta": {"sector": "Technology", "industry": "Semiconductors", "marketCap": 2.2e12},
+        "cached_at": "2026-01-02T00:00:00+00:00",
+    }
+
+
+def _synthetic_news() -> dict:
+    return {
+        "items": [
+            {
+                "id": f"article-{i}",
+                "time": f"2026-01-{i % 28 + 1:02d}",
+                "title": f"Chipmaker shares move after quarterly results, item {i}",
+                "publisher": "Reuters",
+                "url": f"https://example.com/news/{i}",
+                "summary": "Shares moved in early trading after the company reported results. " * 3,
+                "thumbnail": f"https://example.com/thumb/{i}.jpg",
+            }
+            for i in range(CODEC_NEWS_ITEMS)
+        ],
+        "cached_at": "2026-01-02T00:00:00+00:00",
+    }
+
+
+def _sample_payload(family: str) -> dict:
+    """The largest cached entry of `family` in CODEC_CACHE_DIR, else a synthetic one."""
+    try:
+        paths = sorted(CODEC_CACHE_DIR.glob(f"**/{family}_*.json"), key=lambda p: p.stat().st_size)
+    except OSError:
+        paths = []
+    if paths:
+        return codec.decode(paths[-1].read_bytes())
+    return _synthetic_stock() if family == "stock" else _synthetic_news()
+
+
+_PAYLOADS: dict[str, dict] = {}
+
+
+def _payload(family: str) -> dict:
+    if family not in _PAYLOADS:
+        _PAYLOADS[family] = _sample_payload(family)
+    return _PAYLOADS[family]
+
+
+_FORMATS = [(name, packer) for name in codec.available()[0] for packer in codec.available()[1]]
+
+
+@pytest.mark.parametrize("family", ["stock", "news"])
+@pytest.mark.parametrize("fmt", _FORMATS, ids=lambda f: "+".join(f))
+def test_codec_encode(benchmark, family, fmt) -> None:
+    value = _payload(family)
+    raw = benchmark(codec.encode, value, *fmt)
+    benchmark.extra_info["bytes"] = len(raw)
+
+
+@pytest.mark.parametrize("family", ["stock", "news"])
+@pytest.mark.parametrize("fmt", _FORMATS, ids=lambda f: "+".join(f))
+def test_codec_decode(benchmark, family, fmt) -> None:
+    raw = codec.encode(_payload(family), *fmt)
+    benchmark.extra_info["bytes"] = len(raw)
+    assert benchmark(codec.decode, raw) == _payload(family)
+
+
+@pytest.mark.parametrize("family", ["stock", "news"])
+def test_codec_decode_legacy_json(benchmark, family) -> None:
+    """Baseline: the plain-JSON entries written before codec.py."""
+    raw = json.dumps(_payload(family)).encode()
+    benchmark.extra_info["bytes"] = len(raw)
+    benchmark(codec.decode, raw)
+
+
+# ── yfinance frames → bars / earnings: vectorized vs row-by-row ───────────────
+
+def _history_frame():
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    close = 100 + rng.normal(0, 5, FRAME_ROWS).cumsum() / 10
+    index = pd.bdate_range("1966-01-03", periods=FRAME_ROWS, tz="America/New_York")
+    return pd.DataFrame(
+        {
+            "Open": close * 0.998, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+            "Volume": rng.integers(10**6, 10**8, FRAME_ROWS),
+        },
+        index=index,
+    )
+
+
+def _earnings_frame():
+    frame = _history_frame()
+    return frame.rename(columns={"Open": "EPS Estimate", "Close": "Reported EPS", "High": "Surprise(%)"})[
+        ["EPS Estimate", "Reported EPS", "Surprise(%)"]
+    ]
+
+
+def _bars_rowwise(df) -> str:
+    """The per-row conversion fetch_bars used before the columnar series."""
+    bars = [
+        {
+            "time": ts.strftime("%Y-%m-%d"),
+            "open": round(float(row["Open"]), 2),
+            "high": round(float(row["High"]), 2),
+            "low": round(float(row["Low"]), 2),
+            "close": round(float(row["Close"]), 2),
+            "volume": int(row["Volume"]),
+        }
+        for ts, row in df.iterrows()
+    ]
+    return json.dumps(bars)
+
+
+def _earnings_rowwise(df) -> list:
+    """The per-row conversion fetch_earnings_dates used before earnings_from_frame."""
+    import math
+
+    import pandas as pd
+    from app.models import EarningsDate
+
+    def _float(val):
+        try:
+            f = float(val)
+            return None if math.isnan(f) else f
+        except Exception:
+            return None
+
+    items = [
+        EarningsDate(
+            date=pd.Timestamp(ts).strftime("%Y-%m-%d"),
+            epsEstimate=_float(row.get("EPS Estimate")),
+            reportedEps=_float(row.get("Reported EPS")),
+            surprisePct=_float(row.get("Surprise(%)")),
+        )
+        for ts, row in df.iterrows()
+    ]
+    items.sort(key=lambda e: e.date)
+    return items
+
+
+def _bars_vectorized(df) -> str:
+    return OHLCSeries.from_frame(df).bars_json()
+
+
+def test_frame_bars_rowwise_baseline(benchmark):
+    benchmark(_bars_rowwise, _history_frame())
+
+
+def test_frame_bars_vectorized(benchmark):
+    benchmark(_bars_vectorized, _history_frame())
+
+
+def test_frame_earnings_rowwise_baseline(benchmark):
+    benchmark(_earnings_rowwise, _earnings_frame())
+
+
+def test_frame_earnings_vectorized(benchmark):
+    df = _earnings_frame()
+    assert benchmark(earnings_from_frame, df) == _earnings_rowwise(df)
+
+
+# ── Ticker search index: one keystroke-sized query ────────────────────────────
+
+def _search_index() -> TickerIndex:
+    rng = random.Random(0)
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    words = ["".join(rng.choices(letters.lower(), k=rng.randint(3, 9))) for _ in range(3000)]
+    return TickerIndex(
+        ("".join(rng.choices(letters, k=rng.randint(1, 5))), " ".join(rng.sample(words, 3)).upper() + " INC")
+        for _ in range(SEARCH_ENTRIES)
+    )
+
+
+@pytest.mark.parametrize("query", ["a", "ab", "abc", "abc inc", "qqqqqqqq"])
+def test_search_index_query(benchmark, query):
+    benchmark(_search_index().search, query)
@@ -54,6 +54,11 @@ class StockResponse(BaseModel):
     meta: Optional[StockMeta] = None
 
 
+class StockBatchResponse(BaseModel):
+    stocks: list[StockResponse]   # in request order; tickers that failed are omitted
+    errors: dict[str, str] = {}   # ticker → reason it could not be loaded
+
+
 class SearchResult(BaseModel):
     ticker: str
     companyName: str
@@ -0,0 +1,173 @@
+"""
+Concurrent refresh engine for the batch update jobs.
+
+Every (ticker, stage) pair is an independent task. A stage names the
+upstream its calls go to, and its tasks run on that upstream's bounded pool
+(upstream.submit_on), so YAHOO_CONCURRENCY / SEC_CONCURRENCY cap how many
+calls each provider has in flight; SEC's request rate is additionally held
+to SEC_MAX_REQUESTS_PER_SECOND inside edgar.py. All tickers are in flight at
+once, so one slow ticker no longer holds up the rest.
+
+A failing task is retried with capped exponential backoff and jitter. The
+backoff is waited out off the pool: the retry is submitted again once the
+delay has passed, so a ticker that is backing off does not hold one of its
+provider's few slots idle. ValueError ("no data for this ticker") is not retried. A task that still
+fails is recorded and skipped: the ticker's other stages and every other
+ticker carry on. run_stages() returns a RefreshReport with per-stage task
+counts, retries, failures and time spent.
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from .. import upstream
+
+REFRESH_MAX_ATTEMPTS = int(os.environ.get("REFRESH_MAX_ATTEMPTS", "3"))
+REFRESH_BACKOFF_SECONDS = float(os.environ.get("REFRESH_BACKOFF_SECONDS", "1.0"))
+_MAX_BACKOFF_SECONDS = 30.0
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    upstream: str                       # pool the stage runs on: "yahoo", "sec", ...
+    refresh: Callable[[str], None]      # refreshes one ticker
+
+
+@dataclass
+class StageReport:
+    tasks: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    retries: int = 0
+    busy_seconds: float = 0.0           # summed task time, including retries and backoff
+    started: float | None = None        # perf_counter of the first task start / last task end
+    finished: float | None = None
+
+    @property
+    def wall_seconds(self) -> float:
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+    def record(self, started: float, finished: float, attempts: int, ok: bool) -> None:
+        self.tasks += 1
+        self.succeeded += ok
+        self.failed += not ok
+        self.retries += attempts - 1
+        self.busy_seconds += finished - started
+        self.started = started if self.started is None else min(self.started, started)
+        self.finished = finished if self.finished is None else max(self.finished, finished)
+
+
+@dataclass
+class RefreshReport:
+    stages: dict[str, StageReport] = field(default_factory=dict)
+    failures: list[tuple[str, str, str]] = field(default_factory=list)   # (ticker, stage, error)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record(self, stage: str, ticker: str, started: float, attempts: int, error: Exception | None) -> None:
+        finished = time.perf_counter()
+        with self._lock:
+            self.stages.setdefault(stage, StageReport()).record(started, finished, attempts, error is None)
+            if error is not None:
+                self.failures.append((ticker, stage, f"{type(error).__name__}: {error}"))
+
+    def run_bulk(self, stage: str, fn: Callable[..., Any], *args: Any, default: Any = None) -> Any:
+        """Run a whole-batch step (e.g. one bulk quote call) as a one-task stage; `default` if it fails."""
+        started = time.perf_counter()
+        try:
+            result = fn(*args)
+        except Exception as e:
+            self.record(stage, "*", started, 1, e)
+            return default
+        self.record(stage, "*", started, 1, None)
+        return result
+
+    def lines(self) -> list[str]:
+        out = [
+            f"  {name:<12} {s.succeeded}/{s.tasks} ok, {s.failed} failed, {s.retries} retries, "
+            f"{s.busy_seconds:.1f}s busy, {s.wall_seconds:.1f}s wall"
+            for name, s in self.stages.items()
+        ]
+        out.extend(f"  FAILED {stage} {ticker}: {error}" for ticker, stage, error in self.failures)
+        return out
+
+
+def _backoff(attempt: int, base: float) -> float:
+    return min(base * 2 ** (attempt - 1), _MAX_BACKOFF_SECONDS) * random.uniform(0.5, 1.5)
+
+
+def _after(delay: float, fn: Callable[[], None]) -> None:
+    timer = threading.Timer(delay, fn)
+    timer.daemon = True
+    timer.start()
+
+
+def _start_task(
+    stage: Stage,
+    ticker: str,
+    report: RefreshReport,
+    max_attempts: int,
+    backoff: float,
+    schedule: Callable[[float, Callable[[], None]], None],
+) -> Future:
+    """Submit the task's first attempt; the returned future resolves once it succeeds or gives up."""
+    done: Future = Future()
+    started = time.perf_counter()
+
+    def finish(attempts: int, error: Exception | None) -> None:
+        report.record(stage.name, ticker, started, attempts, error)
+        done.set_result(None)
+
+    def submit(attempt: int) -> None:
+        try:
+            upstream.submit_on(stage.upstream, run, attempt)
+        except BaseException as e:   # e.g. the pool was shut down while this retry waited
+            done.set_exception(e)
+
+    def run(attempt: int) -> None:
+        try:
+            stage.refresh(ticker)
+        except ValueError as e:   # the provider has no data for the ticker; retrying will not help
+            finish(attempt, e)
+        except Exception as e:
+            if attempt < max_attempts:
+                schedule(_backoff(attempt, backoff), lambda: submit(attempt + 1))
+            else:
+                finish(attempt, e)
+        except BaseException as e:
+            done.set_exception(e)
+        else:
+            finish(attempt, None)
+
+    submit(1)
+    return done
+
+
+def run_stages(
+    tickers: list[str],
+    stages: list[Stage],
+    report: RefreshReport | None = None,
+    max_attempts: int = REFRESH_MAX_ATTEMPTS,
+    backoff: float = REFRESH_BACKOFF_SECONDS,
+    schedule: Callable[[float, Callable[[], None]], None] = _after,
+) -> RefreshReport:
+    """
+    Run every stage for every ticker concurrently and wait for all of them.
+    `schedule(delay, fn)` runs a retry's submission after its backoff.
+    """
+    report = report if report is not None else RefreshReport()
+    # Ticker-major submission order, so the first tickers finish first
+    futures = [
+        _start_task(stage, ticker, report, max_attempts, backoff, schedule)
+        for ticker in tickers
+        for stage in stages
+    ]
+    for future in futures:
+        future.result()
+    return report
@@ -1,18 +1,66 @@
 import os
+import threading
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
+from typing import Any
 
 from yahooquery import Ticker as YQTicker, get_trending
 
 from .. import cache
 from ..edgar import fetch_sec_filings
-from ..main import StockResponse
-from ..stock import fetch_bars, fetch_earnings_dates, fetch_info, fetch_news
+from .refresh import RefreshReport, Stage, run_stages
+from ..stock import (
+    bars_stats, fetch_earnings_dates, fetch_info, fetch_info_many, fetch_news, refresh_bars, stock_payload,
+)
 
 
 def _now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
+@dataclass
+class WriteTracker:
+    """
+    One run's entries written vs left alone because their content had not
+    changed, with their size encoded uncompressed and without the timestamp.
+    """
+    written: int = 0
+    unchanged: int = 0
+    bytes_written: int = 0
+    bytes_saved: int = 0
+    # key → cached_at of the entry found unchanged, for cache.record_verified()
+    verified: dict[str, str] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def store(self, key: str, payload: dict, cached: Any) -> None:
+        """cache.set() unless `cached` (the current entry) already holds the same content."""
+        # Encoded once, for both the comparison and the byte counts; the
+        # cached entry is only digested when it carries a timestamp
+        body = cache.content_body(payload)
+        size = len(body)
+        if isinstance(cached, dict) and cached.get("cached_at") and (
+            cache.content_digest(cached) == cache.body_digest(body)
+        ):
+            with self._lock:
+                self.unchanged += 1
+                self.bytes_saved += size
+                self.verified[key] = cached["cached_at"]
+            return
+        cache.set(key, payload)
+        with self._lock:
+            self.written += 1
+            self.bytes_written += size
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "written": self.written,
+                "unchanged": self.unchanged,
+                "bytes_written": self.bytes_written,
+                "bytes_saved": self.bytes_saved,
+            }
+
+
 def _tickers_from_env() -> list[str]:
     raw = os.environ.get("DAILY_UPDATE_TICKERS", "")
     return [ticker.strip().upper() for ticker in raw.split(",") if ticker.strip()]
@@ -26,53 +74,39 @@ def build_update_tickers() -> list[str]:
     return list(dict.fromkeys(env_tickers + trending_tickers))
 
 
-def refresh_stock_bundle(ticker: str) -> None:
-    bars = fetch_bars(ticker)
-    company_name, meta, asset_type = fetch_info(ticker)
+def fetch_infos(tickers: list[str]) -> dict[str, tuple]:
+    """Company info for every ticker in bulk; {} if the batch call fails (refreshes fall back per ticker)."""
+    try:
+        return fetch_info_many(tickers)
+    except Exception as e:
+        print(f"Bulk info fetch failed, falling back to per-ticker calls: {e}")
+        return {}
+
 
-    payload = StockResponse(
-        ticker=ticker,
-        companyName=company_name,
-        assetType=asset_type,
-        bars=bars,
-        events=[],
-        meta=meta,
-    ).model_dump()
-    payload["cached_at"] = _now_iso()
-    cache.set(f"stock:{ticker}", payload)
+def refresh_stock_bundle(ticker: str, writes: WriteTracker, info: tuple | None = None) -> None:
+    # Extends the cached history with the latest bars instead of re-downloading it
+    cached = cache.get(f"stock:{ticker}")
+    bars = refresh_bars(ticker, cached)
+    company_name, meta, asset_type = info or fetch_info(ticker)
+    writes.store(f"stock:{ticker}", stock_payload(ticker, bars, company_name, meta, asset_type), cached)
 
 
-def refresh_earnings(ticker: str) -> None:
+def refresh_earnings(ticker: str, writes: WriteTracker) -> None:
     items = fetch_earnings_dates(ticker)
-    cache.set(
-        f"earnings:{ticker}",
-        {
-            "cached_at": _now_iso(),
-            "items": [item.model_dump() for item in items],
-        },
-    )
+    key = f"earnings:{ticker}"
+    writes.store(key, {"cached_at": _now_iso(), "items": [item.model_dump() for item in items]}, cache.get(key))
 
 
-def refresh_news(ticker: str) -> None:
+def refresh_news(ticker: str, writes: WriteTracker) -> None:
     items = fetch_news(ticker)
-    cache.set(
-        f"news:{ticker}",
-        {
-            "cached_at": _now_iso(),
-            "items": [item.model_dump() for item in items],
-        },
-    )
+    key = f"news:{ticker}"
+    writes.store(key, {"cached_at": _now_iso(), "items": [item.model_dump() for item in items]}, cache.get(key))
 
 
-def refresh_sec_filings(ticker: str) -> None:
+def refresh_sec_filings(ticker: str, writes: WriteTracker) -> None:
     items = fetch_sec_filings(ticker)
-    cache.set(
-        f"sec:filings:{ticker}",
-        {
-            "cached_at": _now_iso(),
-            "items": [item.model_dump() for item in items],
-        },
-    )
+    key = f"sec:filings:{ticker}"
+    writes.store(key, {"cached_at": _now_iso(), "items": [item.model_dump() for item in items]}, cache.get(key))
 
 
 def refresh_prices(tickers: list[str]) -> None:
@@ -80,12 +114,13 @@ def refresh_prices(tickers: list[str]) -> None:
         return
 
     price_data = YQTicker(tickers).price
+    payloads: dict[str, dict] = {}
     for ticker in tickers:
         info = price_data.get(ticker, {})
         if not isinstance(info, dict):
             continue
 
-        payload = {
+        payloads[f"price:{ticker}"] = {
             "ticker": ticker,
             "companyName": info.get("longName") or info.get("shortName") or ticker,
             "price": info.get("regularMarketPrice"),
@@ -93,7 +128,7 @@ def refresh_prices(tickers: list[str]) -> None:
             "changePct": info.get("regularMarketChangePercent"),
             "cached_at": _now_iso(),
         }
-        cache.set(f"price:{ticker}", payload)
+    cache.set_many(payloads)
 
 
 def refresh_trending() -> list[str]:
@@ -127,16 +162,35 @@ def refresh_trending() -> list[str]:
 
 def main() -> None:
     tickers = build_update_tickers()
-    refresh_prices(tickers)
-
-    for ticker in tickers:
-        print(f"Refreshing {ticker}...")
-        refresh_stock_bundle(ticker)
-        refresh_earnings(ticker)
-        refresh_news(ticker)
-        refresh_sec_filings(ticker)
-
-    print(f"Daily update complete for {len(tickers)} ticker(s).")
+    report = RefreshReport()
+    writes = WriteTracker()
+    report.run_bulk("prices", refresh_prices, tickers)
+    infos = report.run_bulk("info", fetch_infos, tickers, default={})
+
+    print(f"Refreshing {len(tickers)} ticker(s)...")
+    run_stages(tickers, [
+        Stage("stock", "yahoo", lambda ticker: refresh_stock_bundle(ticker, writes, infos.get(ticker))),
+        Stage("earnings", "yahoo", lambda ticker: refresh_earnings(ticker, writes)),
+        Stage("news", "yahoo", lambda ticker: refresh_news(ticker, writes)),
+        Stage("sec_filings", "sec", lambda ticker: refresh_sec_filings(ticker, writes)),
+    ], report)
+
+    if writes.verified:
+        cache.record_verified(dict(writes.verified))
+
+    bars = bars_stats()
+    written = writes.stats()
+    print(
+        f"Daily update complete for {len(tickers)} ticker(s), "
+        f"{len(infos)} with bulk-fetched company info. "
+        f"Histories: {bars['incremental']} incremental, {bars['full']} full "
+        f"({bars['adjusted']} re-adjusted), {bars['bars_downloaded']} bars downloaded. "
+        f"Entries: {written['written']} written ({written['bytes_written']} bytes), "
+        f"{written['unchanged']} unchanged ({written['bytes_saved']} bytes saved)."
+    )
+    print("\n".join(report.lines()))
+    if report.failures:
+        raise SystemExit(f"{len(report.failures)} refresh task(s) failed")
 
 
 if __name__ == "__main__":
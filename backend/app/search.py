@@ -0,0 +1,123 @@
+"""
+In-process ticker search index.
+
+Built from SEC's company_tickers.json (ticker → company title, listed
+roughly largest company first) so search-as-you-type is answered without a
+network call per keystroke:
+
+- ticker prefix:    binary search over the sorted tickers
+- name prefix:      binary search over the sorted words of every title;
+                    each query word must prefix a word of the title
+- fuzzy fallback:   trigram overlap with "ticker title", for typos, used
+                    only when nothing matches by prefix
+
+Exact ticker matches rank first, then ticker prefixes, then name matches;
+ties go to the entry SEC lists first. The index is immutable; build a new
+one to pick up new listings.
+"""
+import bisect
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Iterable
+
+_WORD = re.compile(r"[a-z0-9]+")
+# Share of the query's trigrams a fuzzy match must contain
+_MIN_FUZZY_SCORE = 0.5
+
+
+def _words(text: str) -> list[str]:
+    return _WORD.findall(text.lower())
+
+
+def _trigrams(text: str) -> set[str]:
+    padded = f" {' '.join(_words(text))} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _ticker_key(text: str) -> str:
+    # Share classes: SEC and Yahoo write BRK-B, users often type BRK.B
+    return text.strip().lower().replace(".", "-")
+
+
+def _prefix_slice(keys: list[str], prefix: str) -> slice:
+    """Positions of the sorted `keys` that start with `prefix`."""
+    return slice(bisect.bisect_left(keys, prefix), bisect.bisect_left(keys, prefix + "\uffff"))
+
+
+class TickerIndex:
+    """Immutable prefix + trigram index over (ticker, company name) pairs."""
+
+    def __init__(self, entries: Iterable[tuple[str, str]]) -> None:
+        self._tickers: list[str] = []
+        self._names: list[str] = []
+        self._exact: dict[str, int] = {}
+        for ticker, name in entries:
+            key = _ticker_key(ticker)
+            if not key or key in self._exact:
+                continue
+            self._exact[key] = len(self._tickers)
+            self._tickers.append(ticker.upper())
+            self._names.append(name or ticker.upper())
+
+        # Entry ids double as rank: a smaller id is a more prominent company
+        by_ticker = sorted((key, i) for key, i in self._exact.items())
+        self._ticker_keys = [key for key, _ in by_ticker]
+        self._ticker_ids = [i for _, i in by_ticker]
+
+        self._name_words = [_words(name) for name in self._names]
+        by_word = sorted({(word, i) for i, words in enumerate(self._name_words) for word in words})
+        self._word_keys = [word for word, _ in by_word]
+        self._word_ids = [i for _, i in by_word]
+
+        self._grams: dict[str, list[int]] = {}
+        for i, (ticker, name) in enumerate(zip(self._tickers, self._names)):
+            for gram in _trigrams(f"{ticker} {name}"):
+                self._grams.setdefault(gram, []).append(i)
+
+    def __len__(self) -> int:
+        return len(self._tickers)
+
+    def search(self, query: str, limit: int = 6) -> list[dict]:
+        """Up to `limit` {"ticker", "companyName"} matches, best first."""
+        key = _ticker_key(query)
+        if not key or limit <= 0:
+            return []
+        ranked: dict[int, None] = {}   # ordered set of entry ids
+
+        def add(ids: Iterable[int]) -> None:
+            for i in ids:
+                if len(ranked) >= limit:
+                    return
+                ranked.setdefault(i, None)
+
+        if key in self._exact:
+            add([self._exact[key]])
+        add(heapq.nsmallest(limit, self._ticker_ids[_prefix_slice(self._ticker_keys, key)]))
+        if len(ranked) < limit:
+            add(heapq.nsmallest(limit, self._name_matches(_words(query))))
+        if not ranked:
+            add(self._fuzzy_matches(query, limit))
+        return [{"ticker": self._tickers[i], "companyName": self._names[i]} for i in ranked]
+
+    def _name_matches(self, words: list[str]) -> set[int]:
+        if not words:
+            return set()
+        # Candidates from the rarest query word, then checked against the others
+        spans = {word: _prefix_slice(self._word_keys, word) for word in words}
+        rarest = min(words, key=lambda word: spans[word].stop - spans[word].start)
+        others = [word for word in spans if word != rarest]
+        return {
+            i for i in self._word_ids[spans[rarest]]
+            if all(any(w.startswith(word) for w in self._name_words[i]) for word in others)
+        }
+
+    def _fuzzy_matches(self, query: str, limit: int) -> list[int]:
+        grams = _trigrams(query)
+        counts: Counter[int] = Counter()
+        for gram in grams:
+            counts.update(self._grams.get(gram, ()))
+        needed = math.ceil(len(grams) * _MIN_FUZZY_SCORE)
+        best = heapq.nsmallest(limit, ((-n, i) for i, n in counts.items() if n >= needed))
+        return [i for _, i in best]
@@ -0,0 +1,146 @@
+"""
+Columnar OHLC history.
+
+A ticker's full history is held as parallel NumPy arrays (one per field)
+instead of thousands of OHLCBar models. The cache stores the same columns as
+parallel JSON lists, range slicing is a binary search on the sorted date
+column, and responses are serialized straight from the arrays.
+
+Cache payload layout for `stock:{ticker}`:
+    {"bars": {"time": [...], "open": [...], "high": [...], "low": [...],
+              "close": [...], "volume": [...]}, ...}
+
+Older entries that still hold `bars` as a list of per-bar dicts are read
+transparently.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+PRICE_FIELDS = ("open", "high", "low", "close")
+_FRAME_COLUMNS = {"open": "Open", "high": "High", "low": "Low", "close": "Close"}
+
+
+def _round2(values: np.ndarray) -> np.ndarray:
+    """Vectorized round(x, 2) that matches Python's rounding on exact ties."""
+    out = np.round(values, 2)
+    scaled = values * 100
+    ties = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if ties.any():
+        out[ties] = [round(float(v), 2) for v in values[ties]]
+    return out
+
+
+@dataclass(frozen=True)
+class OHLCSeries:
+    time: np.ndarray     # datetime64[D], ascending
+    open: np.ndarray     # float64
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray   # int64
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    # ── Construction ──────────────────────────────────────────────────────────
+
+    @classmethod
+    def from_frame(cls, df) -> "OHLCSeries":
+        """Build from a yfinance OHLCV DataFrame indexed by timestamp."""
+        df = df.dropna(subset=list(_FRAME_COLUMNS.values()))
+        index = df.index
+        if getattr(index, "tz", None) is not None:
+            # Keep exchange-local calendar dates, as strftime on each bar did
+            index = index.tz_localize(None)
+        time = np.asarray(index.values).astype("datetime64[D]")
+        columns = {
+            field: _round2(df[col].to_numpy(dtype=np.float64))
+            for field, col in _FRAME_COLUMNS.items()
+        }
+        volume = df["Volume"].fillna(0).to_numpy(dtype=np.float64).astype(np.int64)
+        return cls._sorted(time, volume=volume, **columns)
+
+    @classmethod
+    def from_payload(cls, bars) -> "OHLCSeries":
+        """Build from the cached `bars` value (columnar dict or legacy bar list)."""
+        if isinstance(bars, list):
+            bars = {
+                field: [bar[field] for bar in bars]
+                for field in ("time", *PRICE_FIELDS, "volume")
+            }
+        time = np.array(bars["time"], dtype="datetime64[D]")
+        columns = {field: np.asarray(bars[field], dtype=np.float64) for field in PRICE_FIELDS}
+        volume = np.asarray(bars["volume"], dtype=np.int64)
+        return cls._sorted(time, volume=volume, **columns)
+
+    @classmethod
+    def _sorted(cls, time: np.ndarray, **columns: np.ndarray) -> "OHLCSeries":
+        if len(time) > 1 and not (time[1:] >= time[:-1]).all():
+            order = np.argsort(time, kind="stable")
+            time = time[order]
+            columns = {field: values[order] for field, values in columns.items()}
+        return cls(time=time, **columns)
+
+    # ── Slicing ───────────────────────────────────────────────────────────────
+
+    def start_index(self, from_date: str) -> int:
+        """Offset of the first bar on or after `from_date` (YYYY-MM-DD)."""
+        return int(np.searchsorted(self.time, np.datetime64(from_date, "D"), side="left"))
+
+    def date_at(self, index: int) -> str:
+        return str(self.time[index])
+
+    # ── Incremental refresh ───────────────────────────────────────────────────
+
+    def extend(self, recent: "OHLCSeries", tolerance: float = 0.01) -> "OHLCSeries | None":
+        """
+        This history with `recent` spliced on from recent's first date.
+
+        Returns None when the two disagree on an overlapping bar by more than
+        `tolerance` (prices were re-adjusted for a split or dividend, so the
+        whole history must be refetched), or when they share no bar to check.
+        Our last bar is not compared: it may have been a partial session.
+        """
+        if not len(recent):
+            return self
+        _, ours, theirs = np.intersect1d(self.time[:-1], recent.time, return_indices=True)
+        if not len(ours):
+            return None
+        for field in PRICE_FIELDS:
+            if np.any(np.abs(getattr(self, field)[ours] - getattr(recent, field)[theirs]) > tolerance + 1e-9):
+                return None
+        cut = int(np.searchsorted(self.time, recent.time[0], side="left"))
+        return OHLCSeries(
+            time=np.concatenate((self.time[:cut], recent.time)),
+            volume=np.concatenate((self.volume[:cut], recent.volume)),
+            **{field: np.concatenate((getattr(self, field)[:cut], getattr(recent, field))) for field in PRICE_FIELDS},
+        )
+
+    # ── Serialization ─────────────────────────────────────────────────────────
+
+    def to_payload(self) -> dict[str, list]:
+        """Columnar JSON-friendly dict stored in the cache."""
+        return {
+            "time": np.datetime_as_string(self.time, unit="D").tolist(),
+            "open": self.open.tolist(),
+            "high": self.high.tolist(),
+            "low": self.low.tolist(),
+            "close": self.close.tolist(),
+            "volume": self.volume.tolist(),
+        }
+
+    def bars_json(self, start: int = 0) -> str:
+        """JSON array of bar objects from `start` onward, in the OHLCBar shape."""
+        rows = zip(
+            np.datetime_as_string(self.time[start:], unit="D").tolist(),
+            self.open[start:].tolist(),
+            self.high[start:].tolist(),
+            self.low[start:].tolist(),
+            self.close[start:].tolist(),
+            self.volume[start:].tolist(),
+        )
+        return "[" + ",".join(
+            f'{{"time":"{t}","open":{o!r},"high":{h!r},"low":{lo!r},"close":{c!r},"volume":{v}}}'
+            for t, o, h, lo, c, v in rows
+        ) + "]"
@@ -0,0 +1,182 @@
+"""
+Host-wide shared-memory cache tier (optional).
+
+Every uvicorn worker keeps its own L1, so with N workers each one warms the
+same keys from Redis/S3 separately. This tier is one mmap'd file (put it on
+/dev/shm) that all workers on the host map, sitting between the per-process
+L1 and the backend.
+
+Layout:
+    header  | magic, version, slot count, data size, write position
+    index   | open-addressed slots: key hash, log position, length, crc32, expiry
+    data    | ring buffer of records: key length, payload length, key, payload
+
+Writers append to the ring and update the index while holding an flock on
+the file. Readers take no lock: a read is accepted only if its record has not
+been overwritten since (checked against the write position after copying)
+and its key and crc32 match, so torn or recycled entries read as misses.
+Old entries are overwritten as the ring wraps, which makes the tier a
+FIFO-ish cache bounded by its data size.
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from hashlib import blake2b
+from typing import Any, Iterator
+
+_MAGIC = b"CSHM"
+_VERSION = 1
+_HEADER = struct.Struct("<4sIIQQ")        # magic, version, slots, data size, write position
+_HEADER_SIZE = 64
+_WRITE_POS_OFFSET = 20
+_WRITE_POS = struct.Struct("<Q")
+_SLOT = struct.Struct("<QQIId")           # key hash, log position, record length, crc32, expires (epoch, 0 = never)
+_RECORD = struct.Struct("<HI")            # key length, payload length
+_MAX_PROBES = 8
+
+
+def _key_hash(key: bytes) -> int:
+    # 0 marks an empty slot
+    return int.from_bytes(blake2b(key, digest_size=8).digest(), "little") or 1
+
+
+class SharedTable:
+    """mmap-backed hash table of byte payloads shared by every process on a host."""
+
+    def __init__(self, path: str, data_size: int, slots: int) -> None:
+        import fcntl  # POSIX only; the tier is disabled unless a path is configured
+
+        self._fcntl = fcntl
+        self.path = path
+        self.slots = slots
+        self.data_size = data_size
+        self._index_offset = _HEADER_SIZE
+        self._data_offset = _HEADER_SIZE + slots * _SLOT.size
+        self.max_record = data_size // 4
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "skipped": 0}
+        # flock excludes other processes only; threads of this one share the fd
+        self._thread_lock = threading.Lock()
+
+        total = self._data_offset + data_size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked():
+            if os.fstat(self._fd).st_size != total or not self._header_matches():
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, total)
+                self._mm = mmap.mmap(self._fd, total)
+                _HEADER.pack_into(self._mm, 0, _MAGIC, _VERSION, slots, data_size, 0)
+            else:
+                self._mm = mmap.mmap(self._fd, total)
+
+    def _header_matches(self) -> bool:
+        raw = os.pread(self._fd, _HEADER.size, 0)
+        if len(raw) < _HEADER.size:
+            return False
+        magic, version, slots, data_size, _ = _HEADER.unpack(raw)
+        return (magic, version, slots, data_size) == (_MAGIC, _VERSION, self.slots, self.data_size)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self._thread_lock:
+            self._fcntl.flock(self._fd, self._fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+
+    def _write_pos(self) -> int:
+        return _WRITE_POS.unpack_from(self._mm, _WRITE_POS_OFFSET)[0]
+
+    def _slot_offset(self, slot: int) -> int:
+        return self._index_offset + slot * _SLOT.size
+
+    def _live(self, pos: int, write_pos: int) -> bool:
+        return pos >= write_pos - self.data_size
+
+    # ── Reads (lock-free) ─────────────────────────────────────────────────────
+
+    def get(self, key: str) -> bytes | None:
+        key_bytes = key.encode()
+        h = _key_hash(key_bytes)
+        for probe in range(_MAX_PROBES):
+            slot_hash, pos, length, crc, expires = _SLOT.unpack_from(
+                self._mm, self._slot_offset((h + probe) % self.slots)
+            )
+            if slot_hash == 0:
+                break
+            if slot_hash != h:
+                continue
+            payload = self._read(pos, length, crc, key_bytes)
+            if payload is not None and (not expires or expires > time.time()):
+                self._stats["hits"] += 1
+                return payload
+            break
+        self._stats["misses"] += 1
+        return None
+
+    def _read(self, pos: int, length: int, crc: int, key: bytes) -> bytes | None:
+        if length > self.max_record or not self._live(pos, self._write_pos()):
+            return None
+        start = self._data_offset + pos % self.data_size
+        record = self._mm[start:start + length]
+        # The writer may have wrapped over this record while we copied it
+        if not self._live(pos, self._write_pos()) or zlib.crc32(record) != crc:
+            return None
+        key_len, payload_len = _RECORD.unpack_from(record)
+        if record[_RECORD.size:_RECORD.size + key_len] != key:
+            return None
+        return record[_RECORD.size + key_len:_RECORD.size + key_len + payload_len]
+
+    # ── Writes (flock) ────────────────────────────────────────────────────────
+
+    def put(self, key: str, payload: bytes, ttl: float | None = None) -> bool:
+        """Store `payload`; False when it is too large or already expired."""
+        key_bytes = key.encode()
+        record = _RECORD.pack(len(key_bytes), len(payload)) + key_bytes + payload
+        if len(record) > self.max_record or (ttl is not None and ttl <= 0):
+            self._stats["skipped"] += 1
+            return False
+        h = _key_hash(key_bytes)
+        expires = time.time() + ttl if ttl is not None else 0.0
+
+        with self._locked():
+            pos = self._write_pos()
+            phys = pos % self.data_size
+            if phys + len(record) > self.data_size:
+                pos += self.data_size - phys  # records never straddle the end of the ring
+                phys = 0
+            end = pos + len(record)
+            # Publish the new write position first so readers reject what we overwrite
+            _WRITE_POS.pack_into(self._mm, _WRITE_POS_OFFSET, end)
+            start = self._data_offset + phys
+            self._mm[start:start + len(record)] = record
+            slot = self._choose_slot(h, end)
+            _SLOT.pack_into(self._mm, self._slot_offset(slot), h, pos, len(record), zlib.crc32(record), expires)
+        self._stats["writes"] += 1
+        return True
+
+    def _choose_slot(self, h: int, write_pos: int) -> int:
+        """Same key, else an empty or dead slot, else the first probe position."""
+        candidates = [(h + probe) % self.slots for probe in range(_MAX_PROBES)]
+        reusable = None
+        for slot in candidates:
+            slot_hash, pos, _, _, expires = _SLOT.unpack_from(self._mm, self._slot_offset(slot))
+            if slot_hash == h:
+                return slot
+            if reusable is None and (
+                slot_hash == 0 or not self._live(pos, write_pos) or (expires and expires <= time.time())
+            ):
+                reusable = slot
+        return candidates[0] if reusable is None else reusable
+
+    def stats(self) -> dict[str, Any]:
+        """Per-process hit/miss/write counters plus the shared write position."""
+        return {**self._stats, "write_pos": self._write_pos(), "data_size": self.data_size}
+
+    def close(self) -> None:
+        self._mm.close()
+        os.close(self._fd)
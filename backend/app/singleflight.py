@@ -0,0 +1,104 @@
+"""
+Per-key single-flight execution for upstream fetches.
+
+When a popular cache entry expires, many requests miss at the same moment.
+Routing the refetch through `do(key, fn)` means only the first caller (the
+"leader") runs `fn`; every concurrent caller for the same key waits for the
+leader and shares its result — or re-raises its exception.
+
+Counters are kept per key family (the text before the first ':') so we can
+see how much upstream traffic was coalesced.
+"""
+import threading
+from collections import defaultdict
+from typing import Any, Callable
+
+from . import metrics
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+_lock = threading.Lock()
+_in_flight: dict[str, _Call] = {}
+_executions: defaultdict[str, int] = defaultdict(int)
+_coalesced: defaultdict[str, int] = defaultdict(int)
+
+
+def _family(key: str) -> str:
+    return key.split(":", 1)[0]
+
+
+def do(key: str, fn: Callable[[], Any]) -> Any:
+    """Run `fn` once per key at a time; concurrent callers share the outcome."""
+    with _lock:
+        call = _in_flight.get(key)
+        leader = call is None
+        if leader:
+            call = _Call()
+            _in_flight[key] = call
+            _executions[_family(key)] += 1
+        else:
+            _coalesced[_family(key)] += 1
+
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = fn()
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            _in_flight.pop(key, None)
+        call.done.set()
+    return call.result
+
+
+def count_coalesced(key: str) -> None:
+    """Record a caller that shared another caller's load outside do() (e.g. an awaited future)."""
+    with _lock:
+        _coalesced[_family(key)] += 1
+
+
+def stats() -> dict[str, Any]:
+    """Snapshot of upstream executions and coalesced waiters per key family."""
+    with _lock:
+        return {
+            "in_flight": len(_in_flight),
+            "executions": dict(_executions),
+            "coalesced": dict(_coalesced),
+        }
+
+
+def reset_stats() -> None:
+    with _lock:
+        _executions.clear()
+        _coalesced.clear()
+
+
+def _collect_metrics() -> list[metrics.MetricFamily]:
+    snapshot = stats()
+    return [
+        metrics.counter_family(
+            "chronostock_singleflight_executions_total", "Upstream loads actually run, by key family.",
+            (({"family": fam}, count) for fam, count in snapshot["executions"].items()),
+        ),
+        metrics.counter_family(
+            "chronostock_singleflight_coalesced_total", "Callers that waited on another caller's load, by key family.",
+            (({"family": fam}, count) for fam, count in snapshot["coalesced"].items()),
+        ),
+    ]
+
+
+metrics.register_collector(_collect_metrics)
@@ -1,39 +1,157 @@
 """
 yfinance wrapper — fetches OHLC bars, company info, and fundamentals.
 
-We always fetch the full available history (period="max") and store it as one
-file per ticker. Range filtering happens in main.py after reading from cache.
+The full available history (period="max") is stored as one file per ticker,
+in columnar form (see series.py). Refreshes are incremental where possible:
+refresh_bars() downloads only the last few days and splices them onto the
+cached history, refetching everything only when a split or dividend has
+re-adjusted past prices. Range filtering happens in main.py after reading
+from cache.
 """
+import os
+import threading
 from datetime import datetime, timezone
-from functools import lru_cache
 from time import time
 
+import numpy as np
 import yfinance as yf
-from .models import OHLCBar, StockMeta, StockNews, EarningsDate
+from . import edgar, memo, upstream
+from .models import StockMeta, StockNews, EarningsDate
+from .search import TickerIndex
+from .series import OHLCSeries
 
 
-def fetch_bars(ticker: str) -> list[OHLCBar]:
-    """Fetch the complete available price history for a ticker."""
+def fetch_bars(ticker: str) -> OHLCSeries:
+    """Fetch the complete available price history for a ticker as columns."""
     df = yf.download(ticker, period="max", auto_adjust=True, progress=False, multi_level_index=False)
 
     if df.empty:
         raise ValueError(f"No data returned for {ticker}")
 
-    bars: list[OHLCBar] = []
-    for ts, row in df.iterrows():
-        bars.append(
-            OHLCBar(
-                time=ts.strftime("%Y-%m-%d"),
-                open=round(float(row["Open"]), 2),
-                high=round(float(row["High"]), 2),
-                low=round(float(row["Low"]), 2),
-                close=round(float(row["Close"]), 2),
-                volume=int(row["Volume"]),
-            )
-        )
+    bars = OHLCSeries.from_frame(df)
+    if not len(bars):
+        raise ValueError(f"No data returned for {ticker}")
+    return bars
+
+
+# Calendar days re-downloaded before the last cached bar, so revised bars are
+# replaced and the overlap can be checked against the cached prices
+BARS_OVERLAP_DAYS = int(os.environ.get("BARS_OVERLAP_DAYS", "7"))
+
+_bars_stats_lock = threading.Lock()
+_bars_stats = {"full": 0, "incremental": 0, "adjusted": 0, "bars_downloaded": 0}
+
+
+def _count_bars(**deltas: int) -> None:
+    with _bars_stats_lock:
+        for name, delta in deltas.items():
+            _bars_stats[name] += delta
+
+
+def bars_stats() -> dict[str, int]:
+    """Full vs incremental history downloads, re-adjustment fallbacks and bars pulled."""
+    with _bars_stats_lock:
+        return dict(_bars_stats)
+
+
+def _full_bars(ticker: str) -> OHLCSeries:
+    bars = fetch_bars(ticker)
+    _count_bars(full=1, bars_downloaded=len(bars))
     return bars
 
 
+def _has_new_actions(df, after: np.datetime64) -> bool:
+    """Whether a split or dividend falls after `after`; earlier ones are already in the cached prices."""
+    actions = [col for col in ("Dividends", "Stock Splits") if col in df.columns]
+    if not actions:
+        return False
+    dates = df.index[(df[actions].fillna(0) != 0).any(axis=1).to_numpy()]
+    if getattr(dates, "tz", None) is not None:
+        dates = dates.tz_localize(None)
+    return bool((np.asarray(dates.values).astype("datetime64[D]") > after).any())
+
+
+def refresh_bars(ticker: str, cached: dict | None) -> OHLCSeries:
+    """
+    Price history for `ticker`, reusing the bars of a cached `stock:` payload.
+
+    Only bars from BARS_OVERLAP_DAYS before the last cached date are
+    downloaded. The full history is fetched instead when there is nothing
+    cached, when the window contains a split or dividend, or when the
+    overlapping bars no longer match the cached prices (adjusted since).
+    """
+    bars = (cached or {}).get("bars")
+    if not bars:
+        return _full_bars(ticker)
+    previous = OHLCSeries.from_payload(bars)
+    if not len(previous):
+        return _full_bars(ticker)
+
+    start = previous.time[-1] - np.timedelta64(BARS_OVERLAP_DAYS, "D")
+    df = yf.download(
+        ticker, start=str(start), auto_adjust=True, actions=True, progress=False, multi_level_index=False,
+    )
+    if df.empty:
+        return previous
+    if _has_new_actions(df, after=previous.time[-1]):
+        _count_bars(adjusted=1)
+        return _full_bars(ticker)
+
+    recent = OHLCSeries.from_frame(df)
+    merged = previous.extend(recent)
+    if merged is None:
+        _count_bars(adjusted=1)
+        return _full_bars(ticker)
+    _count_bars(incremental=1, bars_downloaded=len(recent))
+    return merged
+
+
+def fetch_bars_many(tickers: list[str]) -> dict[str, OHLCSeries]:
+    """
+    Fetch full histories for several tickers with a single yf.download call.
+    Tickers with no data are left out of the result instead of raising.
+    """
+    if not tickers:
+        return {}
+    df = yf.download(tickers, period="max", auto_adjust=True, progress=False, group_by="ticker", threads=True)
+
+    result: dict[str, OHLCSeries] = {}
+    if df.empty:
+        return result
+    grouped = df.columns.nlevels > 1
+    for ticker in tickers:
+        if grouped:
+            if ticker not in df.columns.get_level_values(0):
+                continue
+            frame = df[ticker]
+        elif len(tickers) == 1:
+            frame = df
+        else:
+            continue
+        bars = OHLCSeries.from_frame(frame)
+        if len(bars):
+            result[ticker] = bars
+    return result
+
+
+def stock_payload(
+    ticker: str,
+    bars: OHLCSeries,
+    company_name: str,
+    meta: StockMeta | dict | None,
+    asset_type: str,
+) -> dict:
+    """Cache payload for `stock:{ticker}` — company info plus columnar bars."""
+    return {
+        "ticker": ticker,
+        "companyName": company_name,
+        "assetType": asset_type,
+        "bars": bars.to_payload(),
+        "meta": StockMeta.model_validate(meta).model_dump() if meta is not None else None,
+        "cached_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
 def _unix_to_date(ts) -> str | None:
     """Convert a unix timestamp (int) to a YYYY-MM-DD string."""
     try:
@@ -55,8 +173,11 @@ def fetch_info(ticker: str) -> tuple[str, StockMeta, str]:
     Single yfinance call that returns (companyName, StockMeta, assetType).
     assetType is one of: "equity" | "index" | "crypto" | "etf" | "unknown"
     """
-    info = yf.Ticker(ticker).info
+    return _parse_info(ticker, yf.Ticker(ticker).info)
 
+
+def _parse_info(ticker: str, info: dict) -> tuple[str, StockMeta, str]:
+    """(companyName, StockMeta, assetType) from a yfinance-style .info dict."""
     company_name = info.get("longName") or info.get("shortName") or ticker.upper()
 
     # Analyst recommendation → human-readable label
@@ -97,10 +218,95 @@ def fetch_info(ticker: str) -> tuple[str, StockMeta, str]:
     return company_name, meta, asset_type
 
 
-def fetch_earnings_dates(ticker: str) -> list[EarningsDate]:
-    """Fetch historical and upcoming earnings dates with EPS data via yfinance."""
+# quoteSummary modules yfinance merges into .info; fields of the v7 quote override them
+_INFO_MODULES = ["financialData", "quoteType", "defaultKeyStatistics", "assetProfile", "summaryDetail"]
+
+
+def _unwrap(value):
+    """Raw value of a formatted Yahoo field ({"raw": ..., "fmt": ...}; {} when missing)."""
+    return value.get("raw") if isinstance(value, dict) else value
+
+
+def _merge_info(summary, quote) -> dict:
+    """One .info-style dict from a symbol's quoteSummary modules and v7 quote."""
+    info: dict = {}
+    modules = summary.values() if isinstance(summary, dict) else ()
+    for fields in (*modules, quote):
+        if not isinstance(fields, dict):
+            continue   # yahooquery reports per-symbol errors as strings
+        for key, value in fields.items():
+            value = _unwrap(value)
+            if value is not None:
+                info[key] = value
+    return info
+
+
+def fetch_info_many(tickers: list[str]) -> dict[str, tuple[str, StockMeta, str]]:
+    """
+    fetch_info() for several tickers via yahooquery: one quoteSummary request
+    per symbol for the modules .info is built from, issued concurrently, and
+    a single multi-symbol v7 quote request, instead of two sequential
+    yfinance requests per ticker. Tickers Yahoo has nothing for are left out.
+    """
+    if not tickers:
+        return {}
+    from yahooquery import Ticker as YQTicker
+
+    yq = YQTicker(
+        tickers,
+        formatted=True,   # raw numbers and unix timestamps, unwrapped as yfinance does
+        asynchronous=len(tickers) > 1,
+        max_workers=upstream.UPSTREAM_CONCURRENCY["yahoo"],
+    )
+    summaries = yq.get_modules(_INFO_MODULES)
+    quotes = yq.quotes
+    summaries = summaries if isinstance(summaries, dict) else {}
+    quotes = quotes if isinstance(quotes, dict) else {}
+
+    result: dict[str, tuple[str, StockMeta, str]] = {}
+    for ticker in tickers:
+        info = _merge_info(summaries.get(ticker), quotes.get(ticker))
+        if info:
+            result[ticker] = _parse_info(ticker, info)
+    return result
+
+
+# earnings_dates column → EarningsDate field
+_EARNINGS_COLUMNS = {"epsEstimate": "EPS Estimate", "reportedEps": "Reported EPS", "surprisePct": "Surprise(%)"}
+
+
+def _float_column(df, col: str, rows: np.ndarray) -> list[float | None]:
+    """Column `col` as floats with NaN / non-numeric cells as None (all None if missing)."""
+    import pandas as pd
+
+    if col not in df.columns:
+        return [None] * int(rows.sum())
+    values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64)[rows]
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+def earnings_from_frame(df) -> list[EarningsDate]:
+    """Convert a yfinance earnings_dates frame to EarningsDate items, oldest first."""
     import pandas as pd
 
+    index = df.index if isinstance(df.index, pd.DatetimeIndex) else pd.to_datetime(df.index, errors="coerce")
+    if index.tz is not None:
+        # Calendar date in the exchange's timezone, as strftime on each row did
+        index = index.tz_localize(None)
+    days = np.asarray(index.values).astype("datetime64[D]")
+    rows = ~np.isnat(days)
+    days = days[rows]
+    order = np.argsort(days, kind="stable")
+    dates = np.datetime_as_string(days[order], unit="D").tolist()
+    columns = {field: _float_column(df, col, rows) for field, col in _EARNINGS_COLUMNS.items()}
+    return [
+        EarningsDate(date=dates[i], **{field: values[j] for field, values in columns.items()})
+        for i, j in enumerate(order.tolist())
+    ]
+
+
+def fetch_earnings_dates(ticker: str) -> list[EarningsDate]:
+    """Fetch historical and upcoming earnings dates with EPS data via yfinance."""
     try:
         df = yf.Ticker(ticker).earnings_dates
     except Exception:
@@ -108,32 +314,7 @@ def fetch_earnings_dates(ticker: str) -> list[EarningsDate]:
 
     if df is None or df.empty:
         return []
-
-    items: list[EarningsDate] = []
-    for ts, row in df.iterrows():
-        try:
-            date_str = pd.Timestamp(ts).strftime("%Y-%m-%d")
-        except Exception:
-            continue
-
-        def _float(val) -> float | None:
-            try:
-                import math
-                f = float(val)
-                return None if math.isnan(f) else f
-            except Exception:
-                return None
-
-        items.append(EarningsDate(
-            date=date_str,
-            epsEstimate=_float(row.get("EPS Estimate")),
-            reportedEps=_float(row.get("Reported EPS")),
-            surprisePct=_float(row.get("Surprise(%)")),
-        ))
-
-    # Ascending chronological order
-    items.sort(key=lambda e: e.date)
-    return items
+    return earnings_from_frame(df)
 
 
 def fetch_news(ticker: str, limit: int = 12) -> list[StockNews]:
@@ -200,18 +381,65 @@ def fetch_news(ticker: str, limit: int = 12) -> list[StockNews]:
     return items
 
 
-_search_cache: dict[str, tuple[float, list[dict]]] = {}
+# Local search index over SEC's ticker list; rebuilt once it is this old
+SEARCH_INDEX_MAX_AGE_SECONDS = int(os.environ.get("SEARCH_INDEX_MAX_AGE_SECONDS", "86400"))
+_SEARCH_INDEX_RETRY_SECONDS = 60   # after a failed build (SEC unreachable)
+
+_search_index: TickerIndex | None = None
+_search_index_at = 0.0   # time of the last build attempt
+_search_index_lock = threading.Lock()
+
+
+def _search_index_due() -> bool:
+    age = time() - _search_index_at
+    return age >= (SEARCH_INDEX_MAX_AGE_SECONDS if _search_index is not None else _SEARCH_INDEX_RETRY_SECONDS)
+
+
+def _ticker_index() -> TickerIndex | None:
+    """The local search index, (re)built from SEC's ticker list when missing or stale."""
+    global _search_index, _search_index_at
+    if not _search_index_due():
+        return _search_index
+    with _search_index_lock:
+        if _search_index_due():
+            _search_index_at = time()
+            try:
+                _search_index = TickerIndex(edgar.company_names().items())
+            except Exception:
+                pass   # keep serving the previous index (or Yahoo) until the retry
+    return _search_index
+
+
+def search_local(query: str) -> list[dict]:
+    """
+    Matches from the local index without touching the network; [] when the
+    index is not built yet or due for a rebuild (search_tickers does that).
+    """
+    index = _search_index
+    if index is None or _search_index_due():
+        return []
+    return index.search(query)
+
+
 _SEARCH_CACHE_TTL = 300  # 5 minutes
+SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", "2048"))
+# yf.Search results for queries the local index could not answer
+_search_cache = memo.MemoCache("search", max_entries=SEARCH_CACHE_MAX_ENTRIES, ttl=_SEARCH_CACHE_TTL)
 
 
 def search_tickers(query: str) -> list[dict]:
+    """Local index matches, falling back to yf.Search for queries it has nothing for."""
+    index = _ticker_index()
+    if index is not None:
+        hits = index.search(query)
+        if hits:
+            return hits
+
     query_lower = query.strip().lower()
 
-    # Check in-memory cache with TTL
-    if query_lower in _search_cache:
-        cached_at, cached_results = _search_cache[query_lower]
-        if time() - cached_at < _SEARCH_CACHE_TTL:
-            return cached_results
+    cached_results = _search_cache.get(query_lower)
+    if cached_results is not None:
+        return cached_results
 
     results = []
     try:
@@ -224,5 +452,5 @@ def search_tickers(query: str) -> list[dict]:
     except Exception:
         pass
 
-    _search_cache[query_lower] = (time(), results)
+    _search_cache.set(query_lower, results)
     return results
@@ -0,0 +1,269 @@
+"""
+Shared plumbing for calls that leave the process.
+
+  - One pooled, keep-alive httpx.Client shared by the FRED and SEC fetchers
+    instead of opening a new connection for every request.
+  - A bounded worker pool per upstream ("bulkhead"). Async handlers await
+    blocking provider calls through run(); a slow provider can only queue
+    work in its own pool, so cache-hit traffic on the event loop and the
+    other upstreams keep their capacity.
+  - One persistent provider executor for fan-out inside a fetch (bars + info,
+    the macro indicator batch, the daily refresh). It replaces the
+    ThreadPoolExecutor each of those paths used to build and tear down per
+    call, and tracks queue depth and queue wait so saturation is visible.
+    Work submitted to it must not itself submit() and wait, or a full pool
+    can deadlock on its own children.
+  - A request-rate limiter for upstreams with a published limit (SEC EDGAR
+    allows 10 requests/second per client). Fetchers call throttle() before
+    every request, so the limit holds however many threads are fetching.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+import httpx
+
+from . import metrics
+
+UPSTREAM_CONCURRENCY: dict[str, int] = {
+    "cache": int(os.environ.get("CACHE_IO_CONCURRENCY", "16")),   # Redis / S3 / disk reads
+    "yahoo": int(os.environ.get("YAHOO_CONCURRENCY", "8")),
+    "fred": int(os.environ.get("FRED_CONCURRENCY", "4")),
+    "sec": int(os.environ.get("SEC_CONCURRENCY", "4")),
+}
+
+# Requests per second; upstreams not listed are not rate limited
+UPSTREAM_RATE_LIMITS: dict[str, float] = {
+    "sec": float(os.environ.get("SEC_MAX_REQUESTS_PER_SECOND", "10")),
+}
+
+PROVIDER_WORKERS = int(os.environ.get("PROVIDER_WORKERS", "16"))
+
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_SECONDS = float(os.environ.get("HTTP_KEEPALIVE_SECONDS", "30"))
+
+_lock = threading.Lock()
+_pools: dict[str, ThreadPoolExecutor] = {}
+_limiters: dict[str, "RateLimiter"] = {}
+_http_client: httpx.Client | None = None
+
+
+def http_client() -> httpx.Client:
+    """Process-wide pooled HTTP client (thread-safe; reuse connections across calls)."""
+    global _http_client
+    if _http_client is None:
+        with _lock:
+            if _http_client is None:
+                _http_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+                        keepalive_expiry=HTTP_KEEPALIVE_SECONDS,
+                    ),
+                    timeout=15,
+                )
+    return _http_client
+
+
+def _pool(upstream: str) -> ThreadPoolExecutor:
+    pool = _pools.get(upstream)
+    if pool is None:
+        with _lock:
+            pool = _pools.get(upstream)
+            if pool is None:
+                pool = _pools[upstream] = ThreadPoolExecutor(
+                    max_workers=UPSTREAM_CONCURRENCY[upstream],
+                    thread_name_prefix=f"upstream-{upstream}",
+                )
+    return pool
+
+
+class RateLimiter:
+    """Spaces acquire() calls at least 1/rate seconds apart across all threads."""
+
+    def __init__(
+        self,
+        rate: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._next = 0.0   # earliest start of the next request
+        self._stats = {"requests": 0, "throttled": 0, "wait_seconds_total": 0.0}
+
+    def acquire(self) -> float:
+        """Block until a request may start; returns the seconds waited."""
+        with self._lock:
+            now = self._clock()
+            start = max(now, self._next)
+            self._next = start + self.interval
+            wait = start - now
+            self._stats["requests"] += 1
+            if wait > 0:
+                self._stats["throttled"] += 1
+                self._stats["wait_seconds_total"] += wait
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            return dict(self._stats)
+
+
+def _limiter(upstream: str) -> RateLimiter | None:
+    rate = UPSTREAM_RATE_LIMITS.get(upstream)
+    if not rate:
+        return None
+    limiter = _limiters.get(upstream)
+    if limiter is None:
+        with _lock:
+            limiter = _limiters.setdefault(upstream, RateLimiter(rate))
+    return limiter
+
+
+def throttle(upstream: str) -> float:
+    """Wait for the upstream's request-rate limit (no-op if it has none); returns seconds waited."""
+    limiter = _limiter(upstream)
+    return limiter.acquire() if limiter is not None else 0.0
+
+
+class _ProviderExecutor:
+    """Bounded thread pool that records queue depth and time spent queued."""
+
+    def __init__(self, max_workers: int) -> None:
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="provider")
+        self._lock = threading.Lock()
+        self.max_workers = max_workers
+        self._queued = 0
+        self._active = 0
+        self._peak_queued = 0
+        self._submitted = 0
+        self._completed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        enqueued = time.perf_counter()
+
+        def task() -> Any:
+            waited = time.perf_counter() - enqueued
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._completed += 1
+
+        with self._lock:
+            self._queued += 1
+            self._submitted += 1
+            self._peak_queued = max(self._peak_queued, self._queued)
+        try:
+            return self._pool.submit(task)
+        except BaseException:
+            with self._lock:
+                self._queued -= 1
+                self._submitted -= 1
+            raise
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            started = self._completed + self._active
+            return {
+                "max_workers": self.max_workers,
+                "queued": self._queued,
+                "active": self._active,
+                "peak_queued": self._peak_queued,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "wait_seconds_total": self._wait_total,
+                "wait_seconds_max": self._wait_max,
+                "wait_seconds_avg": self._wait_total / started if started else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_provider_executor: _ProviderExecutor | None = None
+
+
+def _provider() -> _ProviderExecutor:
+    global _provider_executor
+    if _provider_executor is None:
+        with _lock:
+            if _provider_executor is None:
+                _provider_executor = _ProviderExecutor(PROVIDER_WORKERS)
+    return _provider_executor
+
+
+def submit(fn: Callable[..., Any], *args: Any) -> Future:
+    """Run a blocking provider call on the shared fan-out executor."""
+    return _provider().submit(fn, *args)
+
+
+def provider_stats() -> dict[str, Any]:
+    """Queue depth, worker usage and queue-wait times of the fan-out executor."""
+    return _provider().stats()
+
+
+def submit_on(upstream: str, fn: Callable[..., Any], *args: Any) -> Future:
+    """Run a blocking call on the named upstream's bounded pool (for batch jobs)."""
+    return _pool(upstream).submit(fn, *args)
+
+
+async def run(upstream: str, fn: Callable[..., Any], *args: Any) -> Any:
+    """Await a blocking call on the named upstream's bounded pool."""
+    return await asyncio.wrap_future(submit_on(upstream, fn, *args))
+
+
+def close() -> None:
+    global _http_client, _provider_executor
+    with _lock:
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
+        if _provider_executor is not None:
+            _provider_executor.shutdown()
+            _provider_executor = None
+        pools = list(_pools.values())
+        _pools.clear()
+    # Outside the lock: a task still draining may need http_client() or _pool()
+    for pool in pools:
+        pool.shutdown()
+
+
+def _collect_metrics() -> list[metrics.MetricFamily]:
+    families = []
+    if _provider_executor is not None:
+        families.append(metrics.gauge(
+            "chronostock_provider_executor", "Provider fan-out executor queue depth, workers and queue wait.",
+            (({"stat": name}, value) for name, value in _provider_executor.stats().items()),
+        ))
+    with _lock:
+        limiters = dict(_limiters)
+    if limiters:
+        families.append(metrics.counter_family(
+            "chronostock_upstream_rate_limit", "Requests through each upstream rate limiter, and time spent throttled.",
+            (
+                ({"upstream": upstream, "counter": name}, value)
+                for upstream, limiter in limiters.items()
+                for name, value in limiter.stats().items()
+            ),
+        ))
+    return families
+
+
+metrics.register_collector(_collect_metrics)
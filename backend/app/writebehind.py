@@ -0,0 +1,172 @@
+"""
+Asynchronous, batching write-behind queue.
+
+Used by the tiered cache backend to copy writes to the durable S3 tier off
+the request path. put() only records the write; a background thread hands
+batches to `flush` once `batch_size` keys are pending or the oldest pending
+write is `max_delay` seconds old. Writes to a key that is still pending
+replace the queued value, so a hot key is uploaded once per batch.
+
+A failed batch is put back (values written since then win) and retried
+with capped exponential backoff. The queue is bounded: put() blocks while
+`max_pending` keys are waiting, which pushes back on writers instead of
+growing without limit. flush_pending() drains it synchronously for shutdown.
+"""
+import threading
+import time
+from typing import Any, Callable
+
+_MAX_BACKOFF_SECONDS = 30.0
+
+
+class WriteBehindQueue:
+    """Coalescing queue of key → value writes drained in batches by one thread."""
+
+    def __init__(
+        self,
+        flush: Callable[[dict[str, Any]], None],
+        batch_size: int = 64,
+        max_delay: float = 1.0,
+        max_pending: int = 10_000,
+        name: str = "write-behind",
+    ) -> None:
+        self._flush = flush
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self._name = name
+        self._pending: dict[str, Any] = {}
+        self._oldest: float | None = None       # monotonic time of the oldest pending write
+        self._in_flight = 0                     # keys handed to flush and not yet settled
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._closed = False
+        self._failures = 0                      # consecutive failed batches
+        self._stats = {
+            "enqueued": 0, "coalesced": 0, "flushed": 0, "batches": 0,
+            "failed_batches": 0, "blocked_puts": 0,
+        }
+
+    def put(self, key: str, value: Any) -> None:
+        self.put_many({key: value})
+
+    def put_many(self, items: dict[str, Any]) -> None:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"{self._name} queue is closed")
+            for key, value in items.items():
+                if key not in self._pending and len(self._pending) >= self.max_pending:
+                    self._stats["blocked_puts"] += 1
+                    self._cond.notify_all()
+                    self._cond.wait_for(lambda: len(self._pending) < self.max_pending or self._closed)
+                    if self._closed:
+                        raise RuntimeError(f"{self._name} queue is closed")
+                if key in self._pending:
+                    self._stats["coalesced"] += 1
+                    del self._pending[key]   # re-insert so batches go oldest-write first
+                self._pending[key] = value
+                self._stats["enqueued"] += 1
+                if self._oldest is None:
+                    self._oldest = time.monotonic()
+            self._ensure_thread()
+            self._cond.notify_all()
+
+    def peek(self, key: str) -> tuple[bool, Any]:
+        """(True, value) if a write to `key` is still waiting to be flushed."""
+        with self._cond:
+            if key in self._pending:
+                return True, self._pending[key]
+            return False, None
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+            self._thread.start()
+
+    def _take_batch(self) -> dict[str, Any]:
+        keys = list(self._pending)[:self.batch_size]
+        batch = {key: self._pending.pop(key) for key in keys}
+        # Writes left behind restart the delay clock
+        self._oldest = time.monotonic() if self._pending else None
+        self._in_flight += len(batch)
+        self._cond.notify_all()
+        return batch
+
+    def _due(self) -> bool:
+        if not self._pending:
+            return False
+        return (
+            self._closed
+            or len(self._pending) >= self.batch_size
+            or time.monotonic() - self._oldest >= self.max_delay
+        )
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._due():
+                    if self._closed and not self._pending:
+                        return
+                    timeout = None if self._oldest is None else self.max_delay - (time.monotonic() - self._oldest)
+                    self._cond.wait(timeout=timeout if timeout is None else max(timeout, 0.0))
+                batch = self._take_batch()
+            if not self._write(batch) and self._closed:
+                return   # close() gave up draining; the batch stays pending
+
+    def _write(self, batch: dict[str, Any]) -> bool:
+        try:
+            self._flush(batch)
+        except Exception:
+            with self._cond:
+                self._stats["failed_batches"] += 1
+                self._failures += 1
+                for key, value in batch.items():
+                    self._pending.setdefault(key, value)   # a newer write to the key wins
+                if self._oldest is None:
+                    self._oldest = time.monotonic()
+                self._in_flight -= len(batch)
+                backoff = min(0.5 * 2 ** (self._failures - 1), _MAX_BACKOFF_SECONDS)
+                self._cond.notify_all()
+                if not self._closed:
+                    self._cond.wait(timeout=backoff)
+            return False
+        with self._cond:
+            self._failures = 0
+            self._stats["batches"] += 1
+            self._stats["flushed"] += len(batch)
+            self._in_flight -= len(batch)
+            self._cond.notify_all()
+        return True
+
+    def flush_pending(self, timeout: float | None = None) -> bool:
+        """Write everything queued so far from the calling thread; False if it did not drain in time."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                if not self._pending and not self._in_flight:
+                    return True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                if not self._pending:
+                    self._cond.wait(timeout=remaining)   # a background batch is still being written
+                    continue
+                batch = self._take_batch()
+            self._write(batch)
+
+    def close(self, timeout: float | None = None) -> bool:
+        """Drain the queue and stop the background thread."""
+        drained = self.flush_pending(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        return drained
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                **self._stats,
+                "pending": len(self._pending),
+                "in_flight": self._in_flight,
+                "oldest_pending_seconds": 0.0 if self._oldest is None else time.monotonic() - self._oldest,
+            }
@@ -3,28 +3,33 @@ from types import SimpleNamespace
 import sys
 import pytest
 
-from app import cache
+from app import cache, codec
 
 
 def test_l1_set_evicts_oldest_and_l1_get_moves_to_end(monkeypatch) -> None:
-    original_max = cache._L1_MAX_SIZE
-    original_cache = cache._l1_cache.copy()
-    try:
-        monkeypatch.setattr(cache, "_L1_MAX_SIZE", 2)
-        cache._l1_cache.clear()
+    monkeypatch.setattr(cache, "_l1", cache.ShardedL1Cache(max_bytes=10**6, max_entries=2, shards=1))
 
-        cache._l1_set("a", 1)
-        cache._l1_set("b", 2)
-        hit, value = cache._l1_get("a")
-        assert hit is True
-        assert value == 1
+    cache._l1_set("a", 1)
+    cache._l1_set("b", 2)
+    hit, value = cache._l1_get("a")
+    assert hit is True
+    assert value == 1
 
-        cache._l1_set("c", 3)
-        assert list(cache._l1_cache.keys()) == ["a", "c"]
-    finally:
-        cache._l1_cache.clear()
-        cache._l1_cache.update(original_cache)
-        monkeypatch.setattr(cache, "_L1_MAX_SIZE", original_max)
+    cache._l1_set("c", 3)
+    assert cache._l1.keys() == ["a", "c"]
+
+
+def test_l1_entries_expire_with_their_freshness_policy(monkeypatch) -> None:
+    monkeypatch.setattr(cache, "_l1", cache._new_l1())
+
+    cache._l1_set("news:NVDA", {"cached_at": _stamp(30), "items": []})   # already stale
+    cache._l1_set("news:AAPL", {"cached_at": _stamp(1), "items": []})
+    cache._l1_set("news:MSFT", {"items": []})                          # unstamped
+    cache._l1_set("price:NVDA", {"p": 1})                              # no policy → default TTL
+
+    assert sorted(cache._l1.keys()) == ["news:AAPL", "price:NVDA"]
+    assert 0 < cache._l1_ttl("news:AAPL", {"cached_at": _stamp(1)}) <= 23 * 3600
+    assert cache._l1_ttl("price:NVDA", {}) == cache._L1_DEFAULT_TTL_SECONDS
 
 
 def test_local_set_and_get_roundtrip(tmp_path, monkeypatch) -> None:
@@ -34,6 +39,63 @@ def test_local_set_and_get_roundtrip(tmp_path, monkeypatch) -> None:
     assert cache._local_get("stock:NVDA:1Y") == {"x": 1}
 
 
+def test_local_get_reads_legacy_json_file(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(cache, "LOCAL_CACHE_DIR", tmp_path)
+    (tmp_path / "price_AAPL.json").write_text(json.dumps({"p": 1}))
+
+    assert cache._local_get("price:AAPL") == {"p": 1}
+    assert cache._local_get_many(["price:AAPL"]) == {"price:AAPL": {"p": 1}}
+    # Flat files from before sharding are moved into their subdirectory
+    assert not (tmp_path / "price_AAPL.json").exists()
+    assert cache._local_path("price:AAPL").exists()
+
+
+def test_local_set_writes_into_hashed_subdirectory_atomically(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(cache, "LOCAL_CACHE_DIR", tmp_path)
+
+    cache._local_set("price:AAPL", {"p": 1})
+    cache._local_set("price:AAPL", {"p": 2})
+
+    (shard,) = tmp_path.iterdir()
+    assert len(shard.name) == 2
+    assert [p.name for p in shard.iterdir()] == ["price_AAPL.json"]  # no temp files left
+    assert cache._local_get("price:AAPL") == {"p": 2}
+
+
+def test_local_set_files_follow_the_umask_not_owner_only(tmp_path, monkeypatch) -> None:
+    import os
+    import stat
+
+    monkeypatch.setattr(cache, "LOCAL_CACHE_DIR", tmp_path)
+    previous = os.umask(0o022)
+    try:
+        cache._local_set("price:AAPL", {"p": 1})
+    finally:
+        os.umask(previous)
+
+    assert stat.S_IMODE(cache._local_path("price:AAPL").stat().st_mode) == 0o644
+
+
+def test_local_set_failure_keeps_previous_entry(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(cache, "LOCAL_CACHE_DIR", tmp_path)
+    cache._local_set("price:AAPL", {"p": 1})
+
+    with pytest.raises(TypeError):
+        cache._local_set("price:AAPL", {"p": object()})
+
+    assert cache._local_get("price:AAPL") == {"p": 1}
+    assert [p.name for p in cache._local_path("price:AAPL").parent.iterdir()] == ["price_AAPL.json"]
+
+
+def test_local_get_treats_empty_file_as_missing(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(cache, "LOCAL_CACHE_DIR", tmp_path)
+    path = cache._local_path("price:AAPL")
+    path.parent.mkdir()
+    path.write_bytes(b"")
+
+    assert cache._local_get("price:AAPL") is None
+
+
 def test_local_get_missing_returns_none(tmp_path, monkeypatch) -> None:
     monkeypatch.setattr(cache, "LOCAL_CACHE_DIR", tmp_path)
     assert cache._local_get("missing:key") is None
@@ -77,33 +139,30 @@ def test_get_and_set_dispatch_to_local_backend(tmp_path, monkeypatch) -> None:
 
 
 def test_get_backend_miss_does_not_populate_l1(monkeypatch) -> None:
-    original_cache = cache._l1_cache.copy()
-    try:
-        cache._l1_cache.clear()
-        monkeypatch.setattr(cache, "CACHE_BACKEND", "local")
-        monkeypatch.setattr(cache, "_local_get", lambda key: None)
+    monkeypatch.setattr(cache, "_l1", cache._new_l1())
+    monkeypatch.setattr(cache, "CACHE_BACKEND", "local")
+    monkeypatch.setattr(cache, "_local_get", lambda key: None)
 
-        assert cache.get("missing") is None
-        assert "missing" not in cache._l1_cache
-    finally:
-        cache._l1_cache.clear()
-        cache._l1_cache.update(original_cache)
+    assert cache.get("missing") is None
+    assert "missing" not in cache._l1
+    assert cache.l1_stats()["families"]["missing"]["misses"] == 1
 
 
-def test_s3_client_builds_boto3_client() -> None:
+def test_s3_client_is_built_once_with_tuned_pool(monkeypatch) -> None:
     calls = []
-    fake_boto3 = SimpleNamespace(client=lambda service: calls.append(service) or "s3-client")
-    original = sys.modules.get("boto3")
-    sys.modules["boto3"] = fake_boto3
-    try:
-        assert cache._s3_client() == "s3-client"
-    finally:
-        if original is None:
-            del sys.modules["boto3"]
-        else:
-            sys.modules["boto3"] = original
+    fake_boto3 = SimpleNamespace(client=lambda service, config=None: calls.append((service, config)) or "s3-client")
+    fake_config = SimpleNamespace(Config=lambda **kwargs: kwargs)
+    monkeypatch.setitem(sys.modules, "boto3", fake_boto3)
+    monkeypatch.setitem(sys.modules, "botocore.config", fake_config)
+    monkeypatch.setattr(cache, "_s3", None)
 
-    assert calls == ["s3"]
+    assert cache._s3_client() == "s3-client"
+    assert cache._s3_client() == "s3-client"
+
+    assert len(calls) == 1
+    service, config = calls[0]
+    assert service == "s3"
+    assert config["max_pool_connections"] == cache.S3_MAX_POOL_CONNECTIONS
 
 
 def test_s3_get_returns_none_for_missing_key(monkeypatch) -> None:
@@ -143,7 +202,7 @@ def test_s3_get_reraises_non_missing_client_error(monkeypatch) -> None:
         cache._s3_get("abc")
 
 
-def test_s3_set_writes_json_payload(monkeypatch) -> None:
+def test_s3_set_writes_encoded_payload(monkeypatch) -> None:
     seen = {}
 
     class FakeS3:
@@ -157,7 +216,7 @@ def test_s3_set_writes_json_payload(monkeypatch) -> None:
     cache._s3_set("abc", {"x": 1})
     assert seen["Bucket"] == "bucket"
     assert seen["Key"] == "prefix/abc.json"
-    assert json.loads(seen["Body"]) == {"x": 1}
+    assert codec.decode(seen["Body"]) == {"x": 1}
 
 
 def test_s3_get_reads_json_payload(monkeypatch) -> None:
@@ -203,7 +262,7 @@ def test_redis_client_uses_from_url() -> None:
         else:
             sys.modules["redis"] = original
 
-    assert calls == [(cache.REDIS_URL, True)]
+    assert calls == [(cache.REDIS_URL, False)]
 
 
 def test_get_pool_reuses_existing_pool(monkeypatch) -> None:
@@ -226,7 +285,7 @@ def test_redis_set_without_ttl_and_error_paths(monkeypatch) -> None:
             self.calls = []
 
         def set(self, key, payload, ex=None):
-            self.calls.append((key, json.loads(payload), ex))
+            self.calls.append((key, codec.decode(payload), ex))
 
     client = FakeClient()
     redis_exceptions = SimpleNamespace(RedisError=FakeRedisError)
@@ -281,6 +340,7 @@ def test_redis_get_returns_none_on_redis_error(monkeypatch) -> None:
 
 def test_redis_set_uses_ttl_when_configured(monkeypatch) -> None:
     monkeypatch.setattr(cache, "REDIS_CACHE_TTL_SECONDS", 30)
+    monkeypatch.setattr(cache, "CACHE_TTL_JITTER", 0)
 
     class FakeRedisError(Exception):
         pass
@@ -290,7 +350,7 @@ def test_redis_set_uses_ttl_when_configured(monkeypatch) -> None:
             self.calls = []
 
         def set(self, key, payload, ex=None):
-            self.calls.append((key, json.loads(payload), ex))
+            self.calls.append((key, codec.decode(payload), ex))
 
     client = FakeClient()
     redis_exceptions = SimpleNamespace(RedisError=FakeRedisError)
@@ -301,3 +361,732 @@ def test_redis_set_uses_ttl_when_configured(monkeypatch) -> None:
     cache._redis_set("abc", {"ok": True})
 
     assert client.calls == [(cache.REDIS_PREFIX + "abc", {"ok": True}, 30)]
+
+
+def _stamp(hours_ago: float) -> str:
+    from datetime import datetime, timedelta, timezone
+    return (datetime.now(timezone.utc) - timedelta(hours=hours_ago)).isoformat()
+
+
+def _wait_for_refresh(key: str) -> None:
+    for _ in range(500):
+        with cache._refresh_lock:
+            future = cache._refreshing.get(key)
+        if future is None:
+            return
+        future.exception(timeout=5)
+    raise AssertionError(f"refresh for {key} never finished")
+
+
+def test_policy_for_uses_longest_matching_prefix(monkeypatch) -> None:
+    from datetime import timedelta
+
+    broad = cache.FreshnessPolicy(ttl=timedelta(hours=1), max_stale=timedelta(hours=2))
+    narrow = cache.FreshnessPolicy(ttl=timedelta(hours=3), max_stale=timedelta(hours=4))
+    monkeypatch.setattr(cache, "FRESHNESS_POLICIES", {"sec:": broad, "sec:filings:": narrow})
+
+    assert cache.policy_for("sec:filings:NVDA") is narrow
+    assert cache.policy_for("sec:cik_map") is broad
+    with pytest.raises(KeyError):
+        cache.policy_for("price:NVDA")
+
+
+def _aget_or_refresh(key: str, loader, provider: str):
+    import asyncio
+
+    cache._l1.pop(key)   # these tests patch get(); an L1 copy from elsewhere would bypass it
+    return asyncio.run(cache.aget_or_refresh(key, loader, provider))
+
+
+def test_aget_or_refresh_serves_fresh_entry_without_loading(monkeypatch) -> None:
+    fresh = {"cached_at": _stamp(1), "items": [1]}
+    monkeypatch.setattr(cache, "get", lambda key: fresh)
+
+    def loader():
+        raise AssertionError("should not load")
+
+    assert _aget_or_refresh("news:NVDA", loader, "yahoo") is fresh
+
+
+def test_effective_ttl_is_jittered_per_write_within_bounds() -> None:
+    from datetime import timedelta
+
+    policy = cache.FreshnessPolicy(ttl=timedelta(hours=24), max_stale=timedelta(hours=72))
+    stamp = _stamp(0)
+    ttls = {cache._effective_ttl(f"stock:T{i}", stamp, policy) for i in range(50)}
+
+    assert len(ttls) > 40   # written together, expiring apart
+    assert all(timedelta(hours=24) * (1 - cache.CACHE_TTL_JITTER) <= ttl <= timedelta(hours=24) for ttl in ttls)
+    # Deterministic per write, so every worker classifies the entry the same way
+    assert cache._effective_ttl("stock:T1", stamp, policy) == cache._effective_ttl("stock:T1", stamp, policy)
+
+
+def test_redis_ttl_is_jittered_below_configured_ttl(monkeypatch) -> None:
+    monkeypatch.setattr(cache, "REDIS_CACHE_TTL_SECONDS", 1000)
+    monkeypatch.setattr(cache, "CACHE_TTL_JITTER", 0.2)
+
+    ttls = [cache._redis_ttl() for _ in range(200)]
+
+    assert all(800 <= ttl <= 1000 for ttl in ttls)
+    assert len(set(ttls)) > 1
+    monkeypatch.setattr(cache, "REDIS_CACHE_TTL_SECONDS", 0)
+    assert cache._redis_ttl() is None
+
+
+def test_fresh_entry_near_expiry_is_refreshed_early_by_xfetch(monkeypatch) -> None:
+    from datetime import datetime, timedelta, timezone
+
+    monkeypatch.setattr(cache, "CACHE_TTL_JITTER", 0)
+    monkeypatch.setattr(cache, "_recompute_seconds", {"news": 120.0})
+    monkeypatch.setattr(cache, "random", SimpleNamespace(random=lambda: 0.5))   # -ln(0.5) ≈ 0.69
+    almost_expired = {"cached_at": (datetime.now(timezone.utc) - timedelta(hours=24, seconds=-60)).isoformat()}
+    far_from_expiry = {"cached_at": _stamp(1)}
+    before = cache.freshness_stats()["early_refreshes"]
+
+    assert cache._classify("news:NVDA", almost_expired) == "stale"   # 60s left < 120s * 0.69
+    assert cache._classify("news:NVDA", far_from_expiry) == "fresh"
+    assert cache.freshness_stats()["early_refreshes"] == before + 1
+
+    monkeypatch.setattr(cache, "CACHE_XFETCH_BETA", 0)
+    assert cache._classify("news:NVDA", almost_expired) == "fresh"
+
+
+def test_loads_record_smoothed_recompute_cost(monkeypatch) -> None:
+    monkeypatch.setattr(cache, "_recompute_seconds", {})
+    monkeypatch.setattr(cache, "set", lambda key, value: None)
+    ticks = iter([0.0, 2.0, 10.0, 14.0])
+    monkeypatch.setattr(cache, "time", SimpleNamespace(perf_counter=lambda: next(ticks)))
+
+    cache._load("news:NVDA", lambda: {})
+    assert cache.recompute_seconds() == {"news": 2.0}
+    cache._load("news:AAPL", lambda: {})
+    assert cache.recompute_seconds()["news"] == pytest.approx(2.0 + cache._RECOMPUTE_SMOOTHING * 2.0)
+
+
+def test_content_digest_ignores_the_timestamp() -> None:
+    digest = cache.content_digest({"cached_at": _stamp(0), "items": [1, 2]})
+
+    assert digest == cache.content_digest({"cached_at": _stamp(5), "items": (1, 2)})
+    assert digest != cache.content_digest({"cached_at": _stamp(0), "items": [1, 3]})
+    assert cache.content_digest({"cachedAt": "a", "x": 1}, "cachedAt") == cache.content_digest({"x": 1}, "cachedAt")
+
+
+@pytest.fixture
+def verified_store(monkeypatch):
+    store = {}
+    monkeypatch.setattr(cache, "get_many", lambda keys: {key: store[key] for key in keys if key in store})
+    monkeypatch.setattr(cache, "set_many", store.update)
+    cache._verified_memo.clear()
+    yield store
+    cache._verified_memo.clear()
+
+
+def test_verified_entries_count_as_fresh_until_rewritten(monkeypatch, verified_store) -> None:
+    store = verified_store
+    monkeypatch.setattr(cache, "CACHE_XFETCH_BETA", 0)
+    old = {"cached_at": _stamp(30), "items": ["same"]}
+    assert cache._classify("news:NVDA", old) == "stale"
+    assert cache._l1_ttl("news:NVDA", old) < 0
+
+    cache.record_verified({"news:NVDA": old["cached_at"]})
+
+    assert cache._classify("news:NVDA", old) == "fresh"
+    assert cache._l1_ttl("news:NVDA", old) > 21 * 3600
+    assert cache._l1_ttl("verified:news:NVDA", store["verified:news:NVDA"]) == cache.VERIFIED_STAMPS_TTL_SECONDS
+    # A different payload under the key (rewritten since) is aged by its own stamp
+    assert cache._classify("news:NVDA", {"cached_at": _stamp(31), "items": ["same"]}) == "stale"
+    assert cache._classify("news:AAPL", old) == "stale"
+
+    # Another worker reads the record from the cache rather than its own memo,
+    # but only to classify: sizing an L1 fill never reads the backend
+    cache._verified_memo.clear()
+    monkeypatch.setattr(cache, "get_many", lambda keys: pytest.fail("backend read while sizing an L1 fill"))
+    assert cache._l1_ttl("news:NVDA", old) < 0
+    monkeypatch.setattr(cache, "get_many", lambda keys: {key: store[key] for key in keys if key in store})
+    assert cache._classify("news:NVDA", old) == "fresh"
+    assert cache._l1_ttl("news:NVDA", old) > 21 * 3600
+
+
+def test_concurrent_record_verified_calls_keep_every_stamp(verified_store) -> None:
+    import threading
+
+    store = verified_store
+    threads = [
+        threading.Thread(target=cache.record_verified, args=({f"news:T{n}": f"stamp-{n}"},)) for n in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(store) == sorted(f"verified:news:T{n}" for n in range(8))
+    assert store["verified:news:T3"]["stamp"] == "stamp-3"
+
+
+def test_fresh_entries_never_look_up_a_verification(monkeypatch, verified_store) -> None:
+    monkeypatch.setattr(cache, "get_many", lambda keys: pytest.fail("no record needed for a fresh entry"))
+    monkeypatch.setattr(cache, "CACHE_XFETCH_BETA", 0)
+
+    assert cache._classify("news:NVDA", {"cached_at": _stamp(1), "items": []}) == "fresh"
+
+
+def test_aget_or_refresh_reads_verifications_on_the_cache_pool(monkeypatch, verified_store) -> None:
+    import asyncio
+
+    monkeypatch.setattr(cache, "CACHE_XFETCH_BETA", 0)
+    old = {"cached_at": _stamp(30), "items": ["same"]}
+    verified_store["verified:news:NVDA"] = {"stamp": old["cached_at"], "verified_at": _stamp(1)}
+    monkeypatch.setattr(cache, "_l1", cache._new_l1())
+    monkeypatch.setattr(cache, "get", lambda key: old)
+    reads = []
+
+    def get_many(keys):
+        with pytest.raises(RuntimeError):
+            asyncio.get_running_loop()    # not on the event loop's thread
+        reads.append(keys)
+        return {key: verified_store[key] for key in keys if key in verified_store}
+
+    monkeypatch.setattr(cache, "get_many", get_many)
+
+    value = asyncio.run(cache.aget_or_refresh("news:NVDA", lambda: pytest.fail("verified entry is fresh"), "yahoo"))
+
+    assert value is old
+    assert reads == [["verified:news:NVDA"]]
+    # Memoized: the next request classifies without another read
+    assert asyncio.run(cache.aget_or_refresh("news:NVDA", lambda: pytest.fail("fresh"), "yahoo")) is old
+    assert len(reads) == 1
+
+
+def test_aget_or_refresh_serves_stale_entry_and_refreshes_in_background(monkeypatch) -> None:
+    stale = {"cached_at": _stamp(30), "items": ["old"]}
+    writes = {}
+    monkeypatch.setattr(cache, "get", lambda key: stale)
+    monkeypatch.setattr(cache, "set", lambda key, value: writes.update({key: value}))
+
+    result = _aget_or_refresh("news:NVDA", lambda: {"cached_at": _stamp(0), "items": ["new"]}, "yahoo")
+    _wait_for_refresh("news:NVDA")
+
+    assert result is stale
+    assert writes["news:NVDA"]["items"] == ["new"]
+
+
+def test_aget_or_refresh_background_failure_keeps_stale_and_backs_off(monkeypatch) -> None:
+    import threading
+
+    stale = {"cachedAt": _stamp(8)}  # past the 6h market:summary TTL
+    monkeypatch.setattr(cache, "get", lambda key: stale)
+    monkeypatch.setattr(cache, "_refresh_failed_at", {})
+    before = cache.freshness_stats()
+    threads = []
+
+    def broken():
+        threads.append(threading.current_thread().name)
+        raise RuntimeError("FRED down")
+
+    assert _aget_or_refresh("market:summary", broken, "fred") is stale
+    _wait_for_refresh("market:summary")
+    assert cache.freshness_stats()["refresh_failures"] == before["refresh_failures"] + 1
+    assert threads[0].startswith("upstream-fred")
+
+    # Within the cool-down the stale copy is served without another upstream attempt
+    assert _aget_or_refresh("market:summary", broken, "fred") is stale
+    _wait_for_refresh("market:summary")
+    assert len(threads) == 1
+    assert cache.freshness_stats()["refresh_backoffs"] == before["refresh_backoffs"] + 1
+
+    monkeypatch.setattr(cache, "CACHE_REFRESH_RETRY_SECONDS", 0)
+    _aget_or_refresh("market:summary", broken, "fred")
+    _wait_for_refresh("market:summary")
+    assert len(threads) == 2
+
+
+def test_aget_or_refresh_blocks_when_past_max_stale_or_unstamped(monkeypatch) -> None:
+    writes = {}
+    monkeypatch.setattr(cache, "set", lambda key, value: writes.update({key: value}))
+
+    monkeypatch.setattr(cache, "get", lambda key: {"cached_at": _stamp(24 * 30), "items": ["ancient"]})
+    result = _aget_or_refresh("earnings:NVDA", lambda: {"cached_at": _stamp(0), "items": ["new"]}, "yahoo")
+    assert result["items"] == ["new"]
+    assert writes["earnings:NVDA"] is result
+
+    # Naive timestamps are treated as UTC; missing ones as unknown age.
+    monkeypatch.setattr(cache, "get", lambda key: {"name": "VIX", "data": []})
+    result = _aget_or_refresh("indicator:vix", lambda: {"name": "VIX", "data": [1], "cachedAt": "2026-01-01T00:00:00"}, "yahoo")
+    assert result["data"] == [1]
+
+
+def test_aget_or_refresh_blocking_load_propagates_errors(monkeypatch) -> None:
+    monkeypatch.setattr(cache, "get", lambda key: None)
+
+    def broken():
+        raise ValueError("No data returned for XXXX")
+
+    with pytest.raises(ValueError, match="No data returned"):
+        _aget_or_refresh("stock:XXXX", broken, "yahoo")
+
+
+def test_refresh_in_background_deduplicates_per_key(monkeypatch) -> None:
+    import threading
+
+    release = threading.Event()
+    calls = []
+    monkeypatch.setattr(cache, "set", lambda key, value: None)
+
+    def slow_loader():
+        calls.append(1)
+        release.wait(timeout=5)
+        return {"cached_at": _stamp(0)}
+
+    cache._refresh_in_background("sec:filings:NVDA", slow_loader, "sec")
+    cache._refresh_in_background("sec:filings:NVDA", slow_loader, "sec")
+    release.set()
+    _wait_for_refresh("sec:filings:NVDA")
+
+    assert len(calls) == 1
+
+
+def test_encoded_memoizes_per_version_and_skips_unversioned(monkeypatch) -> None:
+    monkeypatch.setattr(cache, "_encoded", cache.memo.MemoCache("encoded", max_entries=2))
+    renders = []
+
+    def render(body):
+        return lambda: renders.append(body) or body
+
+    first = cache.encoded("news:NVDA", "v1", render(b"[1]"))
+    assert cache.encoded("news:NVDA", "v1", render(b"[changed]")) is first
+    assert first.etag == cache.encode_body(b"[1]").etag
+    assert first.etag.startswith('"') and first.etag.endswith('"')
+
+    second = cache.encoded("news:NVDA", "v2", render(b"[2]"))
+    assert second.body == b"[2]"
+    assert second.etag != first.etag
+
+    cache.encoded("a", None, render(b"x"))
+    cache.encoded("a", None, render(b"x"))
+    assert renders == [b"[1]", b"[2]", b"x", b"x"]
+
+    cache.encoded("b", "v", render(b"b"))
+    cache.encoded("c", "v", render(b"c"))
+    assert cache._encoded.keys() == ["b", "c"]
+
+
+def test_concurrent_aget_or_refresh_misses_share_one_load(monkeypatch) -> None:
+    import asyncio
+    import threading
+
+    monkeypatch.setattr(cache, "_l1", cache._new_l1())
+    store = {}
+    monkeypatch.setattr(cache, "get", store.get)
+    monkeypatch.setattr(cache, "set", store.__setitem__)
+    submitted = []
+    real_submit_on = cache.upstream.submit_on
+    monkeypatch.setattr(
+        cache.upstream, "submit_on", lambda name, fn, *args: submitted.append(name) or real_submit_on(name, fn, *args)
+    )
+    release = threading.Event()
+    loads = []
+
+    def loader():
+        loads.append(1)
+        release.wait(timeout=5)
+        return {"cached_at": _stamp(0), "items": ["new"]}
+
+    async def scenario():
+        waiters = [asyncio.create_task(cache.aget_or_refresh("news:AAPL", loader, "yahoo")) for _ in range(64)]
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*waiters)
+
+    results = asyncio.run(scenario())
+
+    assert len(loads) == 1
+    assert submitted.count("yahoo") == 1   # the other submissions are the cache reads
+    assert all(result is results[0] for result in results)
+    assert cache._async_loads == {}
+
+
+def test_blocking_load_leader_rechecks_the_cache_first(monkeypatch) -> None:
+    fresh = {"cached_at": _stamp(0), "items": ["loaded by another caller"]}
+    monkeypatch.setattr(cache, "get", lambda key: fresh)
+
+    assert cache._load_unless_fresh("news:NVDA", lambda: pytest.fail("entry is already fresh")) is fresh
+
+    stale = {"cached_at": _stamp(30), "items": ["old"]}
+    writes = {}
+    monkeypatch.setattr(cache, "get", lambda key: stale)
+    monkeypatch.setattr(cache, "set", lambda key, value: writes.update({key: value}))
+    assert cache._load_unless_fresh("news:NVDA", lambda: {"cached_at": _stamp(0), "items": ["new"]})["items"] == ["new"]
+    assert writes["news:NVDA"]["items"] == ["new"]
+
+
+def test_aget_or_refresh_loads_on_provider_pool_and_serves_l1_inline(monkeypatch) -> None:
+    import asyncio
+
+    monkeypatch.setattr(cache, "_l1", cache._new_l1())
+    monkeypatch.setattr(cache, "get", lambda key: None)
+    monkeypatch.setattr(cache, "set", lambda key, value: cache._l1_set(key, value))
+    providers = []
+    real_run = cache.upstream.run
+
+    async def tracking_run(upstream, fn, *args):
+        providers.append(upstream)
+        return await real_run(upstream, fn, *args)
+
+    monkeypatch.setattr(cache.upstream, "run", tracking_run)
+
+    loaded = asyncio.run(cache.aget_or_refresh("news:NVDA", lambda: {"cached_at": _stamp(0), "items": [1]}, "yahoo"))
+    assert loaded["items"] == [1]
+    assert providers == ["cache", "yahoo"]
+
+    # Second read is an L1 hit: no pool hop at all
+    assert asyncio.run(cache.aget_or_refresh("news:NVDA", lambda: None, "yahoo")) is loaded
+    assert providers == ["cache", "yahoo"]
+
+
+def test_get_many_uses_l1_then_one_redis_mget(monkeypatch) -> None:
+    monkeypatch.setattr(cache, "_l1", cache._new_l1())
+    cache._l1_set("price:AAPL", {"p": 1})
+    monkeypatch.setattr(cache, "CACHE_BACKEND", "redis")
+
+    class FakeRedisError(Exception):
+        pass
+
+    calls = []
+
+    class FakeClient:
+        def mget(self, keys):
+            calls.append(keys)
+            return ['{"p": 2}', None, "not-json"]
+
+    redis_exceptions = SimpleNamespace(RedisError=FakeRedisError)
+    monkeypatch.setitem(sys.modules, "redis", SimpleNamespace(exceptions=redis_exceptions))
+    monkeypatch.setitem(sys.modules, "redis.exceptions", redis_exceptions)
+    monkeypatch.setattr(cache, "_redis_client", lambda: FakeClient())
+
+    values = cache.get_many(["price:AAPL", "price:NVDA", "price:MSFT", "price:BAD", "price:AAPL"])
+
+    assert values == {"price:AAPL": {"p": 1}, "price:NVDA": {"p": 2}}
+    assert calls == [[cache.REDIS_PREFIX + "price:NVDA", cache.REDIS_PREFIX + "price:MSFT", cache.REDIS_PREFIX + "price:BAD"]]
+    assert cache._l1_get("price:NVDA") == (True, {"p": 2})
+
+
+class _FakeClientError(Exception):
+    def __init__(self, code):
+        self.response = {"Error": {"Code": code}}
+
+
+class _ConditionalS3:
+    """Serves one object and honours IfNoneMatch like S3 does."""
+
+    def __init__(self, body: bytes, etag: str) -> None:
+        self.body, self.etag = body, etag
+        self.requests = []
+
+    def get_object(self, **kwargs):
+        self.requests.append(kwargs)
+        if kwargs.get("IfNoneMatch") == self.etag:
+            raise _FakeClientError("304")
+        return {"Body": SimpleNamespace(read=lambda: self.body), "ETag": self.etag}
+
+    def put_object(self, **kwargs):
+        self.body, self.etag = kwargs["Body"], '"etag-put"'
+        return {"ETag": self.etag}
+
+
+def _patch_conditional_s3(monkeypatch, client) -> None:
+    botocore_exceptions = SimpleNamespace(ClientError=_FakeClientError)
+    monkeypatch.setitem(sys.modules, "botocore", SimpleNamespace(exceptions=botocore_exceptions))
+    monkeypatch.setitem(sys.modules, "botocore.exceptions", botocore_exceptions)
+    monkeypatch.setattr(cache, "_s3_client", lambda: client)
+    monkeypatch.setattr(cache, "_s3_validators", cache._new_s3_validators())
+
+
+def test_s3_get_revalidates_with_etag_and_serves_304_from_memory(monkeypatch) -> None:
+    client = _ConditionalS3(codec.encode({"p": 1}), '"etag-1"')
+    _patch_conditional_s3(monkeypatch, client)
+    before = cache.s3_stats()
+
+    assert cache._s3_get("price:AAPL") == {"p": 1}
+    assert cache._s3_get("price:AAPL") == {"p": 1}
+
+    assert "IfNoneMatch" not in client.requests[0]
+    assert client.requests[1]["IfNoneMatch"] == '"etag-1"'
+    after = cache.s3_stats()
+    assert after["not_modified"] - before["not_modified"] == 1
+    assert after["bytes_downloaded"] - before["bytes_downloaded"] == len(client.body)
+
+
+def test_s3_get_downloads_again_when_object_changed(monkeypatch) -> None:
+    client = _ConditionalS3(codec.encode({"p": 1}), '"etag-1"')
+    _patch_conditional_s3(monkeypatch, client)
+    cache._s3_get("price:AAPL")
+
+    client.body, client.etag = codec.encode({"p": 2}), '"etag-2"'
+
+    assert cache._s3_get("price:AAPL") == {"p": 2}
+    assert cache._s3_validators.get("price:AAPL")[1][0] == '"etag-2"'
+
+
+def test_s3_set_records_etag_so_next_read_is_conditional(monkeypatch) -> None:
+    client = _ConditionalS3(b"", "")
+    _patch_conditional_s3(monkeypatch, client)
+
+    cache._s3_set("price:AAPL", {"p": 3})
+
+    assert cache._s3_get("price:AAPL") == {"p": 3}
+    assert client.requests[0]["IfNoneMatch"] == '"etag-put"'
+
+
+def test_get_many_reads_s3_in_parallel_with_one_client(monkeypatch) -> None:
+    import threading
+
+    monkeypatch.setattr(cache, "_l1", cache._new_l1())
+    monkeypatch.setattr(cache, "CACHE_BACKEND", "s3")
+    clients = []
+    threads = set()
+
+    def fake_read(client, key):
+        threads.add(threading.current_thread().name)
+        return None if key.endswith("MISSING") else {"key": key}
+
+    monkeypatch.setattr(cache, "_s3_client", lambda: clients.append(1) or object())
+    monkeypatch.setattr(cache, "_s3_read", fake_read)
+
+    values = cache.get_many(["stock:NVDA", "stock:AAPL", "stock:MISSING"])
+
+    assert values == {"stock:NVDA": {"key": "stock:NVDA"}, "stock:AAPL": {"key": "stock:AAPL"}}
+    assert clients == [1]
+    assert all(name.startswith("cache-s3") for name in threads)
+
+
+def test_aget_many_or_refresh_splits_servable_and_expired(monkeypatch) -> None:
+    import asyncio
+
+    monkeypatch.setattr(cache, "_l1", cache._new_l1())
+    entries = {
+        "stock:FRESH": {"cached_at": _stamp(1)},
+        "stock:STALE": {"cached_at": _stamp(30)},
+        "stock:OLD": {"cached_at": _stamp(24 * 30)},
+    }
+    monkeypatch.setattr(cache, "get_many", lambda keys: {k: entries[k] for k in keys if k in entries})
+    refreshed = []
+    monkeypatch.setattr(cache, "_refresh_in_background", lambda key, loader, provider: refreshed.append((key, provider, loader())))
+
+    values, expired = asyncio.run(cache.aget_many_or_refresh(
+        ["stock:FRESH", "stock:STALE", "stock:OLD", "stock:NONE"],
+        lambda key: lambda: f"load {key}",
+        "yahoo",
+    ))
+
+    assert list(values) == ["stock:FRESH", "stock:STALE"]
+    assert expired == ["stock:OLD", "stock:NONE"]
+    assert refreshed == [("stock:STALE", "yahoo", "load stock:STALE")]
+
+
+def test_set_many_and_get_many_roundtrip_on_local_backend(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(cache, "_l1", cache._new_l1())
+    monkeypatch.setattr(cache, "CACHE_BACKEND", "local")
+    monkeypatch.setattr(cache, "LOCAL_CACHE_DIR", tmp_path / "cache")
+
+    assert cache.get_many(["price:NVDA"]) == {}  # directory not created yet
+
+    cache.set_many({"price:NVDA": {"p": 1}, "price:AAPL": {"p": 2}})
+    cache._l1.clear()
+
+    assert cache.get_many(["price:AAPL", "price:MSFT", "price:NVDA"]) == {"price:AAPL": {"p": 2}, "price:NVDA": {"p": 1}}
+    cache.set_many({})
+
+
+def test_set_many_pipelines_redis_sets(monkeypatch) -> None:
+    monkeypatch.setattr(cache, "_l1", cache._new_l1())
+    monkeypatch.setattr(cache, "CACHE_BACKEND", "redis")
+    monkeypatch.setattr(cache, "REDIS_CACHE_TTL_SECONDS", 60)
+    monkeypatch.setattr(cache, "CACHE_TTL_JITTER", 0)
+
+    class FakeRedisError(Exception):
+        pass
+
+    class FakePipeline:
+        def __init__(self):
+            self.queued = []
+            self.executed = 0
+
+        def set(self, key, raw, ex=None):
+            self.queued.append((key, codec.decode(raw), ex))
+
+        def execute(self):
+            self.executed += 1
+
+    pipe = FakePipeline()
+    redis_exceptions = SimpleNamespace(RedisError=FakeRedisError)
+    monkeypatch.setitem(sys.modules, "redis", SimpleNamespace(exceptions=redis_exceptions))
+    monkeypatch.setitem(sys.modules, "redis.exceptions", redis_exceptions)
+    monkeypatch.setattr(cache, "_redis_client", lambda: SimpleNamespace(pipeline=lambda transaction: pipe))
+
+    cache.set_many({"price:NVDA": {"p": 1}, "price:AAPL": {"p": 2}})
+
+    assert pipe.executed == 1
+    assert pipe.queued == [
+        (cache.REDIS_PREFIX + "price:NVDA", {"p": 1}, 60),
+        (cache.REDIS_PREFIX + "price:AAPL", {"p": 2}, 60),
+    ]
+    assert cache._l1_get("price:AAPL") == (True, {"p": 2})
+
+
+def test_set_many_puts_s3_objects_with_one_client(monkeypatch) -> None:
+    monkeypatch.setattr(cache, "_l1", cache._new_l1())
+    monkeypatch.setattr(cache, "CACHE_BACKEND", "s3")
+    puts = []
+
+    class FakeS3:
+        def put_object(self, **kwargs):
+            puts.append((kwargs["Key"], codec.decode(kwargs["Body"])))
+
+    clients = []
+    monkeypatch.setattr(cache, "_s3_client", lambda: clients.append(1) or FakeS3())
+
+    cache.set_many({"price:NVDA": {"p": 1}, "price:AAPL": {"p": 2}})
+
+    assert clients == [1]
+    assert sorted(puts) == [(cache.S3_PREFIX + "price_AAPL.json", {"p": 2}), (cache.S3_PREFIX + "price_NVDA.json", {"p": 1})]
+
+
+def test_shared_memory_tier_serves_l1_misses_without_backend(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(cache, "_l1", cache._new_l1())
+    monkeypatch.setattr(cache, "SHM_CACHE_PATH", str(tmp_path / "shm"))
+    monkeypatch.setattr(cache, "_shm", None)
+    monkeypatch.setattr(cache, "CACHE_BACKEND", "local")
+    monkeypatch.setattr(cache, "LOCAL_CACHE_DIR", tmp_path / "cache")
+
+    cache.set("price:NVDA", {"p": 1})
+    # Another worker: empty L1, same shared table, backend unavailable
+    monkeypatch.setattr(cache, "_l1", cache._new_l1())
+    monkeypatch.setattr(cache, "_local_get", lambda key: (_ for _ in ()).throw(AssertionError("backend read")))
+    monkeypatch.setattr(cache, "_local_get_many", lambda keys: {})
+
+    assert cache.get("price:NVDA") == {"p": 1}
+    assert cache.get_many(["price:NVDA", "price:AAPL"]) == {"price:NVDA": {"p": 1}}
+    assert cache.shm_stats()["hits"] >= 1
+    cache._shm.close()
+
+
+def test_shared_memory_tier_is_disabled_by_default(monkeypatch) -> None:
+    monkeypatch.setattr(cache, "SHM_CACHE_PATH", "")
+    assert cache._shm_table() is None
+    assert cache._shm_get("price:NVDA") is None
+    assert cache.shm_stats() is None
+
+
+def _tiered(monkeypatch, redis_data: dict, s3_data: dict) -> dict:
+    """Tiered backend over dict-backed Redis / S3 fakes; returns call counters."""
+    calls = {"s3_get": [], "s3_put": []}
+    monkeypatch.setattr(cache, "_l1", cache._new_l1())
+    monkeypatch.setattr(cache, "CACHE_BACKEND", "tiered")
+    monkeypatch.setattr(cache, "_redis_get", redis_data.get)
+    monkeypatch.setattr(cache, "_redis_get_many", lambda keys: {k: redis_data[k] for k in keys if k in redis_data})
+    monkeypatch.setattr(cache, "_redis_set", redis_data.__setitem__)
+    monkeypatch.setattr(cache, "_redis_set_many", redis_data.update)
+    monkeypatch.setattr(cache, "_s3_get", lambda key: calls["s3_get"].append(key) or s3_data.get(key))
+    monkeypatch.setattr(cache, "_s3_get_many", lambda keys: calls["s3_get"].extend(keys) or {k: s3_data.get(k) for k in keys})
+    monkeypatch.setattr(cache, "_s3_set_many", lambda items: calls["s3_put"].append(dict(items)) or s3_data.update(items))
+    monkeypatch.setattr(cache, "_write_behind", None)
+    return calls
+
+
+def test_tiered_get_falls_back_to_s3_and_promotes_into_redis(monkeypatch) -> None:
+    redis_data, s3_data = {}, {"price:AAPL": {"p": 1}}
+    calls = _tiered(monkeypatch, redis_data, s3_data)
+
+    assert cache.get("price:AAPL") == {"p": 1}
+    assert redis_data == {"price:AAPL": {"p": 1}}
+
+    cache._l1.clear()
+    assert cache.get("price:AAPL") == {"p": 1}
+    assert calls["s3_get"] == ["price:AAPL"]   # second read served by Redis
+
+
+def test_tiered_get_many_reads_hot_then_cold(monkeypatch) -> None:
+    redis_data = {"price:AAPL": {"p": 1}}
+    s3_data = {"price:NVDA": {"p": 2}}
+    calls = _tiered(monkeypatch, redis_data, s3_data)
+
+    values = cache.get_many(["price:AAPL", "price:NVDA", "price:MSFT"])
+
+    assert values == {"price:AAPL": {"p": 1}, "price:NVDA": {"p": 2}}
+    assert calls["s3_get"] == ["price:NVDA", "price:MSFT"]
+    assert redis_data["price:NVDA"] == {"p": 2}
+
+
+def test_tiered_set_writes_redis_now_and_s3_in_batches(monkeypatch) -> None:
+    redis_data, s3_data = {}, {}
+    calls = _tiered(monkeypatch, redis_data, s3_data)
+    monkeypatch.setattr(cache, "WRITE_BEHIND_MAX_DELAY_SECONDS", 60)
+
+    cache.set("price:AAPL", {"p": 1})
+    cache.set_many({"price:NVDA": {"p": 2}, "price:AAPL": {"p": 3}})
+
+    assert redis_data == {"price:AAPL": {"p": 3}, "price:NVDA": {"p": 2}}
+    assert cache.write_behind_stats()["pending"] == 2
+    assert cache.flush_writes(timeout=5)
+    assert calls["s3_put"] == [{"price:NVDA": {"p": 2}, "price:AAPL": {"p": 3}}]
+    cache._write_behind.close()
+
+
+def test_tiered_get_serves_queued_write_after_redis_loss(monkeypatch) -> None:
+    redis_data, s3_data = {}, {}
+    calls = _tiered(monkeypatch, redis_data, s3_data)
+    monkeypatch.setattr(cache, "WRITE_BEHIND_MAX_DELAY_SECONDS", 60)
+
+    cache.set("price:AAPL", {"p": 1})
+    redis_data.clear()   # Redis restarted before the S3 upload
+    cache._l1.clear()
+
+    assert cache.get("price:AAPL") == {"p": 1}
+    assert calls["s3_get"] == []
+    assert redis_data == {"price:AAPL": {"p": 1}}
+    cache._write_behind.close()
+
+
+def test_flush_writes_without_queue_is_a_no_op(monkeypatch) -> None:
+    monkeypatch.setattr(cache, "_write_behind", None)
+    assert cache.flush_writes() is True
+    assert cache.write_behind_stats() is None
+
+
+def test_backend_lookups_and_writes_are_instrumented(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(cache, "_l1", cache._new_l1())
+    monkeypatch.setattr(cache, "CACHE_BACKEND", "local")
+    monkeypatch.setattr(cache, "LOCAL_CACHE_DIR", tmp_path)
+    monkeypatch.setattr(cache, "_requests", cache.metrics.Counter("t_requests", "t"))
+    monkeypatch.setattr(cache, "_backend_seconds", cache.metrics.Histogram("t_seconds", "t", (1.0,)))
+    monkeypatch.setattr(cache, "_payload_bytes", cache.metrics.Histogram("t_bytes", "t", (1024,)))
+
+    assert cache.get("price:AAPL") is None
+    cache.set("price:AAPL", {"p": 1})
+    cache._l1.clear()
+    cache.get_many(["price:AAPL", "price:NVDA"])
+
+    assert cache._requests.value(tier="backend", family="price", result="miss") == 2
+    assert cache._requests.value(tier="backend", family="price", result="hit") == 1
+    assert cache._backend_seconds.count(backend="local", op="get") == 1
+    assert cache._backend_seconds.count(backend="local", op="get_many") == 1
+    assert cache._backend_seconds.count(backend="local", op="set") == 1
+    assert cache._payload_bytes.count(family="price", store="local") == 1
+
+
+def test_collect_metrics_merges_l1_counters_into_requests(monkeypatch) -> None:
+    monkeypatch.setattr(cache, "_l1", cache._new_l1())
+    monkeypatch.setattr(cache, "_requests", cache.metrics.Counter(cache._requests.name, "t"))
+    cache._l1_set("price:AAPL", {"p": 1})
+    cache._l1_get("price:AAPL")
+    cache._l1_get("price:NVDA")
+
+    families = {family.name: family for family in cache._collect_metrics()}
+
+    l1 = {
+        s.labels["result"]: s.value
+        for s in families["chronostock_cache_requests_total"].samples
+        if s.labels["tier"] == "l1"
+    }
+    assert l1 == {"hit": 1, "miss": 1}
+    assert families["chronostock_cache_l1_entries"].samples[0].value == 1
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from app import codec
+
+_STOCK = {
+    "ticker": "NVDA",
+    "bars": {"time": ["2026-01-02"] * 400, "close": [1.25] * 400, "volume": [100] * 400},
+    "_cached_at": "2026-01-02T00:00:00+00:00",
+}
+
+_CODECS, _COMPRESSIONS = codec.available()
+
+
+@pytest.mark.parametrize("name", _CODECS)
+@pytest.mark.parametrize("compression", _COMPRESSIONS)
+def test_encode_decode_round_trip(name, compression) -> None:
+    raw = codec.encode(_STOCK, codec=name, compression=compression)
+
+    assert raw.startswith(codec.MAGIC)
+    assert codec.decode(raw) == _STOCK
+
+
+def test_small_payloads_are_not_compressed() -> None:
+    raw = codec.encode({"p": 1}, codec="json", compression="zlib")
+
+    assert raw[len(codec.MAGIC):len(codec.MAGIC) + 3] == bytes((codec.FORMAT_VERSION, 1, 0))
+    assert raw.endswith(b'{"p":1}')
+
+
+def test_compression_shrinks_large_payloads() -> None:
+    plain = codec.encode(_STOCK, codec="json", compression="none")
+    packed = codec.encode(_STOCK, codec="json", compression="zlib")
+
+    assert len(packed) < len(plain) / 4
+
+
+def test_decode_reads_legacy_json_entries() -> None:
+    assert codec.decode(json.dumps(_STOCK)) == _STOCK
+    assert codec.decode(json.dumps(_STOCK).encode()) == _STOCK
+
+
+def test_decode_rejects_unknown_version_and_ids() -> None:
+    with pytest.raises(codec.CodecError):
+        codec.decode(codec.MAGIC + bytes((codec.FORMAT_VERSION + 1, 1, 0)) + b"{}")
+    with pytest.raises(codec.CodecError):
+        codec.decode(codec.MAGIC + bytes((codec.FORMAT_VERSION, 99, 0)) + b"{}")
+    with pytest.raises(codec.CodecError):
+        codec.decode(codec.MAGIC + b"\x01")
+
+
+def test_decode_raises_codec_error_on_corrupt_payload() -> None:
+    raw = codec.encode(_STOCK, codec="json", compression="zlib")
+
+    with pytest.raises(codec.CodecError):
+        codec.decode(raw[:-10])
+
+
+def test_load_falls_back_when_optional_library_is_missing() -> None:
+    def missing():
+        raise ImportError("msgpack")
+
+    name, loaded = codec._load("msgpack", {"msgpack": missing, "json": codec._json_codec}, {"msgpack": "json"})
+
+    assert name == "json"
+    assert loaded.id == 1
+
+
+def test_load_rejects_unknown_setting() -> None:
+    with pytest.raises(ValueError):
+        codec._load("pickle", {"json": codec._json_codec}, {})
@@ -1,6 +1,19 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
 from app import edgar
 
 
+@pytest.fixture(autouse=True)
+def _fresh_ticker_maps():
+    edgar._ticker_maps.clear()
+    yield
+    edgar._ticker_maps.clear()
+
+
 class FakeResponse:
     def __init__(self, payload):
         self.payload = payload
@@ -12,6 +25,10 @@ class FakeResponse:
         return self.payload
 
 
+def _patch_http(monkeypatch, get) -> None:
+    monkeypatch.setattr(edgar.upstream, "http_client", lambda: SimpleNamespace(get=get))
+
+
 def test_get_cik_uses_cached_mapping(monkeypatch) -> None:
     monkeypatch.setattr(edgar.cache, "get", lambda key: {"data": {"NVDA": 1045810}})
 
@@ -19,9 +36,9 @@ def test_get_cik_uses_cached_mapping(monkeypatch) -> None:
 
     def fail_http(*_args, **_kwargs):
         called["count"] += 1
-        raise AssertionError("httpx.get should not be called")
+        raise AssertionError("http_client().get should not be called")
 
-    monkeypatch.setattr(edgar.httpx, "get", fail_http)
+    _patch_http(monkeypatch, fail_http)
 
     assert edgar._get_cik("nvda") == "0001045810"
     assert called["count"] == 0
@@ -30,20 +47,71 @@ def test_get_cik_uses_cached_mapping(monkeypatch) -> None:
 def test_get_cik_fetches_and_caches_mapping_on_miss(monkeypatch) -> None:
     cache_sets = []
     monkeypatch.setattr(edgar.cache, "get", lambda key: None)
-    monkeypatch.setattr(edgar.cache, "set", lambda key, value: cache_sets.append((key, value)))
-    monkeypatch.setattr(
-        edgar.httpx,
-        "get",
+    monkeypatch.setattr(edgar.cache, "set_many", cache_sets.append)
+    _patch_http(
+        monkeypatch,
         lambda url, headers, timeout: FakeResponse(
             {
-                "0": {"ticker": "NVDA", "cik_str": 1045810},
-                "1": {"ticker": "AAPL", "cik_str": 320193},
+                "0": {"ticker": "NVDA", "cik_str": 1045810, "title": "NVIDIA CORP"},
+                "1": {"ticker": "AAPL", "cik_str": 320193, "title": "Apple Inc."},
             }
         ),
     )
 
     assert edgar._get_cik("NVDA") == "0001045810"
-    assert cache_sets == [("sec:cik_map", {"data": {"NVDA": 1045810, "AAPL": 320193}})]
+    assert cache_sets == [{
+        "sec:cik_map": {"data": {"NVDA": 1045810, "AAPL": 320193}},
+        "sec:company_names": {"names": {"NVDA": "NVIDIA CORP", "AAPL": "Apple Inc."}},
+    }]
+    # Both maps are memoized: neither lookup reads the cache or downloads again
+    monkeypatch.setattr(edgar.cache, "get", lambda key: pytest.fail("cache read"))
+    assert edgar._get_cik("AAPL") == "0000320193"
+    assert edgar.company_names() == {"NVDA": "NVIDIA CORP", "AAPL": "Apple Inc."}
+
+
+def test_company_names_refetches_mapping_cached_without_titles(monkeypatch) -> None:
+    cached = {"sec:cik_map": {"data": {"NVDA": 1045810}}}
+    monkeypatch.setattr(edgar.cache, "get", cached.get)
+    monkeypatch.setattr(edgar.cache, "set_many", cached.update)
+    calls = []
+
+    def get(url, headers, timeout):
+        calls.append(url)
+        return FakeResponse({"0": {"ticker": "nvda", "cik_str": 1045810, "title": "NVIDIA CORP"}})
+
+    _patch_http(monkeypatch, get)
+
+    assert edgar.company_names() == {"NVDA": "NVIDIA CORP"}
+    edgar._ticker_maps.clear()
+    assert edgar.company_names() == {"NVDA": "NVIDIA CORP"}   # now from sec:company_names
+    assert len(calls) == 1
+
+
+def test_concurrent_cold_lookups_download_the_ticker_list_once(monkeypatch) -> None:
+    monkeypatch.setattr(edgar.cache, "get", lambda key: None)
+    monkeypatch.setattr(edgar.cache, "set_many", lambda items: None)
+    release = threading.Event()
+    calls = []
+
+    def get(url, headers, timeout):
+        calls.append(url)
+        release.wait(5)
+        return FakeResponse({"0": {"ticker": "NVDA", "cik_str": 1045810, "title": "NVIDIA CORP"}})
+
+    _patch_http(monkeypatch, get)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(edgar._get_cik("NVDA"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    while not calls:   # the first caller is downloading; let the others pile up behind it
+        time.sleep(0.001)
+    time.sleep(0.05)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert results == ["0001045810"] * 8
+    assert len(calls) == 1
 
 
 def test_get_cik_returns_none_when_ticker_not_found(monkeypatch) -> None:
@@ -54,9 +122,8 @@ def test_get_cik_returns_none_when_ticker_not_found(monkeypatch) -> None:
 def test_get_cik_returns_none_when_remote_mapping_lacks_ticker(monkeypatch) -> None:
     monkeypatch.setattr(edgar.cache, "get", lambda key: None)
     monkeypatch.setattr(edgar.cache, "set", lambda key, value: None)
-    monkeypatch.setattr(
-        edgar.httpx,
-        "get",
+    _patch_http(
+        monkeypatch,
         lambda url, headers, timeout: FakeResponse(
             {
                 "0": {"ticker": "AAPL", "cik_str": 320193},
@@ -69,9 +136,8 @@ def test_get_cik_returns_none_when_remote_mapping_lacks_ticker(monkeypatch) -> N
 
 def test_fetch_sec_filings_filters_forms_and_builds_labels(monkeypatch) -> None:
     monkeypatch.setattr(edgar, "_get_cik", lambda ticker: "0001045810")
-    monkeypatch.setattr(
-        edgar.httpx,
-        "get",
+    _patch_http(
+        monkeypatch,
         lambda url, headers, timeout: FakeResponse(
             {
                 "filings": {
@@ -108,9 +174,9 @@ def test_fetch_sec_filings_returns_empty_when_cik_missing(monkeypatch) -> None:
 
     def fail_http(*_args, **_kwargs):
         called["count"] += 1
-        raise AssertionError("httpx.get should not be called")
+        raise AssertionError("http_client().get should not be called")
 
-    monkeypatch.setattr(edgar.httpx, "get", fail_http)
+    _patch_http(monkeypatch, fail_http)
 
     assert edgar.fetch_sec_filings("NVDA") == []
     assert called["count"] == 0
@@ -0,0 +1,168 @@
+import threading
+
+from app.l1 import L1Cache, ShardedL1Cache, approx_size
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_approx_size_charges_large_histories_more_than_quotes() -> None:
+    quote = {"ticker": "NVDA", "price": 900.0, "cached_at": "2026-01-01T00:00:00+00:00"}
+    history = {"bars": {"time": ["2026-01-02"] * 15_000, "close": [1.5] * 15_000}}
+
+    assert approx_size(quote) < 1_000
+    assert approx_size(history) > 100 * approx_size(quote)
+    assert approx_size([]) < approx_size([1]) < approx_size([1, 2])
+    assert approx_size(b"abc") < approx_size(b"abcdef")
+
+
+def test_byte_budget_evicts_least_recently_used() -> None:
+    l1 = L1Cache(max_bytes=300, max_entries=100)
+    for key in ("price:A", "price:B", "price:C"):
+        l1.set(key, "x", size=100)
+    l1.get("price:A")
+
+    l1.set("price:D", "x", size=100)
+
+    assert l1.keys() == ["price:C", "price:A", "price:D"]
+    assert l1.bytes == 300
+    assert l1.stats()["families"]["price"]["evictions"] == 1
+
+
+def test_family_quota_evicts_within_family_only() -> None:
+    l1 = L1Cache(max_bytes=1_000, max_entries=100, family_quotas={"stock": 0.5})
+    l1.set("price:A", "x", size=100)
+    l1.set("stock:A", "x", size=300)
+    l1.set("stock:B", "x", size=300)
+
+    assert l1.keys() == ["price:A", "stock:B"]
+    families = l1.stats()["families"]
+    assert families["stock"]["evictions"] == 1
+    assert families["stock"]["bytes"] == 300
+    assert families["price"]["evictions"] == 0
+
+    # Larger than the family's whole quota: not cached at all
+    l1.set("stock:HUGE", "x", size=600)
+    assert "stock:HUGE" not in l1
+
+
+def test_entries_expire_on_read_and_nonpositive_ttl_is_not_cached() -> None:
+    clock = FakeClock()
+    l1 = L1Cache(max_bytes=1_000, max_entries=100, clock=clock)
+    l1.set("news:A", {"items": []}, ttl=10)
+    l1.set("news:B", {"items": []}, ttl=0)
+    l1.set("news:C", {"items": []})
+
+    assert l1.get("news:A") == (True, {"items": []})
+    assert "news:B" not in l1
+
+    clock.now = 10
+    assert l1.get("news:A") == (False, None)
+    assert l1.get("news:C")[0] is True
+
+    stats = l1.stats()["families"]["news"]
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["expirations"] == 1
+    assert stats["entries"] == 1
+
+
+def test_replacing_a_key_keeps_byte_accounting_exact() -> None:
+    l1 = L1Cache(max_bytes=1_000, max_entries=100)
+    l1.set("price:A", "x", size=100)
+    l1.set("price:A", "y", size=40)
+    l1.pop("price:A")
+    l1.pop("price:missing")
+
+    assert l1.bytes == 0
+    assert len(l1) == 0
+    assert l1.stats()["families"]["price"]["bytes"] == 0
+
+
+def test_sharded_cache_keeps_budgets_global_and_aggregates_stats() -> None:
+    l1 = ShardedL1Cache(max_bytes=800, max_entries=400, family_quotas={"stock": 0.5}, shards=4)
+    for i in range(6):
+        l1.set(f"price:{i}", "x", size=10)
+    l1.get("price:0")
+    l1.get("price:missing")
+
+    # Larger than a quarter of the budget, but within stock's global 400 bytes
+    l1.set("stock:BIG", "x", size=150)
+    assert "stock:BIG" in l1
+    l1.set("stock:HUGE", "x", size=450)
+    assert "stock:HUGE" not in l1
+
+    stats = l1.stats()
+    assert stats["shards"] == 4
+    assert stats["entries"] == len(l1) == 7
+    assert stats["bytes"] == l1.bytes == 210
+    assert stats["families"]["price"]["hits"] == 1
+    assert stats["families"]["price"]["misses"] == 1
+    assert sorted(l1.keys()) == [f"price:{i}" for i in range(6)] + ["stock:BIG"]
+
+    l1.pop("price:0")
+    l1.clear()
+    assert len(l1) == 0
+
+
+def _same_shard_keys(l1: ShardedL1Cache, prefix: str, count: int) -> list[str]:
+    keys = (f"{prefix}:{i}" for i in range(10_000))
+    first = next(keys)
+    return [first] + [key for key in keys if l1._slot(key) is l1._slot(first)][: count - 1]
+
+
+def test_sharded_cache_keys_on_one_shard_share_the_whole_budget() -> None:
+    l1 = ShardedL1Cache(max_bytes=1000, max_entries=100, family_quotas={"stock": 0.6}, shards=4)
+    a, b, c = _same_shard_keys(l1, "stock", 3)
+
+    l1.set(a, "x", size=250)
+    l1.set(b, "x", size=250)
+    assert a in l1 and b in l1            # 500 bytes on one shard, within the global quota
+
+    l1.set(c, "x", size=250)              # stock over its 600 bytes: the oldest goes
+    assert a not in l1
+    assert b in l1 and c in l1
+    assert l1.stats()["families"]["stock"]["evictions"] == 1
+
+
+def test_sharded_cache_evicts_across_shards_when_over_the_global_budget() -> None:
+    l1 = ShardedL1Cache(max_bytes=100, max_entries=5, shards=4)
+    for i in range(5):
+        l1.set(f"price:{i}", "x", size=10)
+    l1.set("price:5", "x", size=10)
+    assert len(l1) == 5                   # entry cap applies to the cache as a whole
+
+    l1.set("news:big", "x", size=80)
+    assert l1.bytes <= 100
+    assert "news:big" in l1
+
+
+def test_sharded_cache_keeps_accounting_exact_under_concurrent_writers() -> None:
+    l1 = ShardedL1Cache(max_bytes=10**9, max_entries=10**6, shards=4)
+    errors = []
+
+    def worker(n: int) -> None:
+        try:
+            for i in range(2_000):
+                key = f"price:{(n * 7 + i) % 50}"
+                l1.set(key, i, size=10)
+                l1.get(key)
+                if i % 5 == 0:
+                    l1.pop(key)
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert l1.bytes == 10 * len(l1)
+    assert l1.stats()["families"]["price"]["entries"] == len(l1)
@@ -1,4 +1,5 @@
 from datetime import datetime
+from types import SimpleNamespace
 
 import pandas as pd
 import pytest
@@ -17,10 +18,13 @@ class FakeResponse:
         return {"observations": self._observations}
 
 
+def _patch_http(monkeypatch, get) -> None:
+    monkeypatch.setattr(macro.upstream, "http_client", lambda: SimpleNamespace(get=get))
+
+
 def test_fred_obs_filters_invalid_values(monkeypatch) -> None:
-    monkeypatch.setattr(
-        macro.httpx,
-        "get",
+    _patch_http(
+        monkeypatch,
         lambda url, params, timeout: FakeResponse(
             [
                 {"date": "2026-01-01", "value": "."},
@@ -42,7 +46,7 @@ def test_fred_obs_passes_observation_start_param(monkeypatch) -> None:
         captured.update(params)
         return FakeResponse([])
 
-    monkeypatch.setattr(macro.httpx, "get", fake_get)
+    _patch_http(monkeypatch, fake_get)
 
     macro._fred_obs("DFF", limit=5, observation_start="2020-01-01")
 
@@ -277,21 +281,6 @@ def test_fetch_market_summary_handles_future_exception(monkeypatch) -> None:
                 raise self._exc
             return self._result
 
-    class FakeExecutor:
-        def __init__(self):
-            self._index = 0
-
-        def __enter__(self):
-            return self
-
-        def __exit__(self, exc_type, exc, tb):
-            return False
-
-        def submit(self, fn):
-            future = self.futures[self._index]
-            self._index += 1
-            return future
-
     indicator = macro.MacroIndicator(
         name="Fed Funds Rate",
         value=5.0,
@@ -303,10 +292,9 @@ def test_fetch_market_summary_handles_future_exception(monkeypatch) -> None:
         source="FRED",
         asOf="2026-03-01",
     )
-    fake_executor = FakeExecutor()
-    fake_executor.futures = [FakeFuture(result=indicator)] + [FakeFuture(exc=RuntimeError("boom")) for _ in range(24)]
+    queued = iter([FakeFuture(result=indicator)] + [FakeFuture(exc=RuntimeError("boom")) for _ in range(24)])
 
-    monkeypatch.setattr(macro, "ThreadPoolExecutor", lambda max_workers=10: fake_executor)
+    monkeypatch.setattr(macro.upstream, "submit", lambda fn: next(queued))
     monkeypatch.setattr(macro, "as_completed", lambda futures: list(futures))
 
     summary = macro.fetch_market_summary()
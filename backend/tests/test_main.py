@@ -5,16 +5,31 @@ import sqlite3
 from pathlib import Path
 import uuid
 
+import pytest
 from fastapi.testclient import TestClient
 
 from app import main
+from app.series import OHLCSeries
 from app.models import EarningsDate, NewsEvent, SECFiling, StockNews, MarketSummary, IndicatorHistory, IndicatorDataPoint, MarketAnalysis
 
 
+@pytest.fixture(autouse=True)
+def _isolated_l1(monkeypatch):
+    # Async handlers read the in-process tier before the (patched) cache.get
+    monkeypatch.setattr(main.cache, "_l1", main.cache._new_l1())
+
+
 def _now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
+def _series(times: list[str]) -> OHLCSeries:
+    n = len(times)
+    return OHLCSeries.from_payload(
+        {"time": times, "open": [1] * n, "high": [1] * n, "low": [1] * n, "close": [1] * n, "volume": [1] * n}
+    )
+
+
 def _client(monkeypatch) -> TestClient:
     monkeypatch.setattr(main, "init_db", lambda: None)
     return TestClient(main.app)
@@ -74,7 +89,30 @@ def test_health_endpoint(monkeypatch) -> None:
     assert resp.json() == {"status": "ok"}
 
 
+def test_metrics_endpoint_serves_prometheus_text(monkeypatch) -> None:
+    monkeypatch.setattr(main, "METRICS_TOKEN", "scrape-secret")
+    with _client(monkeypatch) as client:
+        resp = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE chronostock_cache_requests_total counter" in resp.text
+    assert "# TYPE chronostock_cache_backend_seconds histogram" in resp.text
+
+
+def test_metrics_endpoint_is_off_without_a_token_and_rejects_a_wrong_one(monkeypatch) -> None:
+    monkeypatch.setattr(main, "METRICS_TOKEN", "")
+    with _client(monkeypatch) as client:
+        assert client.get("/metrics").status_code == 404
+
+    monkeypatch.setattr(main, "METRICS_TOKEN", "scrape-secret")
+    with _client(monkeypatch) as client:
+        assert client.get("/metrics").status_code == 401
+        assert client.get("/metrics", headers={"Authorization": "Bearer nope"}).status_code == 401
+
+
 def test_search_endpoint(monkeypatch) -> None:
+    monkeypatch.setattr(main, "search_local", lambda _q: [])
     monkeypatch.setattr(main, "search_tickers", lambda _q: [{"ticker": "NVDA", "companyName": "NVIDIA"}])
     with _client(monkeypatch) as client:
         resp = client.get("/api/search", params={"q": "nv"})
@@ -82,6 +120,17 @@ def test_search_endpoint(monkeypatch) -> None:
     assert resp.json() == [{"ticker": "NVDA", "companyName": "NVIDIA"}]
 
 
+def test_search_endpoint_answers_from_local_index(monkeypatch) -> None:
+    def fail(_q):
+        raise AssertionError("local hits must not reach Yahoo")
+
+    monkeypatch.setattr(main, "search_local", lambda _q: [{"ticker": "NVDA", "companyName": "NVIDIA CORP"}])
+    monkeypatch.setattr(main, "search_tickers", fail)
+    with _client(monkeypatch) as client:
+        resp = client.get("/api/search", params={"q": "nv"})
+    assert resp.json() == [{"ticker": "NVDA", "companyName": "NVIDIA CORP"}]
+
+
 def test_get_stock_uses_fresh_cache(monkeypatch) -> None:
     cached = {
         "ticker": "NVDA",
@@ -102,7 +151,7 @@ def test_get_stock_uses_fresh_cache(monkeypatch) -> None:
         "cached_at": _now_iso(),
     }
     monkeypatch.setattr(main.cache, "get", lambda key: cached if key == "stock:NVDA" else None)
-    monkeypatch.setattr(main, "fetch_bars", lambda _ticker: (_ for _ in ()).throw(AssertionError("should not fetch")))
+    monkeypatch.setattr(main, "refresh_bars", lambda _ticker, _cached: (_ for _ in ()).throw(AssertionError("should not fetch")))
     monkeypatch.setattr(main, "fetch_info", lambda _ticker: (_ for _ in ()).throw(AssertionError("should not fetch")))
 
     import app.demo_events as demo_events
@@ -142,7 +191,7 @@ def test_get_stock_uses_fresh_cache(monkeypatch) -> None:
 
 def test_get_stock_provider_value_error_returns_404(monkeypatch) -> None:
     monkeypatch.setattr(main.cache, "get", lambda _key: None)
-    monkeypatch.setattr(main, "fetch_bars", lambda _ticker: (_ for _ in ()).throw(ValueError("not found")))
+    monkeypatch.setattr(main, "refresh_bars", lambda _ticker, _cached: (_ for _ in ()).throw(ValueError("not found")))
 
     with _client(monkeypatch) as client:
         resp = client.get("/api/stock/xxxx")
@@ -163,7 +212,7 @@ def test_get_stock_fetches_and_caches_when_cache_stale(monkeypatch) -> None:
     saved = {}
     monkeypatch.setattr(main.cache, "get", lambda _key: stale)
     monkeypatch.setattr(main.cache, "set", lambda key, value: saved.update({"key": key, "value": value}))
-    monkeypatch.setattr(main, "fetch_bars", lambda _ticker: [main.OHLCBar(time="2026-01-01", open=1, high=1, low=1, close=1, volume=1)])
+    monkeypatch.setattr(main, "refresh_bars", lambda _ticker, _cached: _series(["2026-01-01"]))
     monkeypatch.setattr(main, "fetch_info", lambda _ticker: ("NVIDIA", {"sector": "Tech"}, "equity"))
     monkeypatch.setitem(
         sys.modules,
@@ -179,9 +228,49 @@ def test_get_stock_fetches_and_caches_when_cache_stale(monkeypatch) -> None:
     assert resp.json()["companyName"] == "NVIDIA"
 
 
+def test_get_stock_cold_miss_runs_through_single_flight(monkeypatch) -> None:
+    keys = []
+    monkeypatch.setattr(main.cache, "get", lambda _key: None)
+    monkeypatch.setattr(main.cache, "set", lambda key, value: None)
+    monkeypatch.setattr(main.cache.singleflight, "do", lambda key, fn: keys.append(key) or fn())
+    monkeypatch.setattr(main, "refresh_bars", lambda _ticker, _cached: _series(["2026-01-01"]))
+    monkeypatch.setattr(main, "fetch_info", lambda _ticker: ("NVIDIA", None, "equity"))
+    monkeypatch.setitem(
+        sys.modules,
+        "app.demo_events",
+        SimpleNamespace(get_demo_events=lambda _ticker: []),
+    )
+
+    with _client(monkeypatch) as client:
+        resp = client.get("/api/stock/nvda", params={"range": "ALL"})
+
+    assert resp.status_code == 200
+    assert keys == ["stock:NVDA"]
+
+
+def test_get_news_serves_stale_cache_while_refreshing(monkeypatch) -> None:
+    from datetime import timedelta
+
+    stale = {
+        "cached_at": (datetime.now(timezone.utc) - timedelta(hours=30)).isoformat(),
+        "items": [{"id": "old", "time": "2026-01-01", "title": "Old", "publisher": "Wire"}],
+    }
+    refreshed = []
+    monkeypatch.setattr(main.cache, "get", lambda key: stale if key == "news:NVDA" else None)
+    monkeypatch.setattr(main.cache, "_refresh_in_background", lambda key, loader, provider: refreshed.append(key))
+    monkeypatch.setattr(main, "fetch_news", lambda *args, **kwargs: (_ for _ in ()).throw(AssertionError("should not block")))
+
+    with _client(monkeypatch) as client:
+        resp = client.get("/api/news/nvda")
+
+    assert resp.status_code == 200
+    assert resp.json()[0]["id"] == "old"
+    assert refreshed == ["news:NVDA"]
+
+
 def test_get_stock_provider_error_returns_502(monkeypatch) -> None:
     monkeypatch.setattr(main.cache, "get", lambda _key: None)
-    monkeypatch.setattr(main, "fetch_bars", lambda _ticker: (_ for _ in ()).throw(RuntimeError("provider down")))
+    monkeypatch.setattr(main, "refresh_bars", lambda _ticker, _cached: (_ for _ in ()).throw(RuntimeError("provider down")))
 
     with _client(monkeypatch) as client:
         resp = client.get("/api/stock/nvda")
@@ -190,19 +279,259 @@ def test_get_stock_provider_error_returns_502(monkeypatch) -> None:
     assert "Data provider error" in resp.json()["detail"]
 
 
-def test_filter_bars_with_range_filters_old_rows() -> None:
-    bars = [
-        SimpleNamespace(time="2000-01-01"),
-        SimpleNamespace(time=_now_iso()[:10]),
-    ]
-    filtered = main._filter_bars(bars, "1W")
-    assert len(filtered) == 1
-    assert filtered[0].time == _now_iso()[:10]
+def test_range_start_bisects_to_first_bar_in_range() -> None:
+    today = datetime.now(timezone.utc).date()
+    series = _series(["2000-01-01", "2000-06-01", today.isoformat()])
+    assert main._range_start(series, "1W") == 2
+    assert main._range_start(series, "ALL") == 0
+
+
+def test_stock_view_memoizes_range_bodies_and_rolls_over_daily(monkeypatch) -> None:
+    from datetime import date, timedelta
+
+    today = date.today()
+    cached = {
+        "ticker": "MEMO",
+        "companyName": "Memo Corp",
+        "bars": {
+            "time": [(today - timedelta(days=400)).isoformat(), today.isoformat()],
+            "open": [1, 2], "high": [1, 2], "low": [1, 2], "close": [1, 2], "volume": [1, 2],
+        },
+        "meta": {},
+        "cached_at": _now_iso(),
+    }
+    view = main._build_stock_view(cached)
+    assert main._stock_views.get(main._stock_view_key(cached)) is view
+
+    start, body, digest = view.bars("1Y")
+    assert start == 1
+    assert view.bars("1Y")[1] is body
+    assert view.bars("ALL")[0] == 0
+
+    class NextYear(date):
+        @classmethod
+        def today(cls):
+            return today + timedelta(days=400)
+
+    monkeypatch.setattr(main, "date", NextYear)
+    assert view.bars("1W")[:2] == (2, b"[]")
+
 
+def test_stock_render_runs_off_the_event_loop_until_memoized(monkeypatch) -> None:
+    import asyncio
 
-def test_filter_bars_all_returns_original_list() -> None:
-    bars = [SimpleNamespace(time="2000-01-01")]
-    assert main._filter_bars(bars, "ALL") is bars
+    cached = {
+        "ticker": "OFFLOOP",
+        "companyName": "Off Loop",
+        "bars": {"time": ["2000-01-03"], "open": [1], "high": [1], "low": [1], "close": [1], "volume": [1]},
+        "meta": None,
+        "cached_at": _now_iso(),
+    }
+    threaded = []
+    real_run_in_threadpool = main.run_in_threadpool
+
+    async def tracking(fn, *args):
+        threaded.append(fn)
+        return await real_run_in_threadpool(fn, *args)
+
+    monkeypatch.setattr(main, "run_in_threadpool", tracking)
+
+    first = asyncio.run(main._arender_stock(cached, "ALL", []))
+    assert len(threaded) == 1
+    assert asyncio.run(main._arender_stock(cached, "ALL", [])) == first
+    assert len(threaded) == 1       # view and range body memoized: served inline
+    asyncio.run(main._arender_stock(cached, "1W", []))
+    assert len(threaded) == 2
+
+
+def test_batch_render_uses_one_thread_hop_for_unmemoized_views(monkeypatch) -> None:
+    import asyncio
+
+    payloads = {sym: {**_stock_payload(sym, ["2000-01-03"]), "ticker": sym} for sym in ("BATCHA", "BATCHB")}
+    threaded = []
+    real_run_in_threadpool = main.run_in_threadpool
+
+    async def tracking(fn, *args):
+        threaded.append(fn)
+        return await real_run_in_threadpool(fn, *args)
+
+    monkeypatch.setattr(main, "run_in_threadpool", tracking)
+    events = {sym: [] for sym in payloads}
+
+    first = asyncio.run(main._arender_stocks(payloads, "ALL", events))
+    assert len(threaded) == 1
+    assert asyncio.run(main._arender_stocks(payloads, "ALL", events)) == first
+    assert len(threaded) == 1
+
+
+def test_get_stock_serves_columnar_cache_sliced_to_range(monkeypatch) -> None:
+    today = datetime.now(timezone.utc).date().isoformat()
+    cached = {
+        "ticker": "NVDA",
+        "companyName": "NVIDIA",
+        "assetType": "equity",
+        "bars": {
+            "time": ["2000-01-03", today],
+            "open": [1, 10.5],
+            "high": [2, 11],
+            "low": [0.5, 10],
+            "close": [1.5, 10.75],
+            "volume": [100, 200],
+        },
+        "meta": None,
+        "cached_at": _now_iso(),
+    }
+    monkeypatch.setattr(main.cache, "get", lambda key: cached if key == "stock:NVDA" else None)
+    monkeypatch.setitem(
+        sys.modules,
+        "app.demo_events",
+        SimpleNamespace(get_demo_events=lambda _ticker: [
+            NewsEvent(id="e1", time="2000-01-03", title="old", summary="old", sentiment="neutral", source="News"),
+        ]),
+    )
+
+    with _client(monkeypatch) as client:
+        resp = client.get("/api/stock/nvda", params={"range": "1M"})
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/json"
+    assert resp.json() == {
+        "ticker": "NVDA",
+        "companyName": "NVIDIA",
+        "assetType": "equity",
+        "bars": [{"time": today, "open": 10.5, "high": 11.0, "low": 10.0, "close": 10.75, "volume": 200}],
+        "events": [],
+        "meta": None,
+    }
+
+
+def _get_many(get):
+    """Adapt a per-key fake cache.get into a fake cache.get_many."""
+    return lambda keys: {key: value for key in keys if (value := get(key)) is not None}
+
+
+def _stock_payload(ticker: str, times: list[str]) -> dict:
+    return {
+        "ticker": ticker,
+        "companyName": ticker.title(),
+        "assetType": "equity",
+        "bars": _series(times).to_payload(),
+        "meta": None,
+        "cached_at": _now_iso(),
+    }
+
+
+def test_get_stocks_bulk_reads_cache_and_batches_misses(monkeypatch) -> None:
+    import app.demo_events as demo_events
+
+    cached = {"stock:NVDA": _stock_payload("NVDA", ["2026-01-02"])}
+    reads, downloads, saved = [], [], {}
+    monkeypatch.setattr(main.cache, "get_many", lambda keys: reads.append(keys) or {k: cached[k] for k in keys if k in cached})
+    monkeypatch.setattr(main.cache, "set_many", saved.update)
+    monkeypatch.setattr(main, "fetch_bars_many", lambda tickers: downloads.append(tickers) or {"AAPL": _series(["2026-01-05"])})
+    monkeypatch.setattr(main, "fetch_info_many", lambda tickers: {t: (t.title(), None, "equity") for t in tickers})
+    monkeypatch.setattr(main, "fetch_info", lambda ticker: pytest.fail("info was fetched in bulk"))
+    monkeypatch.setattr(demo_events, "get_demo_events", lambda _ticker: [])
+
+    with _client(monkeypatch) as client:
+        resp = client.get("/api/stocks", params={"tickers": "nvda, AAPL,ZZZZ,nvda", "range": "ALL"})
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert [s["ticker"] for s in body["stocks"]] == ["NVDA", "AAPL"]
+    assert body["stocks"][1]["bars"][0]["time"] == "2026-01-05"
+    assert body["errors"] == {"ZZZZ": "No data returned for ZZZZ"}
+    # The bulk read, then the batch leader's re-check of the keys it loads
+    assert reads == [["stock:NVDA", "stock:AAPL", "stock:ZZZZ"], ["stock:AAPL", "stock:ZZZZ"]]
+    assert downloads == [["AAPL", "ZZZZ"]]
+    assert list(saved) == ["stock:AAPL"]
+
+    params = {"tickers": "NVDA", "range": "ALL"}
+    with _client(monkeypatch) as client:
+        etag = client.get("/api/stocks", params=params).headers["ETag"]
+        again = client.get("/api/stocks", params=params, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+
+
+def test_load_stocks_falls_back_to_single_info_calls(monkeypatch) -> None:
+    monkeypatch.setattr(main.cache, "set", lambda key, value: None)
+    monkeypatch.setattr(main, "fetch_bars_many", lambda tickers: {t: _series(["2026-01-05"]) for t in tickers})
+    monkeypatch.setattr(main, "fetch_info_many", lambda tickers: {"NVDA": ("NVIDIA", None, "equity")})
+    single = []
+
+    def fetch_info(ticker):
+        single.append(ticker)
+        if ticker == "BAD":
+            raise RuntimeError("no info")
+        return ticker.title(), None, "etf"
+
+    monkeypatch.setattr(main, "fetch_info", fetch_info)
+
+    results = main._load_stocks(["NVDA", "SPY", "BAD"])
+
+    assert sorted(single) == ["BAD", "SPY"]
+    assert results["NVDA"]["companyName"] == "NVIDIA"
+    assert results["SPY"]["assetType"] == "etf"
+    assert main._stock_error(results["BAD"]) == "Data provider error: no info"
+
+
+def test_get_stocks_rejects_oversized_batch_and_keeps_hits_when_the_load_fails(monkeypatch) -> None:
+    import app.demo_events as demo_events
+
+    cached = {"stock:NVDA": _stock_payload("NVDA", ["2026-01-02"])}
+    monkeypatch.setattr(main.cache, "get_many", lambda keys: {k: cached[k] for k in keys if k in cached})
+    monkeypatch.setattr(main, "fetch_bars_many", lambda tickers: (_ for _ in ()).throw(RuntimeError("yahoo down")))
+    monkeypatch.setattr(main, "fetch_info_many", lambda tickers: {})
+    monkeypatch.setattr(main, "fetch_info", lambda ticker: (ticker, None, "equity"))
+    monkeypatch.setattr(demo_events, "get_demo_events", lambda _ticker: [])
+
+    with _client(monkeypatch) as client:
+        too_many = client.get("/api/stocks", params={"tickers": ",".join(f"T{i}" for i in range(main.MAX_BATCH_TICKERS + 1))})
+        partial = client.get("/api/stocks", params={"tickers": "NVDA,AAPL,MSFT"})
+
+    assert too_many.status_code == 400
+    assert partial.status_code == 200
+    assert [s["ticker"] for s in partial.json()["stocks"]] == ["NVDA"]
+    assert partial.json()["errors"] == {
+        "AAPL": "Data provider error: yahoo down",
+        "MSFT": "Data provider error: yahoo down",
+    }
+
+
+def test_batch_loads_coalesce_per_ticker_with_single_stock_loads(monkeypatch) -> None:
+    import asyncio
+    import threading
+
+    store = {}
+    monkeypatch.setattr(main.cache, "get_many", lambda keys: {k: store[k] for k in keys if k in store})
+    monkeypatch.setattr(main.cache, "get", store.get)
+    monkeypatch.setattr(main.cache, "set_many", store.update)
+    release = threading.Event()
+    batches = []
+
+    def load_many(keys):
+        batches.append(keys)
+        release.wait(timeout=5)
+        return {key: _stock_payload(key.split(":", 1)[1], ["2026-01-05"]) for key in keys}
+
+    async def scenario():
+        first = asyncio.create_task(main.cache.aload_many(["stock:NVDA", "stock:AAPL"], load_many, "yahoo"))
+        await asyncio.sleep(0.05)
+        # An overlapping batch and a single-ticker load join the in-flight tickers
+        second = asyncio.create_task(main.cache.aload_many(["stock:AAPL", "stock:MSFT"], load_many, "yahoo"))
+        single = asyncio.create_task(
+            main.cache.aload("stock:NVDA", lambda: pytest.fail("NVDA is already loading"), "yahoo")
+        )
+        await asyncio.sleep(0.05)
+        release.set()
+        return await first, await second, await single
+
+    first, second, single = asyncio.run(scenario())
+
+    assert batches == [["stock:NVDA", "stock:AAPL"], ["stock:MSFT"]]
+    assert second["stock:AAPL"] is first["stock:AAPL"]
+    assert single is first["stock:NVDA"]
+    assert sorted(store) == ["stock:AAPL", "stock:MSFT", "stock:NVDA"]
 
 
 def test_prices_uses_cache_and_bulk_fetch(monkeypatch) -> None:
@@ -219,8 +548,8 @@ def test_prices_uses_cache_and_bulk_fetch(monkeypatch) -> None:
         return None
 
     cache_sets = []
-    monkeypatch.setattr(main.cache, "get", fake_cache_get)
-    monkeypatch.setattr(main.cache, "set", lambda key, value: cache_sets.append((key, value)))
+    monkeypatch.setattr(main.cache, "get_many", _get_many(fake_cache_get))
+    monkeypatch.setattr(main.cache, "set_many", lambda items: cache_sets.extend(items.items()))
 
     class FakeYQTicker:
         def __init__(self, symbols):
@@ -243,6 +572,51 @@ def test_prices_uses_cache_and_bulk_fetch(monkeypatch) -> None:
     assert any(key == "price:NVDA" for key, _ in cache_sets)
 
 
+def test_prices_honors_if_none_match_with_304(monkeypatch) -> None:
+    cached = {
+        "ticker": "AAPL",
+        "companyName": "Apple",
+        "price": 100.0,
+        "change": 1.0,
+        "changePct": 1.0,
+        "cached_at": _now_iso(),
+    }
+    monkeypatch.setattr(main.cache, "get_many", _get_many(lambda key: cached if key == "price:AAPL" else None))
+
+    with _client(monkeypatch) as client:
+        first = client.get("/api/prices", params={"tickers": "AAPL"})
+        etag = first.headers["etag"]
+        second = client.get("/api/prices", params={"tickers": "AAPL"}, headers={"If-None-Match": etag})
+        third = client.get("/api/prices", params={"tickers": "AAPL"}, headers={"If-None-Match": '"other"'})
+
+    assert first.status_code == 200
+    assert first.json()[0]["ticker"] == "AAPL"
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == etag
+    assert third.status_code == 200
+
+
+def test_trending_reuses_encoded_body_for_unchanged_payload(monkeypatch) -> None:
+    cached = {"cached_at": _now_iso(), "items": [{"ticker": "NVDA", "companyName": "NVIDIA"}]}
+    monkeypatch.setattr(main.cache, "get", lambda key: cached if key == "trending" else None)
+    renders = []
+    original_encoded = main.cache.encoded
+
+    def counting_encoded(key, version, render):
+        return original_encoded(key, version, lambda: renders.append(key) or render())
+
+    monkeypatch.setattr(main.cache, "encoded", counting_encoded)
+
+    with _client(monkeypatch) as client:
+        first = client.get("/api/trending")
+        second = client.get("/api/trending", headers={"If-None-Match": f'W/{first.headers["etag"]}'})
+
+    assert first.json()[0]["price"] is None
+    assert second.status_code == 304
+    assert renders == ["trending"]
+
+
 def test_prices_returns_empty_for_blank_input(monkeypatch) -> None:
     with _client(monkeypatch) as client:
         resp = client.get("/api/prices", params={"tickers": " , "})
@@ -251,7 +625,7 @@ def test_prices_returns_empty_for_blank_input(monkeypatch) -> None:
 
 
 def test_prices_provider_failure_falls_back_to_symbol_names(monkeypatch) -> None:
-    monkeypatch.setattr(main.cache, "get", lambda _key: None)
+    monkeypatch.setattr(main.cache, "get_many", lambda keys: {})
 
     class BrokenTicker:
         def __init__(self, symbols):
@@ -270,7 +644,7 @@ def test_prices_provider_failure_falls_back_to_symbol_names(monkeypatch) -> None
 
 
 def test_prices_handles_non_dict_provider_payload(monkeypatch) -> None:
-    monkeypatch.setattr(main.cache, "get", lambda _key: None)
+    monkeypatch.setattr(main.cache, "get_many", lambda keys: {})
 
     class FakeYQTicker:
         def __init__(self, symbols):
@@ -295,8 +669,8 @@ def test_prices_ignores_stale_cache_and_refetches(monkeypatch) -> None:
         "cached_at": "2000-01-01T00:00:00+00:00",
     }
     saved = {}
-    monkeypatch.setattr(main.cache, "get", lambda key: stale if key == "price:NVDA" else None)
-    monkeypatch.setattr(main.cache, "set", lambda key, value: saved.update({"key": key, "value": value}))
+    monkeypatch.setattr(main.cache, "get_many", _get_many(lambda key: stale if key == "price:NVDA" else None))
+    monkeypatch.setattr(main.cache, "set_many", saved.update)
 
     class FakeYQTicker:
         def __init__(self, symbols):
@@ -316,7 +690,7 @@ def test_prices_ignores_stale_cache_and_refetches(monkeypatch) -> None:
 
     assert resp.status_code == 200
     assert resp.json()[0]["companyName"] == "NVIDIA New"
-    assert saved["key"] == "price:NVDA"
+    assert list(saved) == ["price:NVDA"]
 
 
 def test_market_summary_refetches_when_cache_is_stale(monkeypatch) -> None:
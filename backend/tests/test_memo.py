@@ -0,0 +1,50 @@
+from app import memo
+
+
+def test_evicts_least_recently_used_beyond_max_entries() -> None:
+    cache = memo.MemoCache("test-lru", max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1   # "b" is now the oldest
+    cache.set("c", 3)
+
+    assert cache.keys() == ["a", "c"]
+    assert cache.get("b") is None
+    assert cache.stats() == {
+        "hits": 1, "misses": 1, "evictions": 1, "expirations": 0, "entries": 2, "max_entries": 2,
+    }
+
+
+def test_entries_expire_after_ttl() -> None:
+    now = {"value": 0.0}
+    cache = memo.MemoCache("test-ttl", max_entries=8, ttl=10, clock=lambda: now["value"])
+    cache.set("a", [])
+
+    now["value"] = 9.9
+    assert cache.get("a") == []
+    now["value"] = 10.0
+    assert cache.get("a", "missing") == "missing"
+    assert len(cache) == 0
+    assert cache.stats()["expirations"] == 1
+
+
+def test_rewriting_a_key_restarts_its_ttl() -> None:
+    now = {"value": 0.0}
+    cache = memo.MemoCache("test-rewrite", max_entries=8, ttl=10, clock=lambda: now["value"])
+    cache.set("a", 1)
+    now["value"] = 8.0
+    cache.set("a", 2)
+    now["value"] = 15.0
+
+    assert cache.get("a") == 2
+
+
+def test_registered_memos_are_reported_in_metrics() -> None:
+    cache = memo.MemoCache("test-metrics", max_entries=4)
+    cache.set("a", 1)
+    cache.get("a")
+
+    assert memo.stats()["test-metrics"]["entries"] == 1
+    rendered = memo.metrics.render()
+    assert 'chronostock_memo_entries{memo="test-metrics"} 1' in rendered
+    assert 'chronostock_memo_requests_total{memo="test-metrics",result="hit"} 1' in rendered
@@ -0,0 +1,47 @@
+from app import metrics
+
+
+def test_counter_renders_labelled_samples() -> None:
+    requests = metrics.Counter("test_requests_total", "Requests.")
+    requests.inc(tier="l1", result="hit")
+    requests.inc(2, tier="l1", result="hit")
+    requests.inc(tier="backend", result="miss")
+
+    family = requests.collect()
+
+    assert requests.value(tier="l1", result="hit") == 3
+    assert {(s.labels["tier"], s.value) for s in family.samples} == {("l1", 3.0), ("backend", 1.0)}
+
+
+def test_histogram_buckets_are_cumulative_with_sum_and_count() -> None:
+    latency = metrics.Histogram("test_seconds", "Latency.", (0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        latency.observe(value, op="get")
+
+    samples = {(s.name, s.labels.get("le")): s.value for s in latency.collect().samples}
+
+    assert samples[("test_seconds_bucket", "0.1")] == 1
+    assert samples[("test_seconds_bucket", "1")] == 3
+    assert samples[("test_seconds_bucket", "+Inf")] == 4
+    assert samples[("test_seconds_count", None)] == 4
+    assert samples[("test_seconds_sum", None)] == 6.05
+    assert latency.count(op="get") == 4
+
+
+def test_render_emits_prometheus_text_for_metrics_and_collectors(monkeypatch) -> None:
+    monkeypatch.setattr(metrics, "_metrics", [])
+    monkeypatch.setattr(metrics, "_collectors", [])
+    hits = metrics.counter("test_hits_total", "Hits.")
+    hits.inc(family='we"ird')
+    metrics.register_collector(lambda: [metrics.gauge("test_entries", "Entries.", [({}, 3)])])
+
+    text = metrics.render()
+
+    assert text.splitlines() == [
+        "# HELP test_hits_total Hits.",
+        "# TYPE test_hits_total counter",
+        'test_hits_total{family="we\\"ird"} 1',
+        "# HELP test_entries Entries.",
+        "# TYPE test_entries gauge",
+        "test_entries 3",
+    ]
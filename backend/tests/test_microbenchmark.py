@@ -0,0 +1,55 @@
+import pytest
+
+from app import microbenchmark
+
+
+def _run_once(fn, *args):
+    return fn(*args)
+
+
+@pytest.mark.parametrize(
+    "bench",
+    [
+        microbenchmark.test_l1_get_unlocked_baseline,
+        microbenchmark.test_l1_get_sharded,
+        microbenchmark.test_l1_set_unlocked_baseline,
+        microbenchmark.test_l1_set_sharded,
+        microbenchmark.test_l1_concurrent_mixed_sharded,
+    ],
+)
+def test_l1_benchmarks_run(bench, monkeypatch) -> None:
+    monkeypatch.setattr(microbenchmark, "L1_OPS_PER_THREAD", 50)
+    bench(_run_once)
+
+
+def test_filled_l1_holds_every_key() -> None:
+    l1 = microbenchmark._sharded_l1()
+    assert len(l1) == microbenchmark.L1_KEYS
+
+
+class _FakeBenchmark:
+    def __init__(self) -> None:
+        self.extra_info: dict = {}
+
+    def __call__(self, fn, *args):
+        return fn(*args)
+
+
+@pytest.mark.parametrize("family", ["stock", "news"])
+def test_codec_benchmarks_run(family, tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(microbenchmark, "CODEC_CACHE_DIR", tmp_path)
+    monkeypatch.setattr(microbenchmark, "CODEC_STOCK_BARS", 100)
+    monkeypatch.setattr(microbenchmark, "_PAYLOADS", {})
+    for fmt in microbenchmark._FORMATS:
+        bench = _FakeBenchmark()
+        microbenchmark.test_codec_encode(bench, family, fmt)
+        assert bench.extra_info["bytes"] > 0
+        microbenchmark.test_codec_decode(_FakeBenchmark(), family, fmt)
+    microbenchmark.test_codec_decode_legacy_json(_FakeBenchmark(), family)
+
+
+def test_sample_payload_prefers_cached_entries(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(microbenchmark, "CODEC_CACHE_DIR", tmp_path)
+    (tmp_path / "news_AAPL.json").write_text('{"items": [], "cached_at": "x"}')
+
+    assert microbenchmark._sample_payload("news") == {"items": [], "cached_at": "x"}
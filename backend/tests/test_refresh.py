@@ -0,0 +1,128 @@
+import threading
+
+from app import upstream
+from app.pipelines import refresh
+from app.pipelines.refresh import RefreshReport, Stage, run_stages
+
+
+def test_runs_every_stage_for_every_ticker_concurrently() -> None:
+    barrier = threading.Barrier(3, timeout=5)   # only passes if the tickers overlap in time
+    done = []
+
+    def slow(ticker):
+        barrier.wait()
+        done.append(ticker)
+
+    report = run_stages(["A", "B", "C"], [Stage("stock", "yahoo", slow)])
+
+    assert sorted(done) == ["A", "B", "C"]
+    assert report.stages["stock"].succeeded == 3
+    assert report.failures == []
+
+
+def test_transient_errors_are_retried_with_backoff() -> None:
+    attempts = {"n": 0}
+    sleeps = []
+
+    def flaky(_ticker):
+        attempts["n"] += 1
+        if attempts["n"] < 3:
+            raise OSError("timeout")
+
+    def schedule(delay, retry):
+        sleeps.append(delay)
+        retry()
+
+    report = run_stages(["A"], [Stage("news", "yahoo", flaky)], max_attempts=3, backoff=1.0, schedule=schedule)
+
+    stats = report.stages["news"]
+    assert (stats.succeeded, stats.failed, stats.retries) == (1, 0, 2)
+    assert len(sleeps) == 2
+    assert 0.5 <= sleeps[0] <= 1.5 and 1.0 <= sleeps[1] <= 3.0
+
+
+def test_backoff_does_not_hold_a_pool_slot(monkeypatch) -> None:
+    monkeypatch.setitem(upstream.UPSTREAM_CONCURRENCY, "single", 1)
+    order = []
+
+    def flaky(ticker):
+        order.append(ticker)
+        if order == ["A"]:
+            raise OSError("timeout")
+
+    def schedule(_delay, retry):
+        timer = threading.Timer(0.05, retry)
+        timer.start()
+
+    try:
+        report = run_stages(["A", "B"], [Stage("news", "single", flaky)], max_attempts=2, schedule=schedule)
+    finally:
+        upstream._pools.pop("single").shutdown()
+
+    assert order == ["A", "B", "A"]   # B used the only worker while A waited to retry
+    assert report.stages["news"].succeeded == 2
+    assert report.stages["news"].retries == 1
+
+
+def test_failures_are_isolated_and_not_retried_for_missing_data() -> None:
+    calls = []
+
+    def stock(ticker):
+        calls.append(ticker)
+        if ticker == "BAD":
+            raise ValueError("No data returned for BAD")
+
+    def filings(ticker):
+        raise OSError("sec down")
+
+    report = run_stages(
+        ["BAD", "OK"],
+        [Stage("stock", "yahoo", stock), Stage("sec_filings", "sec", filings)],
+        max_attempts=2, schedule=lambda _delay, retry: retry(),
+    )
+
+    assert sorted(calls) == ["BAD", "OK"]   # no retry for ValueError
+    assert report.stages["stock"].failed == 1
+    assert report.stages["sec_filings"].failed == 2
+    assert report.stages["sec_filings"].retries == 2
+    assert ("BAD", "stock", "ValueError: No data returned for BAD") in report.failures
+
+
+def test_run_bulk_times_a_batch_step_and_records_failure() -> None:
+    report = RefreshReport()
+
+    assert report.run_bulk("prices", lambda tickers: len(tickers), ["A", "B"]) == 2
+    assert report.run_bulk("info", lambda: 1 / 0, default={}) == {}
+
+    assert report.stages["prices"].succeeded == 1
+    assert report.failures == [("*", "info", "ZeroDivisionError: division by zero")]
+    assert any(line.startswith("  prices") for line in report.lines())
+
+
+def test_rate_limiter_spaces_requests() -> None:
+    now = {"t": 100.0}
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        now["t"] += seconds
+
+    limiter = upstream.RateLimiter(10, clock=lambda: now["t"], sleep=sleep)
+    waits = [limiter.acquire() for _ in range(3)]
+
+    assert waits[0] == 0
+    assert [round(w, 6) for w in waits[1:]] == [0.1, 0.1]
+    assert limiter.stats()["throttled"] == 2
+
+
+def test_throttle_only_limits_configured_upstreams(monkeypatch) -> None:
+    monkeypatch.setattr(upstream, "UPSTREAM_RATE_LIMITS", {"sec": 10})
+    monkeypatch.setattr(upstream, "_limiters", {})
+
+    assert upstream.throttle("yahoo") == 0.0
+    upstream.throttle("sec")
+    assert upstream._limiters["sec"].stats()["requests"] == 1
+
+
+def test_backoff_is_capped() -> None:
+    assert refresh._backoff(20, 1.0) <= refresh._MAX_BACKOFF_SECONDS * 1.5
@@ -2,7 +2,10 @@ import builtins
 from pathlib import Path
 import textwrap
 
-from app.models import EarningsDate, OHLCBar, SECFiling, StockMeta, StockNews
+import pytest
+
+from app.models import EarningsDate, SECFiling, StockMeta, StockNews
+from app.series import OHLCSeries
 from app.pipelines import run_daily_update
 
 
@@ -20,10 +23,13 @@ def test_build_update_tickers_keeps_env_order_and_deduplicates(monkeypatch) -> N
 
 def test_refresh_stock_bundle_writes_cached_payload(monkeypatch) -> None:
     written = {}
+    monkeypatch.setattr(run_daily_update.cache, "get", lambda key: None)
     monkeypatch.setattr(
         run_daily_update,
-        "fetch_bars",
-        lambda ticker: [OHLCBar(time="2026-01-01", open=1, high=2, low=0.5, close=1.5, volume=100)],
+        "refresh_bars",
+        lambda ticker, cached: OHLCSeries.from_payload(
+            [{"time": "2026-01-01", "open": 1, "high": 2, "low": 0.5, "close": 1.5, "volume": 100}]
+        ),
     )
     monkeypatch.setattr(
         run_daily_update,
@@ -32,16 +38,40 @@ def test_refresh_stock_bundle_writes_cached_payload(monkeypatch) -> None:
     )
     monkeypatch.setattr(run_daily_update.cache, "set", lambda key, value: written.update({"key": key, "value": value}))
 
-    run_daily_update.refresh_stock_bundle("NVDA")
+    run_daily_update.refresh_stock_bundle("NVDA", run_daily_update.WriteTracker())
 
     assert written["key"] == "stock:NVDA"
     assert written["value"]["ticker"] == "NVDA"
     assert written["value"]["companyName"] == "NVIDIA"
     assert written["value"]["assetType"] == "equity"
-    assert written["value"]["bars"][0]["close"] == 1.5
+    assert written["value"]["bars"]["close"] == [1.5]
+    assert written["value"]["meta"]["marketCap"] == 1.0
     assert written["value"]["cached_at"]
 
 
+def test_refresh_stock_bundle_uses_prefetched_info(monkeypatch) -> None:
+    written = {}
+    monkeypatch.setattr(run_daily_update.cache, "get", lambda key: None)
+    monkeypatch.setattr(run_daily_update, "refresh_bars", lambda ticker, cached: OHLCSeries.from_payload(
+        [{"time": "2026-01-01", "open": 1, "high": 2, "low": 0.5, "close": 1.5, "volume": 100}]
+    ))
+    monkeypatch.setattr(run_daily_update, "fetch_info", lambda ticker: pytest.fail("info was prefetched"))
+    monkeypatch.setattr(run_daily_update.cache, "set", lambda key, value: written.update({key: value}))
+
+    run_daily_update.refresh_stock_bundle("NVDA", run_daily_update.WriteTracker(), ("NVIDIA", StockMeta(beta=1.5), "equity"))
+
+    assert written["stock:NVDA"]["meta"]["beta"] == 1.5
+
+
+def test_fetch_infos_falls_back_to_per_ticker_calls_when_batch_fails(monkeypatch) -> None:
+    monkeypatch.setattr(
+        run_daily_update, "fetch_info_many", lambda tickers: (_ for _ in ()).throw(RuntimeError("yahoo down"))
+    )
+    monkeypatch.setattr(builtins, "print", lambda *args, **kwargs: None)
+
+    assert run_daily_update.fetch_infos(["NVDA"]) == {}
+
+
 def test_refresh_earnings_and_news_and_sec_filings_write_items(monkeypatch) -> None:
     writes = {}
     monkeypatch.setattr(
@@ -59,17 +89,64 @@ def test_refresh_earnings_and_news_and_sec_filings_write_items(monkeypatch) -> N
         "fetch_sec_filings",
         lambda ticker: [SECFiling(date="2026-01-01", form="8-K", items=["2.02"], label="Earnings", url="https://sec")],
     )
+    monkeypatch.setattr(run_daily_update.cache, "get", lambda key: None)
     monkeypatch.setattr(run_daily_update.cache, "set", lambda key, value: writes.__setitem__(key, value))
 
-    run_daily_update.refresh_earnings("NVDA")
-    run_daily_update.refresh_news("NVDA")
-    run_daily_update.refresh_sec_filings("NVDA")
+    tracker = run_daily_update.WriteTracker()
+    run_daily_update.refresh_earnings("NVDA", tracker)
+    run_daily_update.refresh_news("NVDA", tracker)
+    run_daily_update.refresh_sec_filings("NVDA", tracker)
 
     assert writes["earnings:NVDA"]["items"][0]["date"] == "2026-05-01"
     assert writes["news:NVDA"]["items"][0]["id"] == "n1"
     assert writes["sec:filings:NVDA"]["items"][0]["form"] == "8-K"
 
 
+def test_unchanged_content_is_not_rewritten(monkeypatch) -> None:
+    cached = {"news:NVDA": {"cached_at": "2026-01-01T00:00:00+00:00", "items": []}}
+    writes = {}
+    monkeypatch.setattr(run_daily_update, "fetch_news", lambda ticker: [])
+    monkeypatch.setattr(
+        run_daily_update,
+        "fetch_earnings_dates",
+        lambda ticker: [EarningsDate(date="2026-05-01", epsEstimate=1.2)],
+    )
+    monkeypatch.setattr(run_daily_update.cache, "get", cached.get)
+    monkeypatch.setattr(run_daily_update.cache, "set", lambda key, value: writes.__setitem__(key, value))
+    tracker = run_daily_update.WriteTracker()
+
+    run_daily_update.refresh_news("NVDA", tracker)
+    run_daily_update.refresh_earnings("NVDA", tracker)
+
+    stats = tracker.stats()
+    assert list(writes) == ["earnings:NVDA"]
+    assert tracker.verified == {"news:NVDA": "2026-01-01T00:00:00+00:00"}
+    assert stats["written"] == 1
+    assert stats["unchanged"] == 1
+    assert stats["bytes_saved"] > 0
+    assert stats["bytes_written"] > 0
+    # Each run starts from zero
+    assert run_daily_update.WriteTracker().stats()["written"] == 0
+
+
+def test_store_encodes_the_payload_once_and_skips_digesting_unstamped_entries(monkeypatch) -> None:
+    encoded = []
+    real_encode = run_daily_update.cache.codec.encode
+    monkeypatch.setattr(
+        run_daily_update.cache.codec, "encode", lambda value, **kwargs: encoded.append(value) or real_encode(value, **kwargs)
+    )
+    monkeypatch.setattr(run_daily_update.cache, "set", lambda key, value: None)
+    tracker = run_daily_update.WriteTracker()
+
+    tracker.store("news:NVDA", {"cached_at": "2026-01-02T00:00:00+00:00", "items": [1]}, {"items": [1]})
+    assert encoded == [{"items": [1]}]
+
+    tracker.store("news:AAPL", {"cached_at": "2026-01-02T00:00:00+00:00", "items": [1]},
+                  {"cached_at": "2026-01-01T00:00:00+00:00", "items": [1]})
+    assert len(encoded) == 3
+    assert tracker.stats()["written"] == 1 and tracker.stats()["unchanged"] == 1
+
+
 def test_refresh_prices_returns_early_for_empty_input(monkeypatch) -> None:
     called = {"count": 0}
 
@@ -100,7 +177,7 @@ def test_refresh_prices_caches_only_dict_entries(monkeypatch) -> None:
             }
 
     monkeypatch.setattr(run_daily_update, "YQTicker", FakeTicker)
-    monkeypatch.setattr(run_daily_update.cache, "set", lambda key, value: writes.__setitem__(key, value))
+    monkeypatch.setattr(run_daily_update.cache, "set_many", writes.update)
 
     run_daily_update.refresh_prices(["NVDA", "AAPL"])
 
@@ -192,25 +269,65 @@ def test_main_refreshes_all_resources_for_each_ticker(monkeypatch) -> None:
     calls = []
     monkeypatch.setattr(run_daily_update, "build_update_tickers", lambda: ["NVDA", "AAPL"])
     monkeypatch.setattr(run_daily_update, "refresh_prices", lambda tickers: calls.append(("prices", tickers)))
-    monkeypatch.setattr(run_daily_update, "refresh_stock_bundle", lambda ticker: calls.append(("stock", ticker)))
-    monkeypatch.setattr(run_daily_update, "refresh_earnings", lambda ticker: calls.append(("earnings", ticker)))
-    monkeypatch.setattr(run_daily_update, "refresh_news", lambda ticker: calls.append(("news", ticker)))
-    monkeypatch.setattr(run_daily_update, "refresh_sec_filings", lambda ticker: calls.append(("sec", ticker)))
-    monkeypatch.setattr(builtins, "print", lambda *args, **kwargs: None)
+    monkeypatch.setattr(run_daily_update, "fetch_info_many", lambda tickers: {"NVDA": ("NVIDIA", None, "equity")})
+    monkeypatch.setattr(
+        run_daily_update, "refresh_stock_bundle", lambda ticker, writes, info: calls.append(("stock", ticker, info))
+    )
+    monkeypatch.setattr(
+        run_daily_update, "refresh_earnings", lambda ticker, writes: calls.append(("earnings", ticker))
+    )
+
+    def refresh_news(ticker, writes):
+        calls.append(("news", ticker))
+        if ticker == "NVDA":
+            writes.verified["news:NVDA"] = "2026-01-01T00:00:00+00:00"
+
+    monkeypatch.setattr(run_daily_update, "refresh_news", refresh_news)
+    monkeypatch.setattr(run_daily_update, "refresh_sec_filings", lambda ticker, writes: calls.append(("sec", ticker)))
+    verified = []
+    monkeypatch.setattr(run_daily_update.cache, "record_verified", verified.append)
+    printed = []
+    monkeypatch.setattr(builtins, "print", lambda *args, **kwargs: printed.append(" ".join(map(str, args))))
 
     run_daily_update.main()
 
-    assert calls == [
-        ("prices", ["NVDA", "AAPL"]),
-        ("stock", "NVDA"),
-        ("earnings", "NVDA"),
-        ("news", "NVDA"),
-        ("sec", "NVDA"),
-        ("stock", "AAPL"),
-        ("earnings", "AAPL"),
-        ("news", "AAPL"),
-        ("sec", "AAPL"),
-    ]
+    assert calls[0] == ("prices", ["NVDA", "AAPL"])
+    assert sorted(calls[1:], key=str) == sorted([
+        ("earnings", "NVDA"), ("news", "NVDA"), ("sec", "NVDA"), ("stock", "NVDA", ("NVIDIA", None, "equity")),
+        ("earnings", "AAPL"), ("news", "AAPL"), ("sec", "AAPL"), ("stock", "AAPL", None),
+    ], key=str)
+    report = printed[-1]
+    for stage in ("prices", "info", "stock", "earnings", "news", "sec_filings"):
+        assert f"  {stage}" in report
+    assert "stock        2/2 ok, 0 failed" in report
+    assert verified == [{"news:NVDA": "2026-01-01T00:00:00+00:00"}]
+    assert "unchanged (" in printed[-2] and "bytes saved" in printed[-2]
+
+
+def test_main_isolates_failures_and_exits_nonzero(monkeypatch) -> None:
+    done = []
+    monkeypatch.setattr(run_daily_update, "build_update_tickers", lambda: ["NVDA", "AAPL"])
+    monkeypatch.setattr(run_daily_update, "refresh_prices", lambda tickers: None)
+    monkeypatch.setattr(run_daily_update, "fetch_info_many", lambda tickers: {})
+
+    def refresh_stock_bundle(ticker, writes, info):
+        if ticker == "NVDA":
+            raise ValueError("no data")
+        done.append(("stock", ticker))
+
+    monkeypatch.setattr(run_daily_update, "refresh_stock_bundle", refresh_stock_bundle)
+    for name in ("refresh_earnings", "refresh_news", "refresh_sec_filings"):
+        monkeypatch.setattr(run_daily_update, name, lambda ticker, writes, name=name: done.append((name, ticker)))
+    printed = []
+    monkeypatch.setattr(builtins, "print", lambda *args, **kwargs: printed.append(" ".join(map(str, args))))
+
+    with pytest.raises(SystemExit, match="1 refresh task"):
+        run_daily_update.main()
+
+    assert ("stock", "AAPL") in done
+    assert ("refresh_earnings", "NVDA") in done
+    assert len(done) == 7
+    assert "FAILED stock NVDA: ValueError: no data" in printed[-1]
 
 
 def test_real_main_block_invokes_main(monkeypatch) -> None:
@@ -218,7 +335,8 @@ def test_real_main_block_invokes_main(monkeypatch) -> None:
     monkeypatch.setattr(run_daily_update, "main", lambda: calls.append("main"))
 
     source_lines = Path(run_daily_update.__file__).read_text(encoding="utf-8").splitlines()
-    main_block = "\n" * 141 + textwrap.dedent("\n".join(source_lines[141:])) + "\n"
+    start = source_lines.index('if __name__ == "__main__":')
+    main_block = "\n" * start + textwrap.dedent("\n".join(source_lines[start:])) + "\n"
     code = compile(main_block, run_daily_update.__file__, "exec")
     globals_dict = dict(run_daily_update.__dict__)
     globals_dict["__name__"] = "__main__"
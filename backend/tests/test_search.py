@@ -0,0 +1,47 @@
+from app.search import TickerIndex
+
+_INDEX = TickerIndex([
+    ("NVDA", "NVIDIA CORP"),
+    ("AAPL", "Apple Inc."),
+    ("MSFT", "MICROSOFT CORP"),
+    ("BRK-B", "BERKSHIRE HATHAWAY INC"),
+    ("NVD", "Leveraged NVDA Short Fund"),
+    ("APLE", "Apple Hospitality REIT, Inc."),
+    ("nvda", "Duplicate listing"),
+])
+
+
+def _tickers(query: str, limit: int = 6) -> list[str]:
+    return [hit["ticker"] for hit in _INDEX.search(query, limit)]
+
+
+def test_exact_ticker_ranks_before_prefix_matches() -> None:
+    assert _tickers("nvd") == ["NVD", "NVDA"]
+    assert _tickers("NVDA") == ["NVDA", "NVD"]   # NVD's name mentions NVDA
+
+
+def test_prefix_matches_rank_by_listing_order() -> None:
+    assert _tickers("a") == ["AAPL", "APLE"]
+    assert _tickers("a", limit=1) == ["AAPL"]
+
+
+def test_every_query_word_must_prefix_a_name_word() -> None:
+    assert _tickers("apple") == ["AAPL", "APLE"]
+    assert _tickers("apple hosp") == ["APLE"]
+    assert _tickers("micro") == ["MSFT"]
+
+
+def test_share_class_dot_is_normalized() -> None:
+    assert _INDEX.search("brk.b") == [{"ticker": "BRK-B", "companyName": "BERKSHIRE HATHAWAY INC"}]
+
+
+def test_fuzzy_fallback_only_for_prefix_misses() -> None:
+    assert _tickers("nvidai") == ["NVDA"]
+    assert _tickers("microsfot") == ["MSFT"]
+    assert _tickers("zzzz") == []
+    assert _tickers("  ") == []
+
+
+def test_first_listing_of_a_ticker_wins() -> None:
+    assert len(_INDEX) == 6
+    assert _INDEX.search("nvda", limit=1) == [{"ticker": "NVDA", "companyName": "NVIDIA CORP"}]
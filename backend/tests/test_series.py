@@ -0,0 +1,114 @@
+import json
+
+import pandas as pd
+
+from app.series import OHLCSeries
+
+
+def _frame(index, **overrides) -> pd.DataFrame:
+    n = len(index)
+    data = {
+        "Open": [1.0] * n,
+        "High": [2.0] * n,
+        "Low": [0.5] * n,
+        "Close": [1.5] * n,
+        "Volume": [100] * n,
+    }
+    data.update(overrides)
+    return pd.DataFrame(data, index=index)
+
+
+def test_from_frame_rounds_like_python_and_drops_nan_rows() -> None:
+    df = _frame(
+        pd.to_datetime(["2026-01-02", "2026-01-05", "2026-01-06"]),
+        Open=[12.345, 2.675, float("nan")],
+        Volume=[1, float("nan"), 3],
+    )
+
+    series = OHLCSeries.from_frame(df)
+
+    assert series.to_payload()["time"] == ["2026-01-02", "2026-01-05"]
+    assert series.open.tolist() == [round(12.345, 2), round(2.675, 2)]
+    assert series.volume.tolist() == [1, 0]
+
+
+def test_from_frame_keeps_local_dates_for_tz_aware_index_and_sorts() -> None:
+    index = pd.DatetimeIndex(
+        [pd.Timestamp("2026-01-05 00:00", tz="America/New_York"), pd.Timestamp("2026-01-02 00:00", tz="America/New_York")]
+    )
+    series = OHLCSeries.from_frame(_frame(index, Close=[2.0, 1.0]))
+
+    assert series.to_payload()["time"] == ["2026-01-02", "2026-01-05"]
+    assert series.close.tolist() == [1.0, 2.0]
+
+
+def test_from_payload_reads_columnar_and_legacy_bar_lists() -> None:
+    columnar = {
+        "time": ["2026-01-02", "2026-01-05"],
+        "open": [1, 2],
+        "high": [1, 2],
+        "low": [1, 2],
+        "close": [1, 2],
+        "volume": [10, 20],
+    }
+    legacy = [
+        {"time": t, "open": o, "high": h, "low": lo, "close": c, "volume": v}
+        for t, o, h, lo, c, v in zip(*columnar.values())
+    ]
+
+    expected = {**columnar, "open": [1.0, 2.0], "high": [1.0, 2.0], "low": [1.0, 2.0], "close": [1.0, 2.0]}
+    assert OHLCSeries.from_payload(columnar).to_payload() == expected
+    assert OHLCSeries.from_payload(legacy).to_payload() == expected
+
+
+def test_start_index_bisects_on_dates() -> None:
+    series = OHLCSeries.from_payload({
+        "time": ["2026-01-02", "2026-01-05", "2026-01-06"],
+        "open": [1, 1, 1], "high": [1, 1, 1], "low": [1, 1, 1], "close": [1, 1, 1], "volume": [1, 1, 1],
+    })
+
+    assert series.start_index("2000-01-01") == 0
+    assert series.start_index("2026-01-03") == 1
+    assert series.start_index("2026-01-05") == 1
+    assert series.start_index("2027-01-01") == 3
+    assert series.date_at(2) == "2026-01-06"
+
+
+def test_bars_json_matches_ohlc_bar_shape() -> None:
+    series = OHLCSeries.from_payload({
+        "time": ["2026-01-02", "2026-01-05"],
+        "open": [1, 10.25], "high": [2, 11], "low": [0.5, 9.5], "close": [1.5, 10.75], "volume": [100, 200],
+    })
+
+    assert json.loads(series.bars_json(1)) == [
+        {"time": "2026-01-05", "open": 10.25, "high": 11.0, "low": 9.5, "close": 10.75, "volume": 200}
+    ]
+    assert json.loads(series.bars_json())[0]["time"] == "2026-01-02"
+    assert series.bars_json(2) == "[]"
+
+
+def _columns(times, closes) -> OHLCSeries:
+    n = len(times)
+    return OHLCSeries.from_payload({
+        "time": times, "open": closes, "high": closes, "low": closes, "close": closes, "volume": [1] * n,
+    })
+
+
+def test_extend_splices_recent_bars_over_the_overlap() -> None:
+    cached = _columns(["2026-01-02", "2026-01-05", "2026-01-06"], [1.0, 2.0, 2.5])   # last bar was partial
+    recent = _columns(["2026-01-05", "2026-01-06", "2026-01-07"], [2.0, 3.0, 4.0])
+
+    merged = cached.extend(recent)
+
+    assert merged.to_payload()["time"] == ["2026-01-02", "2026-01-05", "2026-01-06", "2026-01-07"]
+    assert merged.close.tolist() == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_extend_rejects_readjusted_or_unverifiable_overlap() -> None:
+    cached = _columns(["2026-01-02", "2026-01-05", "2026-01-06"], [1.0, 2.0, 2.5])
+
+    # Past prices moved (split / dividend adjustment)
+    assert cached.extend(_columns(["2026-01-05", "2026-01-07"], [1.0, 4.0])) is None
+    # Nothing in common to compare except our possibly partial last bar
+    assert cached.extend(_columns(["2026-01-06", "2026-01-07"], [3.0, 4.0])) is None
+    assert cached.extend(_columns([], [])) is cached
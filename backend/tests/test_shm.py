@@ -0,0 +1,78 @@
+import pytest
+
+from app import shm
+
+
+@pytest.fixture
+def table_path(tmp_path):
+    return str(tmp_path / "chronostock-shm")
+
+
+def test_put_get_roundtrip_is_visible_to_another_mapping(table_path) -> None:
+    writer = shm.SharedTable(table_path, data_size=64 * 1024, slots=64)
+    reader = shm.SharedTable(table_path, data_size=64 * 1024, slots=64)
+
+    assert writer.put("stock:NVDA", b'{"ticker":"NVDA"}', ttl=60)
+    assert reader.get("stock:NVDA") == b'{"ticker":"NVDA"}'
+    assert reader.get("stock:AAPL") is None
+
+    # Replacing a key reuses its slot; readers see the newest record
+    writer.put("stock:NVDA", b'{"ticker":"NVDA","v":2}')
+    assert reader.get("stock:NVDA") == b'{"ticker":"NVDA","v":2}'
+    assert reader.stats()["hits"] == 2
+    assert reader.stats()["misses"] == 1
+    writer.close()
+    reader.close()
+
+
+def test_expired_and_oversized_entries_are_not_served(table_path, monkeypatch) -> None:
+    table = shm.SharedTable(table_path, data_size=4096, slots=16)
+    now = [1_000.0]
+    monkeypatch.setattr(shm.time, "time", lambda: now[0])
+
+    assert table.put("price:NVDA", b"1", ttl=10)
+    assert table.put("price:AAPL", b"2", ttl=0) is False
+    assert table.put("stock:BIG", b"x" * 2048) is False
+
+    assert table.get("price:NVDA") == b"1"
+    now[0] += 10
+    assert table.get("price:NVDA") is None
+    assert table.stats()["skipped"] == 2
+    table.close()
+
+
+def test_ring_wrap_invalidates_overwritten_records(table_path) -> None:
+    table = shm.SharedTable(table_path, data_size=1024, slots=64)
+    table.put("news:OLD", b"o" * 200)
+    for i in range(6):
+        table.put(f"news:N{i}", bytes([i]) * 200)
+
+    assert table.get("news:OLD") is None
+    assert table.get("news:N5") == bytes([5]) * 200
+    assert table.stats()["write_pos"] > table.data_size
+    table.close()
+
+
+def test_reopening_with_a_different_layout_reinitializes(table_path) -> None:
+    first = shm.SharedTable(table_path, data_size=4096, slots=16)
+    first.put("price:NVDA", b"1")
+    first.close()
+
+    resized = shm.SharedTable(table_path, data_size=8192, slots=16)
+    assert resized.get("price:NVDA") is None
+    resized.close()
+
+    same = shm.SharedTable(table_path, data_size=8192, slots=16)
+    same.put("price:NVDA", b"2")
+    same.close()
+    assert shm.SharedTable(table_path, data_size=8192, slots=16).get("price:NVDA") == b"2"
+
+
+def test_corrupted_record_reads_as_miss(table_path) -> None:
+    table = shm.SharedTable(table_path, data_size=4096, slots=16)
+    table.put("price:NVDA", b"12345")
+    start = table._data_offset + shm._RECORD.size + len("price:NVDA")
+    table._mm[start:start + 1] = b"9"
+
+    assert table.get("price:NVDA") is None
+    table.close()
@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+
+from app import singleflight
+
+
+@pytest.fixture(autouse=True)
+def _clean_stats():
+    singleflight.reset_stats()
+    yield
+    singleflight.reset_stats()
+
+
+def test_do_returns_result_and_counts_execution() -> None:
+    assert singleflight.do("stock:NVDA", lambda: 42) == 42
+    stats = singleflight.stats()
+    assert stats["executions"] == {"stock": 1}
+    assert stats["coalesced"] == {}
+    assert stats["in_flight"] == 0
+
+
+def test_concurrent_callers_share_one_execution() -> None:
+    release = threading.Event()
+    started = threading.Event()
+    calls = []
+
+    def slow_fetch():
+        calls.append(1)
+        started.set()
+        release.wait(timeout=5)
+        return {"bars": [1, 2, 3]}
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(singleflight.do("stock:AAPL", slow_fetch)))
+    leader.start()
+    assert started.wait(timeout=5)
+
+    followers = [
+        threading.Thread(target=lambda: results.append(singleflight.do("stock:AAPL", slow_fetch)))
+        for _ in range(4)
+    ]
+    for t in followers:
+        t.start()
+    # Wait until every follower has registered as a waiter before releasing the leader.
+    for _ in range(500):
+        if singleflight.stats()["coalesced"].get("stock") == 4:
+            break
+        time.sleep(0.01)
+    release.set()
+    for t in [leader, *followers]:
+        t.join(timeout=5)
+
+    assert len(calls) == 1
+    assert results == [{"bars": [1, 2, 3]}] * 5
+    assert singleflight.stats()["coalesced"] == {"stock": 4}
+
+
+def test_leader_exception_propagates_to_waiters_and_clears_key() -> None:
+    release = threading.Event()
+    started = threading.Event()
+
+    def failing_fetch():
+        started.set()
+        release.wait(timeout=5)
+        raise ValueError("No data returned for XXXX")
+
+    errors = []
+
+    def call():
+        try:
+            singleflight.do("news:XXXX", failing_fetch)
+        except ValueError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    assert started.wait(timeout=5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    for _ in range(500):
+        if singleflight.stats()["coalesced"].get("news") == 1:
+            break
+        time.sleep(0.01)
+    release.set()
+    leader.join(timeout=5)
+    follower.join(timeout=5)
+
+    assert errors == ["No data returned for XXXX"] * 2
+    # The failed key is released so the next caller retries upstream.
+    assert singleflight.do("news:XXXX", lambda: "ok") == "ok"
+    assert singleflight.stats()["executions"] == {"news": 2}
+
+
+def test_different_keys_do_not_coalesce() -> None:
+    assert singleflight.do("earnings:NVDA", lambda: 1) == 1
+    assert singleflight.do("earnings:AAPL", lambda: 2) == 2
+    assert singleflight.stats()["executions"] == {"earnings": 2}
+    assert singleflight.stats()["coalesced"] == {}
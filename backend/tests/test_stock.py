@@ -1,5 +1,6 @@
 from datetime import datetime
 
+import numpy as np
 import pandas as pd
 import pytest
 
@@ -30,12 +31,62 @@ def test_fetch_bars_success(monkeypatch: pytest.MonkeyPatch) -> None:
 
     bars = stock.fetch_bars("NVDA")
     assert len(bars) == 1
-    assert bars[0].time == "2026-01-02"
-    assert bars[0].open == 10.11
-    assert bars[0].high == 12.35
-    assert bars[0].low == 9.0
-    assert bars[0].close == 12.0
-    assert bars[0].volume == 1234
+    assert bars.to_payload() == {
+        "time": ["2026-01-02"],
+        "open": [10.11],
+        "high": [12.35],
+        "low": [9.0],
+        "close": [12.0],
+        "volume": [1234],
+    }
+
+
+def test_fetch_bars_all_nan_rows_raises(monkeypatch: pytest.MonkeyPatch) -> None:
+    df = pd.DataFrame(
+        {"Open": [float("nan")], "High": [1.0], "Low": [1.0], "Close": [1.0], "Volume": [1]},
+        index=[pd.Timestamp("2026-01-02")],
+    )
+    monkeypatch.setattr(stock.yf, "download", lambda *args, **kwargs: df)
+    with pytest.raises(ValueError, match="No data returned"):
+        stock.fetch_bars("NVDA")
+
+
+def test_fetch_bars_many_splits_grouped_frame_and_skips_empty_tickers(monkeypatch: pytest.MonkeyPatch) -> None:
+    index = [pd.Timestamp("2026-01-02"), pd.Timestamp("2026-01-05")]
+    nan = float("nan")
+    columns = pd.MultiIndex.from_product([["NVDA", "NEWCO", "GONE"], ["Open", "High", "Low", "Close", "Volume"]])
+    df = pd.DataFrame(
+        [
+            [1, 2, 0.5, 1.5, 10, nan, nan, nan, nan, nan, nan, nan, nan, nan, nan],
+            [2, 3, 1.5, 2.5, 20, 5, 6, 4, 5.5, 7, nan, nan, nan, nan, nan],
+        ],
+        index=index,
+        columns=columns,
+    )
+    calls = []
+    monkeypatch.setattr(stock.yf, "download", lambda tickers, **kwargs: calls.append(tickers) or df)
+
+    result = stock.fetch_bars_many(["NVDA", "NEWCO", "GONE", "MISSING"])
+
+    assert calls == [["NVDA", "NEWCO", "GONE", "MISSING"]]
+    assert sorted(result) == ["NEWCO", "NVDA"]
+    assert result["NVDA"].close.tolist() == [1.5, 2.5]
+    # Rows before a ticker's first trade are NaN in the shared frame and are dropped
+    assert result["NEWCO"].to_payload()["time"] == ["2026-01-05"]
+    assert stock.fetch_bars_many([]) == {}
+
+
+def test_stock_payload_stores_columnar_bars_and_full_meta() -> None:
+    bars = stock.OHLCSeries.from_payload(
+        {"time": ["2026-01-02"], "open": [1], "high": [2], "low": [0.5], "close": [1.5], "volume": [10]}
+    )
+    payload = stock.stock_payload("NVDA", bars, "NVIDIA", {"marketCap": 5}, "equity")
+
+    assert payload["bars"]["time"] == ["2026-01-02"]
+    assert payload["meta"]["marketCap"] == 5
+    assert payload["meta"]["peRatio"] is None
+    assert payload["cached_at"]
+    assert stock.stock_payload("NVDA", bars, "NVIDIA", None, "equity")["meta"] is None
 
 
 def test_fetch_bars_empty_raises(monkeypatch: pytest.MonkeyPatch) -> None:
@@ -69,6 +120,55 @@ def test_fetch_info_maps_fields_and_asset_type(monkeypatch: pytest.MonkeyPatch)
     assert meta.earningsDate == "2024-02-01"
 
 
+def test_fetch_info_many_merges_modules_and_quotes_like_info(monkeypatch: pytest.MonkeyPatch) -> None:
+    created = []
+
+    class FakeYQTicker:
+        def __init__(self, tickers, **kwargs):
+            created.append((tickers, kwargs))
+            self.quotes = {
+                "NVDA": {"longName": "NVIDIA Corp", "earningsTimestamp": 1706745600, "trailingPE": 50.0},
+                "SPY": {"shortName": "SPDR S&P 500", "quoteType": "ETF"},
+            }
+
+        def get_modules(self, modules):
+            assert modules == stock._INFO_MODULES
+            return {
+                "NVDA": {
+                    "quoteType": {"quoteType": "EQUITY"},
+                    "financialData": {"totalRevenue": {"raw": 200, "fmt": "200"}, "recommendationKey": "buy"},
+                    "summaryDetail": {
+                        "marketCap": {"raw": 100, "fmt": "100"},
+                        "exDividendDate": {"raw": 1704067200, "fmt": "2024-01-01"},
+                        "trailingPE": {"raw": 49.0, "fmt": "49.00"},
+                        "forwardPE": {},
+                    },
+                },
+                "SPY": "Quote not found for symbol: SPY",
+                "ZZZZ": "Quote not found for symbol: ZZZZ",
+            }
+
+    monkeypatch.setattr("yahooquery.Ticker", FakeYQTicker)
+
+    infos = stock.fetch_info_many(["NVDA", "SPY", "ZZZZ"])
+
+    assert created[0][0] == ["NVDA", "SPY", "ZZZZ"]
+    assert created[0][1]["formatted"] is True
+    assert list(infos) == ["NVDA", "SPY"]
+    company, meta, asset = infos["NVDA"]
+    assert (company, asset) == ("NVIDIA Corp", "equity")
+    assert meta.marketCap == 100
+    assert meta.revenue == 200
+    assert meta.analystRating == "Buy"
+    assert meta.peRatio == 50.0   # the v7 quote wins, as in yfinance's .info
+    assert meta.forwardPE is None
+    assert meta.exDividendDate == "2024-01-01"
+    assert meta.earningsDate == "2024-02-01"
+    assert infos["SPY"][0] == "SPDR S&P 500"
+    assert infos["SPY"][2] == "etf"
+    assert stock.fetch_info_many([]) == {}
+
+
 def test_fetch_info_fallbacks_unknown_asset(monkeypatch: pytest.MonkeyPatch) -> None:
     class FakeTicker:
         info = {"shortName": "Short Name", "quoteType": "SOMETHING_ELSE"}
@@ -153,6 +253,19 @@ def test_fetch_earnings_dates_skips_unparseable_index(monkeypatch: pytest.Monkey
     assert [i.date for i in items] == ["2026-03-01"]
 
 
+
+def test_earnings_from_frame_keeps_exchange_dates_and_tolerates_missing_columns() -> None:
+    index = pd.DatetimeIndex(["2026-04-30 16:00", "2026-01-29 16:00"]).tz_localize("America/New_York")
+    df = pd.DataFrame({"EPS Estimate": [0.9, 0.8]}, index=index)
+
+    items = stock.earnings_from_frame(df)
+
+    assert [(i.date, i.epsEstimate, i.reportedEps) for i in items] == [
+        ("2026-01-29", 0.8, None),
+        ("2026-04-30", 0.9, None),
+    ]
+    assert type(items[0].epsEstimate) is float
+
 def test_fetch_news_handles_transforms_and_dedupes(monkeypatch: pytest.MonkeyPatch) -> None:
     raw_news = [
         {
@@ -233,7 +346,69 @@ def test_fetch_news_falls_back_when_pub_date_is_invalid(monkeypatch: pytest.Monk
     assert items[0].time == "not-a-date"[:10]
 
 
-def test_search_tickers_success_and_failure(monkeypatch: pytest.MonkeyPatch) -> None:
+@pytest.fixture
+def no_search_index(monkeypatch: pytest.MonkeyPatch) -> None:
+    """SEC unreachable: search falls through to yf.Search."""
+    def unreachable():
+        raise OSError("sec down")
+
+    monkeypatch.setattr(stock.edgar, "company_names", unreachable)
+    monkeypatch.setattr(stock, "_search_index", None)
+    monkeypatch.setattr(stock, "_search_index_at", 0.0)
+
+
+def test_search_tickers_answers_from_local_index(monkeypatch: pytest.MonkeyPatch) -> None:
+    builds = []
+
+    def company_names():
+        builds.append(1)
+        return {"NVDA": "NVIDIA CORP", "NVDS": "Some Leveraged Fund"}
+
+    def no_yahoo(*_args, **_kwargs):
+        raise AssertionError("yf.Search should not be called for local hits")
+
+    monkeypatch.setattr(stock.edgar, "company_names", company_names)
+    monkeypatch.setattr(stock, "_search_index", None)
+    monkeypatch.setattr(stock, "_search_index_at", 0.0)
+    monkeypatch.setattr(stock.yf, "Search", no_yahoo)
+
+    assert stock.search_local("nv") == []   # not built yet
+    assert stock.search_tickers("nv") == [
+        {"ticker": "NVDA", "companyName": "NVIDIA CORP"},
+        {"ticker": "NVDS", "companyName": "Some Leveraged Fund"},
+    ]
+    assert stock.search_local("nvidia") == [{"ticker": "NVDA", "companyName": "NVIDIA CORP"}]
+    assert len(builds) == 1
+
+
+def test_search_tickers_falls_back_to_yahoo_for_index_misses(monkeypatch: pytest.MonkeyPatch) -> None:
+    stock._search_cache.clear()
+    monkeypatch.setattr(stock.edgar, "company_names", lambda: {"NVDA": "NVIDIA CORP"})
+    monkeypatch.setattr(stock, "_search_index", None)
+    monkeypatch.setattr(stock, "_search_index_at", 0.0)
+
+    class FakeSearch:
+        def __init__(self, *_args, **_kwargs):
+            self.quotes = [{"symbol": "BTC-USD", "shortname": "Bitcoin USD"}]
+
+    monkeypatch.setattr(stock.yf, "Search", FakeSearch)
+
+    assert stock.search_tickers("btc-usd") == [{"ticker": "BTC-USD", "companyName": "Bitcoin USD"}]
+
+
+def test_search_index_build_failure_is_retried_later(monkeypatch: pytest.MonkeyPatch, no_search_index) -> None:
+    now = {"value": 1000.0}
+    monkeypatch.setattr(stock, "time", lambda: now["value"])
+
+    assert stock._ticker_index() is None
+    monkeypatch.setattr(stock.edgar, "company_names", lambda: {"NVDA": "NVIDIA CORP"})
+    assert stock._ticker_index() is None   # still inside the retry delay
+
+    now["value"] += stock._SEARCH_INDEX_RETRY_SECONDS
+    assert len(stock._ticker_index()) == 1
+
+
+def test_search_tickers_success_and_failure(monkeypatch: pytest.MonkeyPatch, no_search_index) -> None:
     stock._search_cache.clear()
 
     class FakeSearch:
@@ -258,7 +433,7 @@ def test_search_tickers_success_and_failure(monkeypatch: pytest.MonkeyPatch) ->
     assert stock.search_tickers("other") == []
 
 
-def test_search_tickers_uses_cached_results_until_ttl_expires(monkeypatch: pytest.MonkeyPatch) -> None:
+def test_search_tickers_uses_cached_results_until_ttl_expires(monkeypatch: pytest.MonkeyPatch, no_search_index) -> None:
     stock._search_cache.clear()
     calls = {"count": 0}
 
@@ -269,7 +444,10 @@ def test_search_tickers_uses_cached_results_until_ttl_expires(monkeypatch: pytes
 
     now = {"value": 1000.0}
     monkeypatch.setattr(stock.yf, "Search", FakeSearch)
-    monkeypatch.setattr(stock, "time", lambda: now["value"])
+    monkeypatch.setattr(
+        stock, "_search_cache",
+        stock.memo.MemoCache("search", max_entries=8, ttl=stock._SEARCH_CACHE_TTL, clock=lambda: now["value"]),
+    )
 
     first = stock.search_tickers("nvda")
     second = stock.search_tickers("nvda")
@@ -281,9 +459,25 @@ def test_search_tickers_uses_cached_results_until_ttl_expires(monkeypatch: pytes
     assert second == first
     assert third == first
     assert calls["count"] == 2
+    assert stock._search_cache.stats()["expirations"] == 1
+
+
+def test_search_cache_is_bounded(monkeypatch: pytest.MonkeyPatch, no_search_index) -> None:
+    class FakeSearch:
+        def __init__(self, query, **_kwargs):
+            self.quotes = [{"symbol": query.upper()}]
 
+    monkeypatch.setattr(stock.yf, "Search", FakeSearch)
+    monkeypatch.setattr(stock, "_search_cache", stock.memo.MemoCache("search", max_entries=2, ttl=60))
+
+    for query in ("a", "b", "c"):
+        stock.search_tickers(query)
+
+    assert stock._search_cache.keys() == ["b", "c"]
+    assert stock._search_cache.stats()["evictions"] == 1
 
-def test_search_tickers_caches_empty_results_after_exception(monkeypatch: pytest.MonkeyPatch) -> None:
+
+def test_search_tickers_caches_empty_results_after_exception(monkeypatch: pytest.MonkeyPatch, no_search_index) -> None:
     stock._search_cache.clear()
     calls = {"count": 0}
 
@@ -292,7 +486,6 @@ def test_search_tickers_caches_empty_results_after_exception(monkeypatch: pytest
         raise RuntimeError("search broken")
 
     monkeypatch.setattr(stock.yf, "Search", broken_search)
-    monkeypatch.setattr(stock, "time", lambda: 1000.0)
 
     first = stock.search_tickers("broken")
     second = stock.search_tickers("broken")
@@ -300,3 +493,86 @@ def test_search_tickers_caches_empty_results_after_exception(monkeypatch: pytest
     assert first == []
     assert second == []
     assert calls["count"] == 1
+
+
+def _frame(dates, closes, dividends=None, splits=None) -> pd.DataFrame:
+    data = {"Open": closes, "High": closes, "Low": closes, "Close": closes, "Volume": [100] * len(dates)}
+    if dividends is not None:
+        data["Dividends"] = dividends
+        data["Stock Splits"] = splits or [0.0] * len(dates)
+    return pd.DataFrame(data, index=pd.to_datetime(dates))
+
+
+def _cached_payload(dates, closes) -> dict:
+    return {"bars": {"time": dates, "open": closes, "high": closes, "low": closes, "close": closes, "volume": [100] * len(dates)}}
+
+
+def _patch_downloads(monkeypatch, incremental: pd.DataFrame, full: pd.DataFrame) -> list:
+    calls = []
+
+    def fake_download(ticker, **kwargs):
+        calls.append(kwargs)
+        return full if kwargs.get("period") == "max" else incremental
+
+    monkeypatch.setattr(stock.yf, "download", fake_download)
+    return calls
+
+
+def test_refresh_bars_downloads_only_recent_window(monkeypatch: pytest.MonkeyPatch) -> None:
+    cached = _cached_payload(["2026-01-02", "2026-01-05"], [1.0, 2.0])
+    recent = _frame(["2026-01-02", "2026-01-05", "2026-01-06"], [1.0, 2.1, 3.0], dividends=[0.0, 0.0, 0.0])
+    calls = _patch_downloads(monkeypatch, recent, full=pd.DataFrame())
+    before = stock.bars_stats()
+
+    bars = stock.refresh_bars("NVDA", cached)
+
+    assert bars.close.tolist() == [1.0, 2.1, 3.0]
+    assert calls == [{
+        "start": str(np.datetime64("2026-01-05") - np.timedelta64(stock.BARS_OVERLAP_DAYS, "D")),
+        "auto_adjust": True, "actions": True, "progress": False, "multi_level_index": False,
+    }]
+    assert stock.bars_stats()["incremental"] == before["incremental"] + 1
+
+
+def test_refresh_bars_refetches_everything_after_a_new_split(monkeypatch: pytest.MonkeyPatch) -> None:
+    cached = _cached_payload(["2026-01-02", "2026-01-05"], [10.0, 20.0])
+    recent = _frame(["2026-01-02", "2026-01-05", "2026-01-06"], [10.0, 20.0, 3.0],
+                    dividends=[0.0, 0.0, 0.0], splits=[0.0, 0.0, 10.0])
+    full = _frame(["2026-01-02", "2026-01-05", "2026-01-06"], [1.0, 2.0, 3.0])
+    calls = _patch_downloads(monkeypatch, recent, full)
+
+    bars = stock.refresh_bars("NVDA", cached)
+
+    assert bars.close.tolist() == [1.0, 2.0, 3.0]
+    assert calls[-1]["period"] == "max"
+
+
+def test_refresh_bars_ignores_dividends_already_in_the_cached_prices(monkeypatch: pytest.MonkeyPatch) -> None:
+    cached = _cached_payload(["2026-01-02", "2026-01-05"], [1.0, 2.0])
+    recent = _frame(["2026-01-02", "2026-01-05", "2026-01-06"], [1.0, 2.0, 3.0], dividends=[0.5, 0.0, 0.0])
+    calls = _patch_downloads(monkeypatch, recent, full=pd.DataFrame())
+
+    assert stock.refresh_bars("NVDA", cached).close.tolist() == [1.0, 2.0, 3.0]
+    assert len(calls) == 1
+
+
+def test_refresh_bars_refetches_when_overlap_prices_changed(monkeypatch: pytest.MonkeyPatch) -> None:
+    cached = _cached_payload(["2026-01-02", "2026-01-05"], [1.0, 2.0])
+    recent = _frame(["2026-01-02", "2026-01-05"], [0.9, 1.8])
+    full = _frame(["2026-01-02", "2026-01-05"], [0.9, 1.8])
+    calls = _patch_downloads(monkeypatch, recent, full)
+    before = stock.bars_stats()
+
+    assert stock.refresh_bars("NVDA", cached).close.tolist() == [0.9, 1.8]
+    assert calls[-1]["period"] == "max"
+    assert stock.bars_stats()["adjusted"] == before["adjusted"] + 1
+
+
+def test_refresh_bars_without_cached_history_or_new_data(monkeypatch: pytest.MonkeyPatch) -> None:
+    full = _frame(["2026-01-02"], [1.0])
+    calls = _patch_downloads(monkeypatch, incremental=pd.DataFrame(), full=full)
+
+    assert stock.refresh_bars("NVDA", None).close.tolist() == [1.0]
+    assert calls[-1]["period"] == "max"
+    # Nothing new upstream (holiday): keep the cached history
+    assert stock.refresh_bars("NVDA", _cached_payload(["2026-01-02"], [1.0])).close.tolist() == [1.0]
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from app import upstream
+
+
+def test_run_executes_on_named_bounded_pool() -> None:
+    name = asyncio.run(upstream.run("sec", lambda: threading.current_thread().name))
+
+    assert name.startswith("upstream-sec")
+    assert upstream._pool("sec") is upstream._pool("sec")
+    assert upstream._pool("sec")._max_workers == upstream.UPSTREAM_CONCURRENCY["sec"]
+
+
+def test_run_propagates_exceptions() -> None:
+    def broken():
+        raise ValueError("bad ticker")
+
+    with pytest.raises(ValueError, match="bad ticker"):
+        asyncio.run(upstream.run("yahoo", broken))
+
+
+def test_http_client_is_shared_until_closed(monkeypatch) -> None:
+    monkeypatch.setattr(upstream, "_http_client", None)
+
+    client = upstream.http_client()
+    assert isinstance(client, httpx.Client)
+    assert upstream.http_client() is client
+
+    upstream.close()
+    assert client.is_closed
+    assert upstream.http_client() is not client
+    upstream.close()
+
+
+def test_close_shuts_down_the_upstream_pools() -> None:
+    asyncio.run(upstream.run("fred", lambda: None))
+    pool = upstream._pool("fred")
+
+    upstream.close()
+
+    assert upstream._pools == {}
+    assert pool._shutdown
+    with pytest.raises(RuntimeError):
+        pool.submit(lambda: None)
+    # Used again after close(): a new pool is started
+    assert asyncio.run(upstream.run("fred", lambda: "ok")) == "ok"
+
+
+def test_provider_executor_reports_queue_depth_and_wait(monkeypatch) -> None:
+    executor = upstream._ProviderExecutor(max_workers=1)
+    monkeypatch.setattr(upstream, "_provider_executor", executor)
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(timeout=5)
+        return "first"
+
+    first = upstream.submit(blocker)
+    assert started.wait(timeout=5)
+    second = upstream.submit(lambda x: x * 2, 21)
+
+    stats = upstream.provider_stats()
+    assert stats["active"] == 1
+    assert stats["queued"] == 1
+    assert stats["peak_queued"] == 1
+
+    release.set()
+    assert first.result(timeout=5) == "first"
+    assert second.result(timeout=5) == 42
+
+    stats = upstream.provider_stats()
+    assert stats["queued"] == 0
+    assert stats["active"] == 0
+    assert stats["submitted"] == stats["completed"] == 2
+    assert stats["wait_seconds_max"] > 0
+    assert stats["wait_seconds_avg"] == stats["wait_seconds_total"] / 2
+    executor.shutdown()
+
+
+def test_provider_executor_counts_failed_tasks_as_completed(monkeypatch) -> None:
+    executor = upstream._ProviderExecutor(max_workers=2)
+    monkeypatch.setattr(upstream, "_provider_executor", executor)
+
+    def broken():
+        raise RuntimeError("provider down")
+
+    with pytest.raises(RuntimeError, match="provider down"):
+        upstream.submit(broken).result(timeout=5)
+    assert upstream.provider_stats()["completed"] == 1
+    executor.shutdown()
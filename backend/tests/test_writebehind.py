@@ -0,0 +1,112 @@
+import threading
+
+import pytest
+
+from app.writebehind import WriteBehindQueue
+
+
+def test_flushes_full_batches_in_background() -> None:
+    batches = []
+    done = threading.Event()
+
+    def flush(batch):
+        batches.append(batch)
+        if sum(map(len, batches)) == 4:
+            done.set()
+
+    queue = WriteBehindQueue(flush, batch_size=2, max_delay=60)
+    queue.put_many({"a": 1, "b": 2, "c": 3, "d": 4})
+
+    assert done.wait(5)
+    assert batches == [{"a": 1, "b": 2}, {"c": 3, "d": 4}]
+    queue.close()
+
+
+def test_flushes_partial_batch_after_max_delay() -> None:
+    done = threading.Event()
+    queue = WriteBehindQueue(lambda batch: done.set(), batch_size=100, max_delay=0.05)
+
+    queue.put("a", 1)
+
+    assert done.wait(5)
+    queue.close()
+
+
+def test_rewrites_of_a_pending_key_are_coalesced() -> None:
+    batches = []
+    queue = WriteBehindQueue(batches.append, batch_size=100, max_delay=60)
+
+    queue.put("a", 1)
+    queue.put("b", 1)
+    queue.put("a", 2)
+
+    assert queue.peek("a") == (True, 2)
+    assert queue.peek("z") == (False, None)
+    assert queue.flush_pending(timeout=5)
+    assert batches == [{"b": 1, "a": 2}]
+    assert queue.stats()["coalesced"] == 1
+    queue.close()
+
+
+def test_failed_batch_is_retried_and_newer_writes_win() -> None:
+    attempts = []
+
+    def flush(batch):
+        attempts.append(dict(batch))
+        if len(attempts) == 1:
+            queue.put("a", 2)   # written while the first upload is failing
+            raise OSError("s3 down")
+
+    queue = WriteBehindQueue(flush, batch_size=100, max_delay=60)
+    queue.put("a", 1)
+
+    assert queue.flush_pending(timeout=5)
+    assert attempts == [{"a": 1}, {"a": 2}]
+    stats = queue.stats()
+    assert stats["failed_batches"] == 1
+    assert stats["flushed"] == 1
+    assert stats["pending"] == 0
+    queue.close()
+
+
+def test_flush_pending_gives_up_at_timeout() -> None:
+    def flush(batch):
+        raise OSError("s3 down")
+
+    queue = WriteBehindQueue(flush, batch_size=100, max_delay=60)
+    queue.put("a", 1)
+
+    assert queue.flush_pending(timeout=0.2) is False
+    assert queue.peek("a") == (True, 1)
+
+
+def test_put_blocks_while_queue_is_full() -> None:
+    release = threading.Event()
+    written = []
+
+    def flush(batch):
+        release.wait(5)
+        written.extend(batch)
+
+    queue = WriteBehindQueue(flush, batch_size=1, max_delay=0, max_pending=1)
+    queue.put("a", 1)
+    queue.put("b", 2)   # "a" is in flight, so there is room for one pending key
+    putter = threading.Thread(target=queue.put, args=("c", 3))
+    putter.start()
+    putter.join(0.1)
+
+    assert putter.is_alive()
+    release.set()
+    putter.join(5)
+    assert queue.flush_pending(timeout=5)
+    assert written == ["a", "b", "c"]
+    assert queue.stats()["blocked_puts"] >= 1
+    queue.close()
+
+
+def test_closed_queue_rejects_writes() -> None:
+    queue = WriteBehindQueue(lambda batch: None)
+    queue.close()
+
+    with pytest.raises(RuntimeError):
+        queue.put("a", 1)